@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from queue import Empty
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from telegram import Bot, Update
+from telegram.error import (
+    BadRequest,
+    Conflict,
+    NetworkError,
+    RetryAfter,
+    TelegramError,
+    TimedOut,
+    Unauthorized,
+)
+from telegram.ext import CallbackContext, DispatcherHandlerStop, Handler, Updater
+
+from webhook import WebhookServer
+
+logger = logging.getLogger(__name__)
+
+API_URL = "https://api.telegram.org/bot"
+POLL_TIMEOUT = 30
+POLL_RETRY_DELAY = 5
+REQUEST_TIMEOUT_MARGIN = 10
+
+ERRORS = {
+    400: BadRequest,
+    401: Unauthorized,
+    403: Unauthorized,
+    409: Conflict,
+}
+
+
+class AsyncBotApi:
+    def __init__(self, bot: Bot, base_url: str = API_URL):
+        self.bot = bot
+        self.url = f"{base_url}{bot.token}"
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def call(self, method: str, data: Optional[Dict] = None, timeout: float = 0) -> Any:
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+
+        try:
+            async with self._session.post(
+                f"{self.url}/{method}",
+                json=data or {},
+                timeout=aiohttp.ClientTimeout(total=timeout + REQUEST_TIMEOUT_MARGIN),
+            ) as response:
+                status = response.status
+                payload = await response.json(content_type=None)
+        except asyncio.TimeoutError as err:
+            raise TimedOut() from err
+        except (aiohttp.ClientError, ValueError) as err:
+            raise NetworkError(f"{method}: {err}") from err
+
+        if payload.get("ok"):
+            return payload["result"]
+
+        description = payload.get("description", "unknown error")
+        retry_after = payload.get("parameters", {}).get("retry_after")
+        if retry_after is not None:
+            raise RetryAfter(retry_after)
+        raise ERRORS.get(status, NetworkError)(description)
+
+    async def get_updates(
+        self, offset: Optional[int], timeout: int, allowed_updates: Optional[List[str]]
+    ) -> List[Update]:
+        data: Dict[str, Any] = {"timeout": timeout}
+        if offset is not None:
+            data["offset"] = offset
+        if allowed_updates is not None:
+            data["allowed_updates"] = allowed_updates
+
+        result = await self.call("getUpdates", data, timeout)
+        return [Update.de_json(u, self.bot) for u in result]
+
+    async def delete_webhook(self) -> bool:
+        return await self.call("deleteWebhook")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncRunner:
+    def __init__(
+        self,
+        updater: Updater,
+        workers: int,
+        max_updates: int,
+        api: Optional[AsyncBotApi] = None,
+    ):
+        self.updater = updater
+        self.dp = updater.dispatcher
+        self.bot = updater.bot
+        self.api = api or AsyncBotApi(updater.bot)
+        self.max_updates = max_updates
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="aio")
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    async def blocking(self, func: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    def _match(self, group: int, update: Update) -> Optional[Tuple[Handler, Any]]:
+        for handler in self.dp.handlers[group]:
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler, check
+        return None
+
+    async def _handle(self, handler: Handler, check: Any, update: Update, context: CallbackContext):
+        handler.collect_additional_context(context, update, self.dp, check)
+        if asyncio.iscoroutinefunction(handler.callback):
+            await handler.callback(update, context)
+        else:
+            await self.blocking(handler.callback, update, context)
+
+    async def _dispatch_error(self, update: Update, err: Exception) -> bool:
+        try:
+            await self.blocking(self.dp.dispatch_error, update, err)
+        except DispatcherHandlerStop:
+            logger.debug("error handler stopped further handlers")
+            return False
+        except Exception:
+            logger.exception("error handler failed for update %s", update.update_id)
+        return True
+
+    async def process_update(self, update: Update):
+        context: Optional[CallbackContext] = None
+
+        for group in self.dp.groups:
+            try:
+                matched = await self.blocking(self._match, group, update)
+                if matched is None:
+                    continue
+
+                if context is None:
+                    context = CallbackContext.from_update(update, self.dp)
+                    context.refresh_data()
+                await self._handle(*matched, update, context)
+
+            except DispatcherHandlerStop:
+                logger.debug("stopping further handlers for update %s", update.update_id)
+                break
+            except Exception as err:
+                logger.exception("error while processing update %s", update.update_id)
+                if not await self._dispatch_error(update, err):
+                    break
+
+        await self.blocking(self.dp.update_persistence, update)
+
+    def _release(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self._slots.release()
+
+    async def poll(self, allowed_updates: Optional[List[str]]):
+        offset = None
+        while not self._stop.is_set():
+            try:
+                updates = await self.api.get_updates(offset, POLL_TIMEOUT, allowed_updates)
+            except RetryAfter as err:
+                logger.warning("getUpdates is rate limited for %s seconds", err.retry_after)
+                await asyncio.sleep(err.retry_after)
+                continue
+            except TelegramError as err:
+                logger.error("can't get updates: %s", err)
+                await asyncio.sleep(POLL_RETRY_DELAY)
+                continue
+
+            for update in updates:
+                offset = update.update_id + 1
+                await self._spawn(update)
+
+    async def drain(self, server: WebhookServer):
+        while not self._stop.is_set():
+            try:
+                data = await self.blocking(server.get, 1)
+            except Empty:
+                continue
+            await self._spawn(Update.de_json(data, self.bot))
+
+    async def _spawn(self, update: Update):
+        await self._slots.acquire()
+        task = asyncio.create_task(self.process_update(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._release)
+
+    async def run(
+        self,
+        allowed_updates: Optional[List[str]] = None,
+        webhook: Optional[WebhookServer] = None,
+    ):
+        loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_updates)
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+
+        if webhook is None:
+            await self.api.delete_webhook()
+            source = self.poll(allowed_updates)
+        else:
+            source = self.drain(webhook)
+
+        self.updater.job_queue.start()
+        logger.info("asyncio runtime started, up to %d concurrent updates", self.max_updates)
+
+        receiver = asyncio.create_task(source)
+        await self._stop.wait()
+        receiver.cancel()
+        if webhook is not None:
+            webhook.stop()
+
+        logger.info("stopping, waiting for %d updates in flight", len(self._tasks))
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.updater.job_queue.stop()
+        if self.dp.persistence is not None:
+            self.dp.update_persistence()
+            self.dp.persistence.flush()
+        await self.api.close()
+        self._executor.shutdown(wait=False)
+
+
+def run(
+    updater: Updater,
+    workers: int,
+    max_updates: int,
+    webhook: Optional[WebhookServer] = None,
+):
+    runner = AsyncRunner(updater, workers, max_updates)
+    asyncio.run(runner.run(allowed_updates=Update.ALL_TYPES, webhook=webhook))
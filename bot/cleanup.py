@@ -0,0 +1,143 @@
+import heapq
+import logging
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
+from typing import Dict, List, Tuple
+
+import pymongo
+from pymongo.errors import PyMongoError
+from telegram.error import BadRequest, Unauthorized
+from telegram.ext import CallbackContext, JobQueue
+
+from db.indexes import indexes
+from db.mongo import collection
+from outbox import SEND_TIMEOUT, ScheduledBot
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 5
+SWEEP_BATCH = 500
+RESTORE_RETRY = 60
+DELETE_WINDOW = 48 * 60 * 60
+
+Pending = Tuple[float, int, int]
+
+
+class DB:
+    def __init__(self, db_name: str):
+        self._db_name = db_name
+        indexes.register(
+            db_name,
+            "messages",
+            [("due_at", pymongo.ASCENDING)],
+            expireAfterSeconds=DELETE_WINDOW,
+        )
+
+    def add(self, chat_id: int, message_id: int, due_at: datetime):
+        collection(self._db_name, "messages").update_one(
+            {"_id": f"{chat_id}:{message_id}"},
+            {"$set": {"chat_id": chat_id, "message_id": message_id, "due_at": due_at}},
+            upsert=True,
+        )
+
+    def find_all(self):
+        return collection(self._db_name, "messages").find(
+            {}, {"chat_id": 1, "message_id": 1, "due_at": 1}
+        )
+
+    def remove_many(self, keys: List[str]):
+        collection(self._db_name, "messages").delete_many({"_id": {"$in": keys}})
+
+
+def _timestamp(due_at: datetime) -> float:
+    return due_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+class CleanupScheduler:
+    def __init__(self, db: DB):
+        self._db = db
+        self._heap: List[Pending] = []
+        self._lock = Lock()
+        self.deleted = 0
+        self.failed = 0
+        metrics.gauge("cleanup", self.stats)
+
+    def start(self, job_queue: JobQueue):
+        job_queue.run_repeating(self._restore, interval=RESTORE_RETRY, first=0)
+        job_queue.run_repeating(self.sweep, interval=SWEEP_INTERVAL, first=SWEEP_INTERVAL)
+
+    def _restore(self, context: CallbackContext):
+        try:
+            pending = [
+                (_timestamp(doc["due_at"]), doc["chat_id"], doc["message_id"])
+                for doc in self._db.find_all()
+            ]
+        except PyMongoError as err:
+            logger.error("can't restore pending message cleanups, retrying: %s", err)
+            return
+
+        context.job.schedule_removal()
+        with self._lock:
+            self._heap.extend(pending)
+            heapq.heapify(self._heap)
+        logger.info("restored %d pending message cleanups", len(pending))
+
+    def schedule(self, chat_id: int, message_id: int, seconds: int):
+        due_at = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+        logger.debug("scheduling cleanup of %s:%s at %s", chat_id, message_id, due_at)
+        self._db.add(chat_id, message_id, due_at)
+        with self._lock:
+            heapq.heappush(self._heap, (due_at.timestamp(), chat_id, message_id))
+
+    def _pop_due(self, now: float) -> List[Pending]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < SWEEP_BATCH:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def sweep(self, context: CallbackContext):
+        due = self._pop_due(datetime.now(timezone.utc).timestamp())
+        if not due:
+            return
+
+        futures = [
+            (entry, context.bot.schedule_delete(entry[1], entry[2]))
+            for entry in sorted(due, key=lambda e: e[1:])
+        ]
+        deadline = monotonic() + SEND_TIMEOUT
+        settled: List[Pending] = []
+        for entry, future in futures:
+            if self._settle(context.bot, entry, future, max(deadline - monotonic(), 0)):
+                settled.append(entry)
+
+        try:
+            self._db.remove_many([f"{c}:{m}" for _, c, m in settled])
+        except PyMongoError as err:
+            logger.error("can't remove %d cleaned up messages: %s", len(settled), err)
+        logger.debug("cleaned up %d of %d due messages", len(settled), len(due))
+
+    def _settle(self, bot: ScheduledBot, entry: Pending, future: Future, timeout: float) -> bool:
+        try:
+            future.result(timeout=timeout)
+            self.deleted += 1
+            return True
+        except (BadRequest, Unauthorized) as err:
+            self.failed += 1
+            logger.info("can't delete msg: %s", err)
+            return True
+        except Exception as err:
+            logger.warning("cleanup of %s:%s did not finish, retrying: %r", entry[1], entry[2], err)
+            if future.done() or bot.outbox.cancel(future):
+                with self._lock:
+                    heapq.heappush(self._heap, entry)
+            return False
+
+    def stats(self) -> Dict:
+        return {"pending": len(self._heap), "deleted": self.deleted, "failed": self.failed}
+
+
+cleanup = CleanupScheduler(DB("cleanup"))
@@ -1,4 +1,5 @@
 import os
+from secrets import token_urlsafe
 from typing import Dict, Optional
 
 
@@ -42,6 +43,36 @@ def get_mongo_pass():
     return user
 
 
+def get_admins_cache_ttl() -> int:
+    return int(os.getenv("ADMINS_CACHE_TTL", "300"))
+
+
+def get_runtime() -> str:
+    runtime = os.getenv("RUNTIME", "threads").lower()
+    if runtime not in {"threads", "asyncio"}:
+        raise ValueError(f"unknown RUNTIME: {runtime}")
+    return runtime
+
+
+def get_mongo_backend() -> str:
+    backend = os.getenv("MONGO_BACKEND", "mongo").lower()
+    if backend not in {"mongo", "memory"}:
+        raise ValueError(f"unknown MONGO_BACKEND: {backend}")
+    return backend
+
+
+def get_namaz_source() -> str:
+    source = os.getenv("NAMAZ_SOURCE", "diyanet").lower()
+    if source not in {"diyanet", "astronomical"}:
+        raise ValueError(f"unknown NAMAZ_SOURCE: {source}")
+    return source
+
+
+def get_webhook_secret() -> str:
+    secret = os.getenv("WEBHOOK_SECRET", "")
+    return secret or token_urlsafe(32)
+
+
 def get_config() -> Dict:
     return {
         "DEBUG": get_debug(),
@@ -53,5 +84,25 @@ def get_config() -> Dict:
         "GOOGLE_PROJECT_ID": get_project_id(),
         "MONGO_HOST": os.getenv("MONGO_HOST", "mongo"),
         "MONGO_PORT": os.getenv("MONGO_PORT", "27017"),
+        "MONGO_BACKEND": get_mongo_backend(),
+        "MONGO_POOL_SIZE": int(os.getenv("MONGO_POOL_SIZE", "50")),
+        "MONGO_CONNECT_TIMEOUT_MS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "MONGO_SOCKET_TIMEOUT_MS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": int(
+            os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+        ),
+        "MONGO_SLOW_QUERY_MS": float(os.getenv("MONGO_SLOW_QUERY_MS", "100")),
         "SENTRY_DSN": os.getenv("SENTRY_DSN", None),
+        "ADMINS_CACHE_TTL": get_admins_cache_ttl(),
+        "CHAT_CACHE_TTL": int(os.getenv("CHAT_CACHE_TTL", "3600")),
+        "RUNTIME": get_runtime(),
+        "ASYNC_WORKERS": int(os.getenv("ASYNC_WORKERS", "32")),
+        "ASYNC_MAX_UPDATES": int(os.getenv("ASYNC_MAX_UPDATES", "256")),
+        "WEBHOOK_URL": os.getenv("WEBHOOK_URL", ""),
+        "WEBHOOK_LISTEN": os.getenv("WEBHOOK_LISTEN", "0.0.0.0"),
+        "WEBHOOK_PORT": int(os.getenv("WEBHOOK_PORT", "8443")),
+        "WEBHOOK_PATH": os.getenv("WEBHOOK_PATH", "telegram"),
+        "WEBHOOK_SECRET": get_webhook_secret(),
+        "WEBHOOK_QUEUE_SIZE": int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000")),
+        "NAMAZ_SOURCE": get_namaz_source(),
     }
@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+from telegram.ext import CallbackContext, JobQueue
+
+from db.mongo import get_db
+
+logger = logging.getLogger(__name__)
+
+Keys = Sequence[Tuple[str, int]]
+
+UNUSED_AFTER = timedelta(days=1)
+REPORT_INTERVAL = 24 * 60 * 60
+
+
+class IndexSpec:
+    def __init__(self, db_name: str, coll_name: str, keys: Keys, **options):
+        self.db_name = db_name
+        self.coll_name = coll_name
+        self.keys = list(keys)
+        self.name = options.pop("name", None) or "_".join(
+            f"{field}_{direction}" for field, direction in self.keys
+        )
+        self.options = options
+
+    def model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def __repr__(self) -> str:
+        return f"{self.db_name}.{self.coll_name}.{self.name}"
+
+
+class IndexRegistry:
+    def __init__(self):
+        self._specs: Dict[Tuple[str, str, str], IndexSpec] = {}
+
+    def register(self, db_name: str, coll_name: str, keys: Keys, **options) -> IndexSpec:
+        spec = IndexSpec(db_name, coll_name, keys, **options)
+        self._specs[(db_name, coll_name, spec.name)] = spec
+        return spec
+
+    def _by_collection(self) -> Dict[Tuple[str, str], List[IndexSpec]]:
+        by_coll: Dict[Tuple[str, str], List[IndexSpec]] = {}
+        for spec in self._specs.values():
+            by_coll.setdefault((spec.db_name, spec.coll_name), []).append(spec)
+        return by_coll
+
+    def ensure(self) -> List[IndexSpec]:
+        failed = []
+        for (db_name, coll_name), specs in self._by_collection().items():
+            coll = get_db(db_name)[coll_name]
+            try:
+                coll.create_indexes([s.model() for s in specs])
+                logger.info("ensured indexes on %s.%s: %s", db_name, coll_name, specs)
+            except OperationFailure as err:
+                logger.error("can't create indexes on %s.%s: %s", db_name, coll_name, err)
+                failed.extend(specs)
+        return failed
+
+    def report(self, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+        unused_since = (now or datetime.utcnow()) - UNUSED_AFTER
+        missing: List[str] = []
+        unused: List[str] = []
+        undeclared: List[str] = []
+
+        for (db_name, coll_name), specs in self._by_collection().items():
+            coll = get_db(db_name)[coll_name]
+            declared = {s.name for s in specs}
+            existing = {ix["name"] for ix in coll.list_indexes()}
+            missing.extend(f"{db_name}.{coll_name}.{n}" for n in declared - existing)
+            undeclared.extend(
+                f"{db_name}.{coll_name}.{n}" for n in existing - declared - {"_id_"}
+            )
+
+            for stats in _index_stats(coll):
+                accesses = stats["accesses"]
+                if (
+                    stats["name"] in declared
+                    and accesses["ops"] == 0
+                    and accesses["since"].replace(tzinfo=None) <= unused_since
+                ):
+                    unused.append(f"{db_name}.{coll_name}.{stats['name']}")
+
+        return {
+            "missing": sorted(missing),
+            "unused": sorted(unused),
+            "undeclared": sorted(undeclared),
+        }
+
+    def log_report(self):
+        report = self.report()
+        for kind, names in report.items():
+            if names:
+                logger.warning("%s indexes: %s", kind, names)
+
+    def start(self, job_queue: JobQueue):
+        job_queue.run_repeating(self._report, interval=REPORT_INTERVAL, first=REPORT_INTERVAL)
+
+    def _report(self, _: CallbackContext):
+        try:
+            self.log_report()
+        except PyMongoError as err:
+            logger.error("can't build index report: %s", err)
+
+
+def _index_stats(coll) -> List[Dict]:
+    try:
+        return list(coll.aggregate([{"$indexStats": {}}]))
+    except OperationFailure as err:
+        logger.debug("$indexStats is not available for %s: %s", coll.name, err)
+        return []
+
+
+indexes = IndexRegistry()
@@ -0,0 +1,430 @@
+import logging
+from copy import deepcopy
+from threading import RLock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.operations import ReplaceOne, UpdateOne
+from pymongo.results import (
+    BulkWriteResult,
+    DeleteResult,
+    InsertManyResult,
+    InsertOneResult,
+    UpdateResult,
+)
+
+logger = logging.getLogger(__name__)
+
+Doc = Dict[str, Any]
+SortSpec = List[Tuple[str, int]]
+
+_MISSING = object()
+
+
+def _get(doc: Doc, path: str) -> Any:
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _parent(doc: Doc, path: str) -> Tuple[Doc, str]:
+    *parents, key = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    return doc, key
+
+
+def _compare(value: Any, arg: Any, cmp: Callable[[Any, Any], bool]) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        return cmp(value, arg)
+    except TypeError:
+        return False
+
+
+def _equals(value: Any, arg: Any) -> bool:
+    if value is _MISSING:
+        return arg is None
+    if isinstance(value, list) and not isinstance(arg, list):
+        return arg in value
+    return value == arg
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": _equals,
+    "$ne": lambda v, a: not _equals(v, a),
+    "$gt": lambda v, a: _compare(v, a, lambda x, y: x > y),
+    "$gte": lambda v, a: _compare(v, a, lambda x, y: x >= y),
+    "$lt": lambda v, a: _compare(v, a, lambda x, y: x < y),
+    "$lte": lambda v, a: _compare(v, a, lambda x, y: x <= y),
+    "$in": lambda v, a: any(_equals(v, x) for x in a),
+    "$nin": lambda v, a: not any(_equals(v, x) for x in a),
+    "$exists": lambda v, a: (v is not _MISSING) == bool(a),
+}
+
+
+def _is_operator_doc(cond: Any) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(k.startswith("$") for k in cond)
+
+
+def _match_operators(value: Any, cond: Doc) -> bool:
+    for op, arg in cond.items():
+        if op not in _OPERATORS:
+            raise OperationFailure(f"unsupported query operator {op}")
+        if not _OPERATORS[op](value, arg):
+            return False
+    return True
+
+
+_LOGICAL: Dict[str, Callable[[Doc, List[Doc]], bool]] = {
+    "$and": lambda doc, queries: all(matches(doc, q) for q in queries),
+    "$or": lambda doc, queries: any(matches(doc, q) for q in queries),
+}
+
+
+def _match_field(doc: Doc, key: str, cond: Any) -> bool:
+    if key in _LOGICAL:
+        return _LOGICAL[key](doc, cond)
+    if _is_operator_doc(cond):
+        return _match_operators(_get(doc, key), cond)
+    return _equals(_get(doc, key), cond)
+
+
+def matches(doc: Doc, query: Optional[Doc]) -> bool:
+    return all(_match_field(doc, key, cond) for key, cond in (query or {}).items())
+
+
+def _each(arg: Any) -> List[Any]:
+    return arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+
+
+def _set(parent: Doc, key: str, arg: Any):
+    parent[key] = deepcopy(arg)
+
+
+def _unset(parent: Doc, key: str, _: Any):
+    parent.pop(key, None)
+
+
+def _inc(parent: Doc, key: str, arg: Any):
+    parent[key] = parent.get(key, 0) + arg
+
+
+def _push(parent: Doc, key: str, arg: Any):
+    parent.setdefault(key, []).extend(deepcopy(item) for item in _each(arg))
+
+
+def _add_to_set(parent: Doc, key: str, arg: Any):
+    values = parent.setdefault(key, [])
+    for item in _each(arg):
+        if item not in values:
+            values.append(deepcopy(item))
+
+
+def _pull(parent: Doc, key: str, arg: Any):
+    parent[key] = [v for v in parent.get(key, []) if v != arg]
+
+
+_UPDATES: Dict[str, Callable[[Doc, str, Any], None]] = {
+    "$set": _set,
+    "$setOnInsert": _set,
+    "$unset": _unset,
+    "$inc": _inc,
+    "$push": _push,
+    "$addToSet": _add_to_set,
+    "$pull": _pull,
+}
+
+
+def _apply_update(doc: Doc, update: Doc, inserting: bool):
+    for op, fields in update.items():
+        if op not in _UPDATES:
+            raise OperationFailure(f"unsupported update operator {op}")
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, arg in fields.items():
+            parent, key = _parent(doc, path)
+            _UPDATES[op](parent, key, arg)
+
+
+def _project(doc: Doc, projection: Optional[Doc]) -> Doc:
+    if not projection:
+        return deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    if value is _MISSING or value is None:
+        return 0, 0
+    return 1, value
+
+
+def _normalize_sort(key: Union[str, SortSpec], direction: Optional[int]) -> SortSpec:
+    if isinstance(key, str):
+        return [(key, direction if direction is not None else ASCENDING)]
+    return list(key)
+
+
+class _BulkOp:
+    # pymongo 3.x keeps the request arguments in private fields only
+    def __init__(self, op: Union[ReplaceOne, UpdateOne]):
+        if isinstance(op, ReplaceOne):
+            self.replace = True
+        elif isinstance(op, UpdateOne):
+            self.replace = False
+        else:
+            raise OperationFailure(f"unsupported bulk operation {op!r}")
+        self.filter, self.doc, self.upsert = op._filter, op._doc, bool(op._upsert)
+
+
+class MemoryCursor:
+    def __init__(self, docs: Callable[[], List[Doc]], projection: Optional[Doc]):
+        self._docs = docs
+        self._projection = projection
+        self._sort: SortSpec = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key: Union[str, SortSpec], direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key, direction)
+        return self
+
+    def skip(self, n: int) -> "MemoryCursor":
+        self._skip = n
+        return self
+
+    def limit(self, n: int) -> "MemoryCursor":
+        self._limit = n
+        return self
+
+    def _evaluate(self) -> List[Doc]:
+        docs = self._docs()
+        for field, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+        skip = self._skip
+        docs = docs[skip:]
+        if self._limit:
+            docs = docs[: self._limit]
+        return [_project(d, self._projection) for d in docs]
+
+    def __iter__(self) -> Iterator[Doc]:
+        return iter(self._evaluate())
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[Any, Doc] = {}
+        self._indexes: Dict[str, Doc] = {"_id_": {"name": "_id_", "key": {"_id": 1}}}
+        self._lock = RLock()
+
+    def _matching(self, query: Optional[Doc]) -> List[Doc]:
+        with self._lock:
+            return [d for d in self._docs.values() if matches(d, query)]
+
+    def find(self, filter: Optional[Doc] = None, projection: Optional[Doc] = None, **_) -> MemoryCursor:
+        return MemoryCursor(lambda: self._matching(filter), projection)
+
+    def find_one(self, filter: Optional[Doc] = None, projection: Optional[Doc] = None, **_) -> Optional[Doc]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        with self._lock:
+            doc = next((d for d in self._docs.values() if matches(d, filter)), None)
+            return _project(doc, projection) if doc is not None else None
+
+    def count_documents(self, filter: Doc, **_) -> int:
+        return len(self._matching(filter))
+
+    def estimated_document_count(self, **_) -> int:
+        return len(self._docs)
+
+    def _insert(self, doc: Doc) -> Any:
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"duplicate _id {doc['_id']!r} in {self.name}")
+        self._docs[doc["_id"]] = deepcopy(doc)
+        return doc["_id"]
+
+    def insert_one(self, document: Doc, **_) -> InsertOneResult:
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents: Sequence[Doc], **_) -> InsertManyResult:
+        with self._lock:
+            return InsertManyResult([self._insert(d) for d in documents], True)
+
+    def _update(self, filter: Doc, update: Doc, upsert: bool, many: bool, replace: bool) -> Doc:
+        with self._lock:
+            targets = [d for d in self._docs.values() if matches(d, filter)]
+            if not many:
+                targets = targets[:1]
+
+            for doc in targets:
+                if replace:
+                    replacement = deepcopy(update)
+                    replacement["_id"] = doc["_id"]
+                    doc.clear()
+                    doc.update(replacement)
+                else:
+                    _apply_update(doc, update, inserting=False)
+
+            raw: Doc = {"n": len(targets), "nModified": len(targets)}
+            if not targets and upsert:
+                if replace:
+                    doc = deepcopy(update)
+                else:
+                    doc = {
+                        k: deepcopy(v)
+                        for k, v in filter.items()
+                        if not k.startswith("$") and not _is_operator_doc(v)
+                    }
+                    _apply_update(doc, update, inserting=True)
+                if "_id" in filter and not _is_operator_doc(filter["_id"]):
+                    doc.setdefault("_id", filter["_id"])
+                raw = {"n": 1, "nModified": 0, "upserted": self._insert(doc)}
+            return raw
+
+    def update_one(self, filter: Doc, update: Doc, upsert: bool = False, **_) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, False, False), True)
+
+    def update_many(self, filter: Doc, update: Doc, upsert: bool = False, **_) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, True, False), True)
+
+    def replace_one(self, filter: Doc, replacement: Doc, upsert: bool = False, **_) -> UpdateResult:
+        return UpdateResult(self._update(filter, replacement, upsert, False, True), True)
+
+    def _delete(self, filter: Optional[Doc], many: bool) -> int:
+        with self._lock:
+            targets = [k for k, d in self._docs.items() if matches(d, filter)]
+            if not many:
+                targets = targets[:1]
+            for key in targets:
+                del self._docs[key]
+            return len(targets)
+
+    def delete_one(self, filter: Doc, **_) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, False)}, True)
+
+    def delete_many(self, filter: Doc, **_) -> DeleteResult:
+        return DeleteResult({"n": self._delete(filter, True)}, True)
+
+    def bulk_write(self, requests: Sequence[Any], ordered: bool = True, **_) -> BulkWriteResult:
+        result = {
+            "nInserted": 0,
+            "nUpserted": 0,
+            "nMatched": 0,
+            "nModified": 0,
+            "nRemoved": 0,
+            "upserted": [],
+        }
+        ops = [_BulkOp(op) for op in requests]
+        with self._lock:
+            for i, op in enumerate(ops):
+                raw = self._update(op.filter, op.doc, op.upsert, False, op.replace)
+                if "upserted" in raw:
+                    result["nUpserted"] += 1
+                    result["upserted"].append({"index": i, "_id": raw["upserted"]})
+                else:
+                    result["nMatched"] += raw["n"]
+                    result["nModified"] += raw["nModified"]
+        return BulkWriteResult(result, True)
+
+    def create_index(self, keys: Union[str, SortSpec], **kwargs) -> str:
+        spec = _normalize_sort(keys, None)
+        name = kwargs.pop("name", None) or "_".join(f"{k}_{d}" for k, d in spec)
+        with self._lock:
+            self._indexes[name] = {"name": name, "key": dict(spec), **kwargs}
+        return name
+
+    def create_indexes(self, indexes: Sequence[Any], **_) -> List[str]:
+        names = []
+        for index in indexes:
+            doc = dict(index.document)
+            keys = list(doc.pop("key").items())
+            names.append(self.create_index(keys, **doc))
+        return names
+
+    def list_indexes(self) -> Iterator[Doc]:
+        with self._lock:
+            return iter([deepcopy(ix) for ix in self._indexes.values()])
+
+    def drop_indexes(self):
+        with self._lock:
+            self._indexes = {"_id_": self._indexes["_id_"]}
+
+    def aggregate(self, pipeline: Sequence[Doc], **_):
+        raise OperationFailure(f"aggregation is not supported by the memory backend: {pipeline}")
+
+    def drop(self):
+        with self._lock:
+            self._docs.clear()
+            self.drop_indexes()
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._lock = RLock()
+
+    def get_collection(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def drop_collection(self, name: str):
+        self.get_collection(name).drop()
+
+    def command(self, command: str, *_, **__) -> Doc:
+        if command != "ping":
+            raise OperationFailure(f"unsupported command {command}")
+        return {"ok": 1.0}
+
+
+class MemoryClient:
+    def __init__(self):
+        self._databases: Dict[str, MemoryDatabase] = {}
+        self._lock = RLock()
+
+    def get_database(self, name: str) -> MemoryDatabase:
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(self, name)
+            return self._databases[name]
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        return self.get_database(name)
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self.get_database("admin")
+
+    def drop_database(self, name: str):
+        with self._lock:
+            self._databases.pop(name, None)
@@ -1,23 +1,69 @@
 import logging
+from threading import Lock
+from typing import Optional
 from urllib.parse import quote_plus
 
 from pymongo import MongoClient
+from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.errors import PyMongoError
 
 from config import get_config
-
-conf = get_config()
+from db.monitoring import query_monitor
 
 logger = logging.getLogger(__name__)
 
-uri = "mongodb://%s:%s@%s" % (
-    quote_plus(conf["MONGO_USER"]),
-    quote_plus(conf["MONGO_PASS"]),
-    conf["MONGO_HOST"],
-)
+__client: Optional[MongoClient] = None
+__lock = Lock()
+
+
+def _create_client() -> MongoClient:
+    conf = get_config()
+    query_monitor.slow_ms = conf["MONGO_SLOW_QUERY_MS"]
+    uri = "mongodb://%s:%s@%s" % (
+        quote_plus(conf["MONGO_USER"]),
+        quote_plus(conf["MONGO_PASS"]),
+        conf["MONGO_HOST"],
+    )
+    return MongoClient(
+        uri,
+        connect=False,
+        maxPoolSize=conf["MONGO_POOL_SIZE"],
+        connectTimeoutMS=conf["MONGO_CONNECT_TIMEOUT_MS"],
+        socketTimeoutMS=conf["MONGO_SOCKET_TIMEOUT_MS"],
+        serverSelectionTimeoutMS=conf["MONGO_SERVER_SELECTION_TIMEOUT_MS"],
+        event_listeners=[query_monitor],
+    )
+
+
+def get_client() -> MongoClient:
+    global __client
+    if __client is None:
+        with __lock:
+            if __client is None:
+                __client = _create_client()
+    return __client
 
-__client = MongoClient(uri)
+
+def use_client(client: MongoClient):
+    global __client
+    with __lock:
+        __client = client
 
 
 def get_db(db_name: str) -> Database:
-    return __client.get_database(db_name)
+    return get_client().get_database(db_name)
+
+
+def collection(db_name: str, name: str) -> Collection:
+    return get_db(db_name).get_collection(name)
+
+
+def warm_up() -> bool:
+    try:
+        get_client().admin.command("ping")
+    except PyMongoError as err:
+        logger.error("can't reach mongo: %s", err)
+        return False
+    logger.info("mongo connection is ready")
+    return True
@@ -0,0 +1,103 @@
+import logging
+import sys
+from collections import deque
+from threading import Lock
+from typing import Deque, Dict, List, Optional, Tuple
+
+from pymongo.monitoring import (
+    CommandFailedEvent,
+    CommandListener,
+    CommandStartedEvent,
+    CommandSucceededEvent,
+)
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = 100
+SLOW_QUERY_LOG_SIZE = 50
+MAX_STACK_DEPTH = 64
+
+OWN_MODULES = ("db.", "pymongo", "bson", "threading", "concurrent", "telegram")
+
+Target = Tuple[str, str, str]
+
+
+def _caller(depth: int = 2) -> str:
+    frame = sys._getframe(depth)
+    fallback = None
+    for _ in range(MAX_STACK_DEPTH):
+        if frame is None:
+            break
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("skills."):
+            return module.split(".")[1]
+        if fallback is None and module and not module.startswith(OWN_MODULES):
+            fallback = module
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+def _collection(event: CommandStartedEvent) -> str:
+    target = event.command.get(event.command_name)
+    if not isinstance(target, str):
+        target = event.command.get("collection", "")
+    return f"{event.database_name}.{target}" if target else event.database_name
+
+
+class QueryMonitor(CommandListener):
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self.slow: Deque[Dict] = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+        self._inflight: Dict[Tuple[int, object], Target] = {}
+        self._lock = Lock()
+        metrics.gauge("mongo", self.stats)
+
+    def started(self, event: CommandStartedEvent):
+        target = (_caller(), _collection(event), event.command_name)
+        with self._lock:
+            self._inflight[(event.request_id, event.connection_id)] = target
+
+    def _finish(self, event, ok: bool) -> Optional[Target]:
+        with self._lock:
+            target = self._inflight.pop((event.request_id, event.connection_id), None)
+        if target is None:
+            return None
+
+        skill, collection, command = target
+        seconds = event.duration_micros / 1e6
+        metrics.latency(f"mongo.{skill}.{collection}.{command}").observe(seconds, ok)
+
+        if seconds * 1000 >= self.slow_ms:
+            entry = {
+                "skill": skill,
+                "collection": collection,
+                "command": command,
+                "ms": round(seconds * 1000, 3),
+                "ok": ok,
+            }
+            self.slow.append(entry)
+            logger.warning("slow mongo command: %s", entry)
+        return target
+
+    def succeeded(self, event: CommandSucceededEvent):
+        self._finish(event, True)
+
+    def failed(self, event: CommandFailedEvent):
+        target = self._finish(event, False)
+        logger.info("mongo command %s failed: %s", target, event.failure)
+
+    def stats(self) -> Dict:
+        return {"inflight": len(self._inflight), "slow": len(self.slow)}
+
+
+def get_query_stats(skill: Optional[str] = None) -> List[Dict]:
+    return metrics.snapshot("mongo." if skill is None else f"mongo.{skill}.")
+
+
+def get_slow_queries() -> List[Dict]:
+    return list(query_monitor.slow)
+
+
+query_monitor = QueryMonitor()
@@ -1,61 +1,151 @@
 import re
-from typing import Optional, Union
+from abc import ABC, abstractmethod
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Optional, Set, Union
 
-from pymongo.collection import Collection
-from telegram import Message
+from telegram import Chat, Message
 from telegram.ext import MessageFilter
 from telegram.ext.filters import DataDict
 
-from config import get_debug
-from db.mongo import get_db
+from config import get_debug, get_admins_cache_ttl
+from db.mongo import collection
+from utils.cache import SetCache, TTLCache
+from utils.metrics import metrics
+
+MIN_SAMPLES = 20
+DEFAULT_PASS_RATE = 0.5
+EPS = 1e-3
 
 
 class TrustedDB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).users
+        self._db_name = db_name
 
-    def is_trusted(self, user_id: str) -> bool:
-        return self._coll.find_one({"_id": user_id}) is not None
+    def find_ids(self) -> Iterator[int]:
+        return (u["_id"] for u in collection(self._db_name, "users").find({}, {"_id": 1}))
 
 
 _trusted_db = TrustedDB("trusted")
 
+trusted_users = SetCache("trusted", _trusted_db.find_ids)
+
+chat_admins = TTLCache("admins", get_admins_cache_ttl())
+
+metrics.gauge("cache.trusted", trusted_users.stats)
+metrics.gauge("cache.admins", chat_admins.stats)
+
+
+def get_admin_ids(chat: Chat) -> Set[int]:
+    return chat_admins.get(
+        chat.id, lambda: {a.user.id for a in chat.get_administrators()}
+    )
+
+
+class MeteredFilter(MessageFilter, ABC):
+    cost: float = 1e-3
+
+    def __init__(self):
+        self.stats = metrics.latency(f"filter.{self.name}")
+
+    @abstractmethod
+    def check(self, message: Message) -> bool:
+        pass
+
+    def filter(self, message: Message) -> bool:
+        start = perf_counter()
+        result = bool(self.check(message))
+        self.stats.observe(perf_counter() - start, result)
+        return result
+
+    def expected_cost(self) -> float:
+        return self.stats.mean if self.stats.count >= MIN_SAMPLES else self.cost
+
+    def pass_rate(self) -> float:
+        if self.stats.count >= MIN_SAMPLES:
+            return self.stats.ok_rate
+        return DEFAULT_PASS_RATE
+
+    def __or__(self, other):
+        if isinstance(other, MeteredFilter):
+            return AnyOf(*_flatten(AnyOf, self), *_flatten(AnyOf, other))
+        return super().__or__(other)
+
+    def __and__(self, other):
+        if isinstance(other, MeteredFilter):
+            return AllOf(*_flatten(AllOf, self), *_flatten(AllOf, other))
+        return super().__and__(other)
+
+
+class _MeteredComposition(MeteredFilter):
+    separator = ""
 
-class TrustedFilter(MessageFilter):
+    def __init__(self, *filters: MeteredFilter):
+        self.filters = list(filters)
+        self.name = f"<{self.separator.join(f.name for f in self.filters)}>"
+        super().__init__()
+
+    def ordered(self, rank: Callable[[MeteredFilter], float]) -> List[MeteredFilter]:
+        return sorted(self.filters, key=lambda f: f.expected_cost() / max(rank(f), EPS))
+
+    def expected_cost(self) -> float:
+        if self.stats.count >= MIN_SAMPLES:
+            return self.stats.mean
+        return sum(f.expected_cost() for f in self.filters)
+
+
+class AnyOf(_MeteredComposition):
+    separator = " or "
+
+    def check(self, message: Message) -> bool:
+        return any(f.filter(message) for f in self.ordered(lambda f: f.pass_rate()))
+
+
+class AllOf(_MeteredComposition):
+    separator = " and "
+
+    def check(self, message: Message) -> bool:
+        return all(f.filter(message) for f in self.ordered(lambda f: 1 - f.pass_rate()))
+
+
+def _flatten(kind, f: MeteredFilter) -> List[MeteredFilter]:
+    return f.filters if isinstance(f, kind) else [f]
+
+
+class TrustedFilter(MeteredFilter):
     name = "Filter.trusted"
+    cost = 1e-6
 
-    def filter(self, message: Message) -> Optional[Union[bool, DataDict]]:
+    def check(self, message: Message) -> Optional[Union[bool, DataDict]]:
         if get_debug():
             return True
-        return _trusted_db.is_trusted(message.from_user.id)
+        return message.from_user.id in trusted_users
 
 
-class AdminFilter(MessageFilter):
+class AdminFilter(MeteredFilter):
     name = "Filters.admin"
 
-    def filter(self, message) -> bool:
+    def check(self, message) -> bool:
         if get_debug():
             return True
-        return message.from_user.id in {
-            a.user.id for a in message.chat.get_administrators()
-        }
+        return message.from_user.id in get_admin_ids(message.chat)
 
 
-
-class OnlyAdminOnOthersFilter(MessageFilter):
+class OnlyAdminOnOthersFilter(MeteredFilter):
     name = "Filters.onlyAdminOnOthers"
 
-    def filter(self, message: Message) -> bool:
+    def check(self, message: Message) -> bool:
         if get_debug():
             return True
         if message.reply_to_message is not None:
-            return message.from_user.id in {
-                a.user.id for a in message.chat.get_administrators()
-            }
+            return message.from_user.id in get_admin_ids(message.chat)
 
         return True
 
 
+def get_filter_stats() -> List[Dict]:
+    return metrics.snapshot("filter.")
+
+
 admin_filter = AdminFilter()
 only_admin_on_others = OnlyAdminOnOthersFilter()
 trusted_filter = TrustedFilter()
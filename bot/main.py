@@ -1,15 +1,101 @@
 import logging
+import signal
+from queue import Empty
+from threading import Event, Thread
+from typing import Dict, Optional
 
 import sentry_sdk
+from telegram import Update
+from telegram.error import TelegramError
 from telegram.ext import Updater
 from telegram.ext.dispatcher import DEFAULT_GROUP
+from telegram.utils.request import Request
 
+from cleanup import cleanup
 from config import get_config
+from db.indexes import indexes
+from db.memory import MemoryClient
+from db.mongo import use_client, warm_up
+from outbox import ScheduledBot, WORKERS as OUTBOX_WORKERS
+from persistence import MongoPersistence
+from pipeline import message_pipeline
 from skills import skills, commands_list
+from utils.shutdown import run_shutdown_hooks
+from webhook import WebhookServer
 
 logger = logging.getLogger(__name__)
 
 
+def _start_webhook(updater: Updater, conf: Dict) -> Optional[WebhookServer]:
+    try:
+        server = WebhookServer(
+            conf["WEBHOOK_LISTEN"],
+            conf["WEBHOOK_PORT"],
+            conf["WEBHOOK_PATH"],
+            conf["WEBHOOK_SECRET"],
+            conf["WEBHOOK_QUEUE_SIZE"],
+        )
+    except OSError as err:
+        logger.error("can't start webhook server, falling back to polling: %s", err)
+        return None
+
+    server.start()
+    try:
+        updater.bot.set_webhook(
+            conf["WEBHOOK_URL"].rstrip("/") + server.path,
+            allowed_updates=Update.ALL_TYPES,
+            api_kwargs={"secret_token": conf["WEBHOOK_SECRET"]},
+        )
+    except TelegramError as err:
+        logger.error("can't set webhook, falling back to polling: %s", err)
+        server.stop()
+        return None
+
+    return server
+
+
+def _serve_webhook(updater: Updater, server: WebhookServer):
+    dp = updater.dispatcher
+    stop = Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    updater.job_queue.start()
+    Thread(target=dp.start, name="dispatcher", daemon=True).start()
+
+    while not stop.is_set():
+        try:
+            data = server.get(timeout=1)
+        except Empty:
+            continue
+        dp.update_queue.put(Update.de_json(data, updater.bot))
+
+    logger.info("stopping webhook mode")
+    server.stop()
+    updater.job_queue.stop()
+    dp.stop()
+    if dp.persistence is not None:
+        dp.update_persistence()
+        dp.persistence.flush()
+
+
+def _create_updater(bot: ScheduledBot, mongo_ready: bool) -> Updater:
+    persistence = MongoPersistence("persistence") if mongo_ready else None
+    if persistence is None:
+        logger.error("mongo is unavailable, running without persistence")
+    return Updater(bot=bot, persistence=persistence, use_context=True)
+
+
+def _start_storage(updater: Updater, mongo_ready: bool):
+    if mongo_ready:
+        indexes.ensure()
+        indexes.start(updater.job_queue)
+    cleanup.start(updater.job_queue)
+    persistence = updater.dispatcher.persistence
+    if persistence is not None:
+        persistence.start(updater.job_queue)
+
+
 def main():
     conf = get_config()
 
@@ -26,17 +112,47 @@ def main():
         level=logging.DEBUG if conf["DEBUG"] else logging.INFO,
     )
 
-    updater = Updater(conf["TOKEN"], use_context=True)
+    if conf["MONGO_BACKEND"] == "memory":
+        logger.warning("using in-memory storage, nothing will be persisted")
+        use_client(MemoryClient())
+
+    workers = conf["ASYNC_WORKERS"] if conf["RUNTIME"] == "asyncio" else 4
+    bot = ScheduledBot(
+        conf["TOKEN"],
+        request=Request(con_pool_size=workers + 4 + OUTBOX_WORKERS),
+        chat_cache_ttl=conf["CHAT_CACHE_TTL"],
+    )
+    bot.outbox.start()
+
+    mongo_ready = warm_up()
+    updater = _create_updater(bot, mongo_ready)
 
     for handler_group, skill in enumerate(skills, DEFAULT_GROUP + 1):
         skill["add_handlers"](updater, handler_group)
 
+    message_pipeline.add_handlers(updater, DEFAULT_GROUP + len(skills) + 1)
+    _start_storage(updater, mongo_ready)
+
     logger.info("registering commands: %s", commands_list)
 
     updater.bot.set_my_commands(commands=commands_list)
 
-    updater.start_polling()
-    updater.idle()
+    webhook = _start_webhook(updater, conf) if conf["WEBHOOK_URL"] else None
+
+    try:
+        if conf["RUNTIME"] == "asyncio":
+            from aio import run
+
+            run(updater, conf["ASYNC_WORKERS"], conf["ASYNC_MAX_UPDATES"], webhook)
+        elif webhook is not None:
+            _serve_webhook(updater, webhook)
+        else:
+            updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            updater.idle()
+    finally:
+        run_shutdown_hooks()
+        bot.outbox.stop()
+
 
 if __name__ == "__main__":
     main()
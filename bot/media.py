@@ -0,0 +1,112 @@
+import logging
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Optional
+
+from telegram import Bot, Message
+from telegram.error import BadRequest
+
+from db.mongo import collection
+from utils.metrics import metrics
+from utils.render import RenderedImage
+
+logger = logging.getLogger(__name__)
+
+PHOTO = "photo"
+DOCUMENT = "document"
+
+
+class DB:
+    def __init__(self, db_name: str):
+        self._db_name = db_name
+
+    def find(self, key: str) -> Optional[str]:
+        doc = collection(self._db_name, "file_ids").find_one({"_id": key}, {"file_id": 1})
+        return doc["file_id"] if doc is not None else None
+
+    def save(self, key: str, file_id: str):
+        collection(self._db_name, "file_ids").update_one(
+            {"_id": key},
+            {"$set": {"file_id": file_id, "created": datetime.now()}},
+            upsert=True,
+        )
+
+    def remove(self, key: str):
+        collection(self._db_name, "file_ids").delete_one({"_id": key})
+
+
+def _file_id(message: Message, kind: str) -> Optional[str]:
+    if kind == PHOTO and message.photo:
+        return message.photo[-1].file_id
+    if kind == DOCUMENT and message.document is not None:
+        return message.document.file_id
+    return None
+
+
+class MediaCache:
+    def __init__(self, db: DB):
+        self._db = db
+        self._file_ids: Dict[str, Optional[str]] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        metrics.gauge("media", self.stats)
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._file_ids:
+                return self._file_ids[key]
+        file_id = self._db.find(key)
+        with self._lock:
+            self._file_ids[key] = file_id
+        return file_id
+
+    def _put(self, key: str, file_id: str):
+        with self._lock:
+            self._file_ids[key] = file_id
+        self._db.save(key, file_id)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._file_ids.pop(key, None)
+        self._db.remove(key)
+
+    def _send(self, bot: Bot, kind: str, chat_id: int, media: RenderedImage, **kwargs) -> Message:
+        send = bot.send_photo if kind == PHOTO else bot.send_document
+        key = f"{kind}:{media.digest}"
+
+        file_id = self._get(key)
+        if file_id is not None:
+            try:
+                message = send(chat_id, file_id, **kwargs)
+                self.hits += 1
+                self.bytes_saved += len(media.data)
+                return message
+            except BadRequest as err:
+                logger.info("cached file_id for %s is rejected: %s", key, err)
+                self.invalidate(key)
+
+        self.misses += 1
+        message = send(chat_id, media.open(), **kwargs)
+        file_id = _file_id(message, kind) if isinstance(message, Message) else None
+        if file_id is not None:
+            self._put(key, file_id)
+        return message
+
+    def send_photo(self, bot: Bot, chat_id: int, media: RenderedImage, **kwargs) -> Message:
+        return self._send(bot, PHOTO, chat_id, media, **kwargs)
+
+    def send_document(self, bot: Bot, chat_id: int, media: RenderedImage, **kwargs) -> Message:
+        return self._send(bot, DOCUMENT, chat_id, media, **kwargs)
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._file_ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+media_cache = MediaCache(DB("media"))
@@ -1,6 +1,6 @@
 import logging
 from functools import wraps
-from typing import Callable, List, Optional
+from typing import Any, Callable, List, Optional
 
 from telegram import Update, Message
 from telegram.ext import (
@@ -8,10 +8,11 @@ from telegram.ext import (
     CommandHandler,
     CallbackContext,
     Dispatcher,
-    JobQueue,
+    Handler,
 )
 from telegram.ext.dispatcher import DEFAULT_GROUP
 
+from cleanup import cleanup
 from filters import trusted_filter, admin_filter
 
 logger = logging.getLogger(__name__)
@@ -19,9 +20,26 @@ logger = logging.getLogger(__name__)
 ON, OFF = True, False
 
 
+class _ModeHandler(Handler):
+    def __init__(self, mode: "Mode", handler: Handler):
+        super().__init__(handler.callback, run_async=handler.run_async)
+        self.mode = mode
+        self.handler = handler
+
+    def check_update(self, update: object) -> Optional[Any]:
+        if not isinstance(update, Update) or not self.mode.is_on_for(update):
+            return None
+        return self.handler.check_update(update)
+
+    def collect_additional_context(self, context, update, dispatcher, check_result):
+        self.handler.collect_additional_context(context, update, dispatcher, check_result)
+
+    def handle_update(self, update, dispatcher, check_result, context=None):
+        return self.handler.handle_update(update, dispatcher, check_result, context)
+
+
 class Mode:
     _dp: Dispatcher
-    _mode_handlers: List[CommandHandler] = []
 
     def __init__(
         self,
@@ -39,6 +57,7 @@ class Mode:
         self.on_callback = on_callback
 
         self.handlers_gr = DEFAULT_GROUP
+        self._mode_handlers: List[_ModeHandler] = []
 
     @staticmethod
     def _gen_chat_data_key(mode_name: str) -> str:
@@ -50,15 +69,20 @@ class Mode:
 
         return context.chat_data[self.chat_data_key]
 
+    def is_on(self, context: CallbackContext) -> bool:
+        return self._get_mode_state(context) is ON
+
+    def is_on_for(self, update: Update) -> bool:
+        chat = update.effective_chat
+        if chat is None:
+            return self.default
+        return self._dp.chat_data[chat.id].get(self.chat_data_key, self.default) is ON
+
     def _set_mode(self, state: bool, context: CallbackContext):
-        context.chat_data[self.chat_data_key] = state
-        logger.info("new state: %s", state)
-        if state is ON:
-            self._add_mode_handlers()
-        elif state is OFF:
-            self._remove_mode_handlers()
-        else:
+        if state is not ON and state is not OFF:
             raise ValueError(f"wrong mode state. expect [True, False], got: {state}")
+        context.chat_data[self.chat_data_key] = state
+        logger.info("new %s state: %s", self.name, state)
 
     def _add_on_off_handlers(self):
         self._dp.add_handler(
@@ -84,11 +108,13 @@ class Mode:
             self.handlers_gr,
         )
 
-    def _remove_mode_handlers(self):
-        for h in self._mode_handlers:
+    def _gate_mode_handlers(self, handlers: List[Handler]):
+        for h in handlers:
             self._dp.remove_handler(h, self.handlers_gr)
 
-    def _add_mode_handlers(self):
+        self._add_on_off_handlers()
+
+        self._mode_handlers = [_ModeHandler(self, h) for h in handlers]
         for h in self._mode_handlers:
             self._dp.add_handler(h, self.handlers_gr)
 
@@ -105,13 +131,13 @@ class Mode:
                     logger.error("can't eval mode_on callback: %s", err)
                     raise err
 
-            msg = context.bot.send_message(
-                update.effective_chat.id, f"{self.name} is ON"
-            )
+            chat_id = update.effective_chat.id
             if self.pin_info_msg is True:
-                context.bot.pin_chat_message(
-                    update.effective_chat.id, msg.message_id, disable_notification=True
-                )
+                # pinning needs the sent message id, so this send has to block
+                msg = context.bot.send_message(chat_id, f"{self.name} is ON")
+                context.bot.pin_chat_message(chat_id, msg.message_id, disable_notification=True)
+            else:
+                context.bot.post_message(chat_id, f"{self.name} is ON")
 
     def _mode_off(self, update: Update, context: CallbackContext):
         logger.info("%s switch to OFF", self.name)
@@ -126,7 +152,7 @@ class Mode:
                     logger.error("can't eval mode_off callback: %s", err)
                     raise err
 
-            context.bot.send_message(update.effective_chat.id, f"{self.name} is OFF")
+            context.bot.post_message(update.effective_chat.id, f"{self.name} is OFF")
             if self.pin_info_msg is True:
                 context.bot.unpin_chat_message(update.effective_chat.id)
 
@@ -134,7 +160,7 @@ class Mode:
         status = "ON" if self._get_mode_state(context) is ON else "OFF"
         msg = f"{self.name} status is {status}"
         logger.info(msg)
-        context.bot.send_message(update.effective_chat.id, msg)
+        context.bot.post_message(update.effective_chat.id, msg)
 
     def add(self, func) -> Callable:
         @wraps(func)
@@ -145,47 +171,35 @@ class Mode:
             logger.info("adding users handlers...")
             func(upd, self.handlers_gr)
 
-            if self.handlers_gr in upd.dispatcher.handlers:
-                self._mode_handlers = upd.dispatcher.handlers[self.handlers_gr].copy()
-            logger.info(
-                "registered %d %s handlers", len(self._mode_handlers), self.name
-            )
-
-            self._add_on_off_handlers()
-            self._remove_mode_handlers()
+            handlers = upd.dispatcher.handlers.get(self.handlers_gr, []).copy()
+            logger.info("registered %d %s handlers", len(handlers), self.name)
 
-            if self.default is True:
-                self._add_mode_handlers()
+            self._gate_mode_handlers(handlers)
 
         return wrapper
 
 
 def cleanup_queue_update(
-    queue: JobQueue,
     cmd: Optional[Message],
     result: Optional[Message],
     seconds: int,
     remove_cmd=True,
     remove_reply=False,
 ):
-    _remove_message_after(result, queue, seconds)
+    _remove_message_after(result, seconds)
 
     if remove_cmd and cmd:
-        _remove_message_after(cmd, queue, seconds)
+        _remove_message_after(cmd, seconds)
 
     if remove_reply and cmd and cmd.reply_to_message:
         reply: Message = cmd.reply_to_message
-        _remove_message_after(reply, queue, seconds)
+        _remove_message_after(reply, seconds)
 
 
-def _remove_message_after(message: Message, job_queue: JobQueue, seconds: int):
-    logger.debug(
-        "Scheduling cleanup of message %s \
-                   in %d seconds",
-        message,
-        seconds,
-    )
-    job_queue.run_once(lambda _: message.delete(), seconds, context=message.chat_id)
+def _remove_message_after(message: Optional[Message], seconds: int):
+    if message is None:
+        return
+    cleanup.schedule(message.chat_id, message.message_id, seconds)
 
 
 __all__ = ["Mode", "cleanup_queue_update", "ON", "OFF"]
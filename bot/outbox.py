@@ -0,0 +1,397 @@
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from functools import partial
+from itertools import count
+from threading import Condition, Lock, Thread
+from time import monotonic, perf_counter
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from telegram import Chat, User
+from telegram.error import BadRequest, RetryAfter, TimedOut
+from telegram.ext import ExtBot
+from telegram.utils.helpers import DEFAULT_NONE
+
+from utils.cache import TTLCache
+from utils.metrics import metrics
+from utils.rate import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MODERATION, REPLY, COSMETIC = 0, 10, 20
+
+WORKERS = 4
+GLOBAL_RATE = 30
+CHAT_RATE = 20 / 60
+CHAT_BURST = 10
+MAX_DELETE_BATCH = 100
+MAX_RETRIES = 3
+SEND_TIMEOUT = 10
+ME_CACHE_TTL = 24 * 60 * 60
+CHAT_CACHE_TTL = 60 * 60
+
+ChatId = Union[int, str, None]
+
+
+class _Job:
+    def __init__(
+        self,
+        seq: int,
+        priority: int,
+        chat_id: ChatId,
+        call: Callable[[], Any],
+        message_id: Optional[int] = None,
+    ):
+        self.seq = seq
+        self.priority = priority
+        self.chat_id = chat_id
+        self.call = call
+        self.message_id = message_id
+        self.future: Future = Future()
+        self.enqueued = monotonic()
+        self.retries = 0
+
+    @property
+    def is_delete(self) -> bool:
+        return self.message_id is not None
+
+    def key(self) -> Tuple[int, int]:
+        return self.priority, self.seq
+
+
+class Outbox:
+    def __init__(
+        self,
+        delete_batch: Callable[[ChatId, List[int]], Any],
+        workers: int = WORKERS,
+        global_rate: float = GLOBAL_RATE,
+        chat_rate: float = CHAT_RATE,
+        chat_burst: float = CHAT_BURST,
+    ):
+        self._delete_batch = delete_batch
+        self._workers = workers
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[ChatId, TokenBucket] = {}
+        self._paused: Dict[ChatId, float] = {}
+        self._busy: Set[ChatId] = set()
+        self._queue: List[_Job] = []
+        self._seq = count()
+        self._cond = Condition()
+        self._threads: List[Thread] = []
+        self._running = False
+        self.max_depth = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.wait_stats = metrics.latency("outbox.wait")
+        self.call_stats = metrics.latency("outbox.call")
+        metrics.gauge("outbox", self.stats)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self._workers):
+            thread = Thread(target=self._work, name=f"outbox_{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy, timeout)
+
+    def _put(self, job: _Job) -> Future:
+        with self._cond:
+            self._queue.append(job)
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify()
+        if not self._running:
+            self.start()
+        return job.future
+
+    def submit(self, chat_id: ChatId, priority: int, call: Callable[[], Any]) -> Future:
+        return self._put(_Job(next(self._seq), priority, chat_id, call))
+
+    def delete(
+        self,
+        chat_id: ChatId,
+        message_id: int,
+        call: Callable[[], Any],
+        priority: int = MODERATION,
+    ) -> Future:
+        return self._put(_Job(next(self._seq), priority, chat_id, call, message_id))
+
+    def cancel(self, future: Future) -> bool:
+        with self._cond:
+            for job in self._queue:
+                if job.future is future:
+                    self._queue.remove(job)
+                    self._cond.notify_all()
+                    return future.cancel()
+        return False
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict:
+        return {
+            "depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "paused_chats": sum(1 for t in self._paused.values() if t > monotonic()),
+        }
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        if chat_id not in self._chats:
+            self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst)
+        return self._chats[chat_id]
+
+    def _next(self) -> Tuple[Optional[_Job], Optional[float]]:
+        if not self._queue:
+            return None, None
+
+        global_delay = self._global.delay()
+        if global_delay > 0:
+            return None, global_delay
+
+        now = monotonic()
+        wait: Optional[float] = None
+        for job in sorted(self._queue, key=_Job.key):
+            if job.chat_id in self._busy:
+                continue
+            delay = max(self._paused.get(job.chat_id, 0) - now, 0)
+            if not job.is_delete:
+                delay = max(delay, self._chat_bucket(job.chat_id).delay())
+            if delay == 0:
+                return job, None
+            wait = delay if wait is None else min(wait, delay)
+
+        return None, wait
+
+    def _take(self, job: _Job) -> List[_Job]:
+        self._queue.remove(job)
+        batch = [job]
+
+        if job.is_delete:
+            for other in sorted(self._queue, key=_Job.key):
+                if len(batch) >= MAX_DELETE_BATCH:
+                    break
+                if other.is_delete and other.chat_id == job.chat_id:
+                    batch.append(other)
+            for other in batch[1:]:
+                self._queue.remove(other)
+            self.coalesced += len(batch) - 1
+        else:
+            self._chat_bucket(job.chat_id).consume()
+
+        self._global.consume()
+        self._busy.add(job.chat_id)
+        return batch
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._running and not self._queue:
+                        return
+                    job, wait = self._next()
+                    if job is not None:
+                        break
+                    self._cond.wait(timeout=wait)
+                batch = self._take(job)
+
+            try:
+                self._execute(batch)
+            finally:
+                with self._cond:
+                    self._busy.discard(job.chat_id)
+                    self._cond.notify_all()
+
+    def _execute(self, batch: List[_Job]):
+        now = monotonic()
+        for job in batch:
+            self.wait_stats.observe(now - job.enqueued)
+
+        start = perf_counter()
+        try:
+            result = self._call(batch)
+        except Exception as err:
+            self.call_stats.observe(perf_counter() - start, ok=False)
+            self._fail(batch, err)
+            return
+
+        self.call_stats.observe(perf_counter() - start)
+        for job in batch:
+            job.future.set_result(result)
+
+    def _call(self, batch: List[_Job]) -> Any:
+        if len(batch) == 1:
+            return batch[0].call()
+        return self._delete_batch(batch[0].chat_id, [j.message_id for j in batch])
+
+    def _fail(self, batch: List[_Job], err: Exception):
+        if isinstance(err, RetryAfter):
+            self._retry(batch, err)
+        elif isinstance(err, BadRequest) and len(batch) > 1:
+            logger.info("batch delete failed, deleting one by one: %s", err)
+            for job in batch:
+                self._resolve(job, job.call)
+        else:
+            for job in batch:
+                job.future.set_exception(err)
+
+    @staticmethod
+    def _resolve(job: _Job, call: Callable[[], Any]):
+        try:
+            job.future.set_result(call())
+        except Exception as err:
+            job.future.set_exception(err)
+
+    def _retry(self, batch: List[_Job], err: RetryAfter):
+        chat_id = batch[0].chat_id
+        logger.warning("flood limit in chat %s, retry after %ss", chat_id, err.retry_after)
+        with self._cond:
+            self._paused[chat_id] = monotonic() + err.retry_after
+            self.retries += 1
+            for job in batch:
+                job.retries += 1
+                if job.retries > MAX_RETRIES:
+                    job.future.set_exception(err)
+                else:
+                    self._queue.append(job)
+            self._cond.notify_all()
+
+
+def _log_failure(future: Future):
+    err = future.exception()
+    if err is not None:
+        logger.info("outbox call failed: %s", err)
+
+
+class ScheduledBot(ExtBot):
+    def __init__(self, *args, chat_cache_ttl: float = CHAT_CACHE_TTL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outbox = Outbox(self.delete_messages)
+        self._me = TTLCache("bot.me", ME_CACHE_TTL)
+        self._chats = TTLCache("bot.chats", chat_cache_ttl)
+        self._chat_keys: Dict[int, Set[ChatId]] = {}
+        self._chat_keys_lock = Lock()
+        metrics.gauge("bot.metadata", self.metadata_stats)
+
+    def get_me(self, timeout=DEFAULT_NONE, api_kwargs: Dict = None) -> User:
+        return self._me.get("me", partial(super().get_me, timeout, api_kwargs))
+
+    def get_chat(self, chat_id, timeout=DEFAULT_NONE, api_kwargs: Dict = None) -> Chat:
+        chat = self._chats.get(chat_id, partial(super().get_chat, chat_id, timeout, api_kwargs))
+        if chat.id != chat_id:
+            self._chats.set(chat.id, chat)
+            with self._chat_keys_lock:
+                self._chat_keys.setdefault(chat.id, {chat.id}).add(chat_id)
+        return chat
+
+    def invalidate_me(self):
+        self._me.clear()
+
+    def invalidate_chat(self, chat_id: ChatId):
+        with self._chat_keys_lock:
+            owner = next((i for i, keys in self._chat_keys.items() if chat_id in keys), chat_id)
+            keys = self._chat_keys.pop(owner, {chat_id})
+        for key in keys:
+            self._chats.invalidate(key)
+
+    def metadata_stats(self) -> Dict:
+        me, chats = self._me.stats(), self._chats.stats()
+        return {
+            "chats": chats["size"],
+            "calls": me["misses"] + chats["misses"],
+            "saved": me["hits"] + me["shared"] + chats["hits"] + chats["shared"],
+        }
+
+    def _wait(self, chat_id: ChatId, future: Future) -> Any:
+        try:
+            return future.result(timeout=SEND_TIMEOUT)
+        except FutureTimeout as err:
+            if not self.outbox.cancel(future):
+                return future.result()
+            logger.warning("outbox is busy in chat %s, dropped the queued call", chat_id)
+            raise TimedOut() from err
+
+    def _schedule(self, chat_id: ChatId, priority: int, call: Callable[[], Any]) -> Any:
+        return self._wait(chat_id, self.outbox.submit(chat_id, priority, call))
+
+    def post_message(self, chat_id: ChatId, text: str, **kwargs) -> Future:
+        call = partial(super().send_message, chat_id, text, **kwargs)
+        future = self.outbox.submit(chat_id, REPLY, call)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def delete_messages(self, chat_id: ChatId, message_ids: List[int]) -> bool:
+        return self._post("deleteMessages", {"chat_id": chat_id, "message_ids": message_ids})
+
+    def schedule_delete(self, chat_id: ChatId, message_id: int) -> Future:
+        call = partial(super().delete_message, chat_id, message_id)
+        future = self.outbox.delete(chat_id, message_id, call, priority=COSMETIC)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def post_delete(self, chat_id: ChatId, message_id: int) -> Future:
+        call = partial(super().delete_message, chat_id, message_id)
+        future = self.outbox.delete(chat_id, message_id, call)
+        future.add_done_callback(_log_failure)
+        return future
+
+    def delete_message(self, chat_id, message_id, *args, **kwargs) -> bool:
+        call = partial(super().delete_message, chat_id, message_id, *args, **kwargs)
+        return self._wait(chat_id, self.outbox.delete(chat_id, message_id, call))
+
+    def restrict_chat_member(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, MODERATION, partial(super().restrict_chat_member, chat_id, *args, **kwargs)
+        )
+
+    def kick_chat_member(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, MODERATION, partial(super().kick_chat_member, chat_id, *args, **kwargs)
+        )
+
+    def send_message(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, REPLY, partial(super().send_message, chat_id, *args, **kwargs)
+        )
+
+    def send_photo(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, REPLY, partial(super().send_photo, chat_id, *args, **kwargs)
+        )
+
+    def send_document(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, REPLY, partial(super().send_document, chat_id, *args, **kwargs)
+        )
+
+    def edit_message_text(self, text, chat_id=None, *args, **kwargs):
+        return self._schedule(
+            chat_id,
+            COSMETIC,
+            partial(super().edit_message_text, text, chat_id, *args, **kwargs),
+        )
+
+    def pin_chat_message(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, COSMETIC, partial(super().pin_chat_message, chat_id, *args, **kwargs)
+        )
+
+    def unpin_chat_message(self, chat_id, *args, **kwargs):
+        return self._schedule(
+            chat_id, COSMETIC, partial(super().unpin_chat_message, chat_id, *args, **kwargs)
+        )
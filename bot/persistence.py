@@ -0,0 +1,138 @@
+import logging
+from collections import defaultdict
+from copy import deepcopy
+from threading import Lock
+from typing import Callable, DefaultDict, Dict, Hashable, Optional, Tuple
+
+from pymongo import ReplaceOne
+from pymongo.database import Database
+from telegram.ext import BasePersistence, CallbackContext, JobQueue
+from telegram.ext.utils.types import ConversationDict
+
+from db.mongo import get_db
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 30
+
+CHAT_DATA = "chat_data"
+USER_DATA = "user_data"
+BOT_DATA = "bot_data"
+
+
+class _LazyData(defaultdict):
+    def __init__(self, load: Callable[[int], Dict]):
+        super().__init__(dict)
+        self._load = load
+        self._lock = Lock()
+
+    def __missing__(self, key: int) -> Dict:
+        with self._lock:
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+            value = self._load(key)
+            self[key] = value
+            return value
+
+
+class MongoPersistence(BasePersistence):
+    def __init__(self, db_name: str, flush_interval: int = FLUSH_INTERVAL):
+        super().__init__(store_user_data=True, store_chat_data=True, store_bot_data=True)
+        self.db_name = db_name
+        self.flush_interval = flush_interval
+        self._known: Dict[Tuple[str, Hashable], Dict] = {}
+        self._dirty: Dict[Tuple[str, Hashable], Dict] = {}
+        self._lock = Lock()
+        self._conversations: Dict[str, ConversationDict] = {}
+        self.loads = 0
+        self.flushed = 0
+        metrics.gauge("persistence", self.stats)
+
+    @property
+    def _db(self) -> Database:
+        return get_db(self.db_name)
+
+    def insert_bot(self, obj: object) -> object:
+        return obj
+
+    @classmethod
+    def replace_bot(cls, obj: object) -> object:
+        return obj
+
+    def start(self, job_queue: JobQueue):
+        job_queue.run_repeating(self._flush_job, interval=self.flush_interval, first=self.flush_interval)
+
+    def _load(self, kind: str, key: Hashable) -> Dict:
+        doc = self._db[kind].find_one({"_id": key})
+        data = doc["data"] if doc is not None else {}
+        with self._lock:
+            self.loads += 1
+            self._known[(kind, key)] = deepcopy(data)
+        return data
+
+    def _mark(self, kind: str, key: Hashable, data: Dict):
+        try:
+            snapshot = deepcopy(data)
+        except RuntimeError as err:
+            logger.debug("%s %s changed while copying, skipping: %s", kind, key, err)
+            return
+
+        with self._lock:
+            if self._known.get((kind, key)) == snapshot:
+                return
+            self._known[(kind, key)] = snapshot
+            self._dirty[(kind, key)] = snapshot
+
+    def get_chat_data(self) -> DefaultDict[int, Dict]:
+        return _LazyData(lambda chat_id: self._load(CHAT_DATA, chat_id))
+
+    def get_user_data(self) -> DefaultDict[int, Dict]:
+        return _LazyData(lambda user_id: self._load(USER_DATA, user_id))
+
+    def get_bot_data(self) -> Dict:
+        return self._load(BOT_DATA, BOT_DATA)
+
+    def get_conversations(self, name: str) -> ConversationDict:
+        return self._conversations.setdefault(name, {})
+
+    def update_conversation(self, name: str, key: Tuple[int, ...], new_state: Optional[object]):
+        self._conversations.setdefault(name, {})[key] = new_state
+
+    def update_chat_data(self, chat_id: int, data: Dict):
+        self._mark(CHAT_DATA, chat_id, data)
+
+    def update_user_data(self, user_id: int, data: Dict):
+        self._mark(USER_DATA, user_id, data)
+
+    def update_bot_data(self, data: Dict):
+        self._mark(BOT_DATA, BOT_DATA, data)
+
+    def _flush_job(self, _: CallbackContext):
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+
+        by_kind: Dict[str, list] = defaultdict(list)
+        for (kind, key), data in dirty.items():
+            by_kind[kind].append(ReplaceOne({"_id": key}, {"_id": key, "data": data}, upsert=True))
+
+        for kind, requests in by_kind.items():
+            try:
+                self._db[kind].bulk_write(requests, ordered=False)
+                self.flushed += len(requests)
+            except Exception as err:
+                logger.error("can't flush %d %s documents: %s", len(requests), kind, err)
+                with self._lock:
+                    for (k, key), data in dirty.items():
+                        if k == kind:
+                            self._dirty.setdefault((k, key), data)
+
+        logger.debug("flushed %d persistence documents", len(dirty))
+
+    def stats(self) -> Dict:
+        return {"loads": self.loads, "dirty": len(self._dirty), "flushed": self.flushed}
@@ -0,0 +1,137 @@
+import logging
+from time import perf_counter
+from typing import Callable, List, Optional
+
+from telegram import Update, User
+from telegram.ext import BaseFilter, CallbackContext, Filters, MessageHandler, Updater
+
+from mode import Mode
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineMessage:
+    def __init__(self, update: Update):
+        message = update.effective_message
+        self.update = update
+        self.chat_id: int = update.effective_chat.id
+        self.message_id: int = message.message_id
+        self.user: User = update.effective_user
+        self.text: Optional[str] = message.text
+        self.delete = False
+        self.repost = False
+        self.stop = False
+        self.replies: List[str] = []
+        self._wrappers: List[Callable[[str], str]] = []
+
+    def rewrite(self, text: str, wrapper: Optional[Callable[[str], str]] = None):
+        self.text = text
+        self.delete = True
+        self.repost = True
+        if wrapper is not None:
+            self._wrappers.append(wrapper)
+
+    def drop(self):
+        self.delete = True
+        self.repost = False
+        self.stop = True
+
+    def reply(self, text: str):
+        self.replies.append(text)
+
+    def render(self) -> str:
+        text = self.text or ""
+        for wrap in self._wrappers:
+            text = wrap(text)
+        return text
+
+
+Stage = Callable[[PipelineMessage, CallbackContext], None]
+
+
+class _Stage:
+    def __init__(
+        self,
+        name: str,
+        callback: Stage,
+        mode: Optional[Mode],
+        filters: Optional[BaseFilter],
+        order: int,
+    ):
+        self.name = name
+        self.callback = callback
+        self.mode = mode
+        self.filters = filters
+        self.order = order
+        self.stats = metrics.latency(f"pipeline.{name}")
+
+    def applies(self, update: Update, context: CallbackContext) -> bool:
+        if self.mode is not None and not self.mode.is_on(context):
+            return False
+        return self.filters is None or bool(self.filters(update))
+
+
+class MessagePipeline:
+    def __init__(self):
+        self._stages: List[_Stage] = []
+        self.stats = metrics.latency("pipeline.total")
+
+    def add_stage(
+        self,
+        name: str,
+        callback: Stage,
+        mode: Optional[Mode] = None,
+        filters: Optional[BaseFilter] = None,
+        order: int = 100,
+    ):
+        logger.info("adding pipeline stage %s", name)
+        self._stages.append(_Stage(name, callback, mode, filters, order))
+        self._stages.sort(key=lambda s: s.order)
+
+    def add_handlers(self, upd: Updater, handlers_group: int):
+        logger.info("registering message pipeline with %d stages", len(self._stages))
+        upd.dispatcher.add_handler(
+            MessageHandler(Filters.all, self.process, run_async=True), handlers_group
+        )
+
+    def process(self, update: Update, context: CallbackContext):
+        start = perf_counter()
+        msg = PipelineMessage(update)
+
+        for stage in self._stages:
+            if msg.stop:
+                break
+            if not stage.applies(update, context):
+                continue
+
+            stage_start = perf_counter()
+            try:
+                stage.callback(msg, context)
+                stage.stats.observe(perf_counter() - stage_start)
+            except Exception as err:
+                stage.stats.observe(perf_counter() - stage_start, ok=False)
+                logger.error("pipeline stage %s failed: %s", stage.name, err)
+
+        self._apply(msg, context)
+        self.stats.observe(perf_counter() - start)
+
+    @staticmethod
+    def _apply(msg: PipelineMessage, context: CallbackContext):
+        if msg.delete:
+            context.bot.post_delete(msg.chat_id, msg.message_id)
+
+        if msg.repost:
+            context.bot.post_message(msg.chat_id, msg.render())
+
+        for text in msg.replies:
+            context.bot.post_message(
+                msg.chat_id,
+                text,
+                reply_to_message_id=None if msg.delete else msg.message_id,
+            )
+
+
+message_pipeline = MessagePipeline()
+
+__all__ = ["message_pipeline", "PipelineMessage"]
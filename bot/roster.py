@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+from threading import Lock
+from time import time
+from typing import Dict, Optional, Set, Tuple
+
+from telegram import ChatMember, ChatMemberUpdated
+
+from db.mongo import collection
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Member = Tuple[str, Optional[float]]
+
+
+class DB:
+    def __init__(self, db_name: str):
+        self._db_name = db_name
+
+    def find_all(self):
+        return collection(self._db_name, "members").find({})
+
+    def save(self, chat_id: int, user_id: int, status: str, until: Optional[float]):
+        collection(self._db_name, "members").update_one(
+            {"_id": f"{chat_id}:{user_id}"},
+            {
+                "$set": {
+                    "chat_id": chat_id,
+                    "user_id": user_id,
+                    "status": status,
+                    "until": until,
+                }
+            },
+            upsert=True,
+        )
+
+
+class ChatRoster:
+    def __init__(self, db: DB):
+        self._db = db
+        self._members: Dict[int, Dict[int, Member]] = {}
+        self._loaded = False
+        self._lock = Lock()
+        self.updates = 0
+        metrics.gauge("roster", self.stats)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        members: Dict[int, Dict[int, Member]] = {}
+        for doc in self._db.find_all():
+            members.setdefault(doc["chat_id"], {})[doc["user_id"]] = (doc["status"], doc["until"])
+        self._members = members
+        self._loaded = True
+        logger.info("roster loaded for %d chats", len(members))
+
+    def set(self, chat_id: int, user_id: int, status: str, until: Optional[datetime] = None):
+        member = (status, until.timestamp() if until is not None else None)
+        with self._lock:
+            self._ensure_loaded()
+            chat = self._members.setdefault(chat_id, {})
+            if chat.get(user_id) == member:
+                return
+            chat[user_id] = member
+            self.updates += 1
+        self._db.save(chat_id, user_id, *member)
+
+    def track(self, member_update: ChatMemberUpdated):
+        member = member_update.new_chat_member
+        self.set(
+            member_update.chat.id,
+            member.user.id,
+            member.status,
+            getattr(member, "until_date", None),
+        )
+
+    def restricted(self, chat_id: int) -> Set[int]:
+        now = time()
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                user_id
+                for user_id, (status, until) in self._members.get(chat_id, {}).items()
+                if status == ChatMember.RESTRICTED and (not until or until > now)
+            }
+
+    def stats(self) -> Dict:
+        return {
+            "chats": len(self._members),
+            "members": sum(len(c) for c in self._members.values()),
+            "updates": self.updates,
+        }
+
+
+roster = ChatRoster(DB("roster"))
@@ -61,7 +61,6 @@ def _version(update: Update, context: CallbackContext):
     )
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -112,6 +111,7 @@ commands_list: List[Tuple[str, str]] = [
     ("length", "узнать свой размер 🍆"),
     ("longest", "узнать самый длинный 🍆"),
     ("namaz", "получить время намаза 🙏"),
+    ("namaz_city", "выбрать город для намаза 🕌"),
     ("timer", "запустить таймер")
 ]
 
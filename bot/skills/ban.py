@@ -24,7 +24,6 @@ def ban(update: Union[str, Update], context: CallbackContext):
             chat_id, f"Пользователь {user.name} был забанен"
         )
         cleanup_queue_update(
-            context.job_queue,
             update.message,
             result,
             600,
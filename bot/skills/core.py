@@ -1,7 +1,17 @@
 import logging
 
-from telegram import Update
-from telegram.ext import CommandHandler, Updater, CallbackContext
+from telegram import Update, ChatMember, ChatMemberUpdated
+from telegram.ext import CommandHandler, Updater, CallbackContext, ChatMemberHandler
+
+from db.monitoring import get_query_stats, get_slow_queries
+from filters import chat_admins
+from roster import roster
+from utils.metrics import metrics
+
+ADMIN_STATUSES = {ChatMember.ADMINISTRATOR, ChatMember.CREATOR}
+METRICS_LOG_INTERVAL = 60 * 60
+QUERY_LOG_INTERVAL = 10 * 60
+QUERY_LOG_TOP = 10
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +21,19 @@ def add_core(upd: Updater, core_handlers_group: int):
     dp = upd.dispatcher
     dp.add_handler(CommandHandler("start", start, run_async=True), core_handlers_group)
     dp.add_handler(CommandHandler("help", help_, run_async=True), core_handlers_group)
+    dp.add_handler(
+        ChatMemberHandler(
+            on_chat_member, ChatMemberHandler.ANY_CHAT_MEMBER, run_async=True
+        ),
+        core_handlers_group,
+    )
+
+    upd.job_queue.run_repeating(
+        log_metrics, interval=METRICS_LOG_INTERVAL, first=METRICS_LOG_INTERVAL
+    )
+    upd.job_queue.run_repeating(
+        log_queries, interval=QUERY_LOG_INTERVAL, first=QUERY_LOG_INTERVAL
+    )
 
 
 def start(update: Update, _: CallbackContext):
@@ -40,5 +63,35 @@ def help_(update: Update, _: CallbackContext):
     )
 
 
+def on_chat_member(update: Update, context: CallbackContext):
+    member_update = update.chat_member or update.my_chat_member
+    roster.track(member_update)
+    refresh_admins(update, member_update)
+    if update.my_chat_member is not None:
+        context.bot.invalidate_chat(update.effective_chat.id)
+
+
+def refresh_admins(update: Update, member_update: ChatMemberUpdated):
+    statuses = {
+        member_update.old_chat_member.status,
+        member_update.new_chat_member.status,
+    }
+    if statuses & ADMIN_STATUSES:
+        logger.info("admins of %s changed, dropping cache", update.effective_chat.id)
+        chat_admins.invalidate(update.effective_chat.id)
+
+
+def log_metrics(_: CallbackContext):
+    metrics.log_summary()
+
+
+def log_queries(_: CallbackContext):
+    for s in get_query_stats()[:QUERY_LOG_TOP]:
+        logger.info("mongo: %s", s)
+    slow = get_slow_queries()
+    if slow:
+        logger.info("mongo: %d slow commands, latest: %s", len(slow), slow[-1])
+
+
 def error(update: Update, context: CallbackContext):
     logger.warning('Update "%s" caused error "%s"', update, context.error)
@@ -1,7 +1,6 @@
 import logging
 
 from telegram import Update
-from telegram.error import BadRequest
 from telegram.ext import Updater, CommandHandler, CallbackContext
 
 from filters import trusted_filter, admin_filter
@@ -27,10 +26,7 @@ def kebab(update: Update, context: CallbackContext):
     text = " ".join(context.args)
     chat_id = update.effective_chat.id
 
-    try:
-        context.bot.delete_message(chat_id, update.effective_message.message_id)
-    except BadRequest as err:
-        logger.info("can't delete msg: %s", err)
+    context.bot.post_delete(chat_id, update.effective_message.message_id)
 
     if text:
-        context.bot.send_message(chat_id, text)
+        context.bot.post_message(chat_id, text)
@@ -2,12 +2,11 @@ import logging
 from typing import Callable
 
 from google.cloud import translate
-from telegram import Update, User
-from telegram.error import BadRequest, TelegramError
-from telegram.ext import Updater, MessageHandler, Filters, CallbackContext
+from telegram.ext import Updater, Filters, CallbackContext
 
 from config import get_project_id
 from mode import Mode, OFF
+from pipeline import message_pipeline, PipelineMessage
 
 logger = logging.getLogger(__name__)
 
@@ -17,39 +16,23 @@ mode = Mode(mode_name="kek_mode", default=OFF, pin_info_msg=True)
 @mode.add
 def add_kek_mode(upd: Updater, handlers_group: int):
     logger.info("registering kek handlers")
-    dp = upd.dispatcher
-
-    dp.add_handler(
-        MessageHandler(
-            ~Filters.status_update,
-            kek,
-            run_async=True,
-        ),
-        handlers_group,
+    message_pipeline.add_stage(
+        "kek",
+        kek,
+        mode=mode,
+        filters=Filters.text & ~Filters.status_update,
+        order=40,
     )
 
 
-def kek(update: Update, context: CallbackContext):
-    text = update.message["text"]
-    user: User = update.effective_user
-    chat_id = update.effective_chat.id
-
-    try:
-        context.bot.delete_message(chat_id, update.effective_message.message_id)
-    except (BadRequest, TelegramError) as err:
-        logger.info("can't delete msg: %s", err)
-
-    number = sum([ord(c) for c in user.full_name])
+def kek(msg: PipelineMessage, _: CallbackContext):
+    name = msg.user.full_name
+    number = sum([ord(c) for c in name])
     languages = ["ti", "tr", "fi", "vi", "pa", "kn", "da", "mn", "zh-CN", "kk", "no", "ja"]
     language = languages[number % len(languages)]
     emoji = chr(ord("😀") + number % 75)
 
-    try:
-        context.bot.send_message(
-            chat_id, f"{emoji} {user.full_name}: {translation(text, language)}"
-        )
-    except TelegramError as err:
-        logger.info("can't translate msg: %s, because of: %s", text, err)
+    msg.rewrite(translation(msg.text, language), lambda text: f"{emoji} {name}: {text}")
 
 
 def f(text: str, language: str) -> str:
@@ -8,9 +8,8 @@ from mode import cleanup_queue_update
 
 from skills.roll import get_username
 
-from db.mongo import get_db
+from db.mongo import collection
 import pymongo
-from pymongo.collection import Collection
 from pymongo.results import UpdateResult
 
 logger = logging.getLogger(__name__)
@@ -45,13 +44,14 @@ def add_length(upd: Updater, handlers_group: int):
 
 class DB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).peninsulas
+        self._db_name = db_name
 
     def get_best_n(self, n: int = 10) -> List[PeninsulaDataType]:
-        return list(self._coll.find({}).sort("_id", pymongo.ASCENDING).limit(n))
+        peninsulas = collection(self._db_name, "peninsulas")
+        return list(peninsulas.find({}).sort("_id", pymongo.ASCENDING).limit(n))
 
     def add(self, user: User) -> UpdateResult:
-        return self._coll.update_one(
+        return collection(self._db_name, "peninsulas").update_one(
             {
                 "_id": int(user.id),
             },
@@ -80,7 +80,6 @@ def _length(update: Update, context: CallbackContext):
     _db.add(user)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -107,7 +106,6 @@ def _longest(update: Update, context: CallbackContext):
     )
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
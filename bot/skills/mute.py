@@ -3,11 +3,12 @@ from datetime import datetime, timedelta
 from random import choice
 from typing import List
 
-from telegram import Update, User, ChatPermissions, TelegramError
+from telegram import Update, User, ChatMember, ChatPermissions, TelegramError
 from telegram.ext import Updater, CommandHandler, CallbackContext
 
 from filters import admin_filter
 from mode import cleanup_queue_update
+from roster import roster
 from utils.time import get_duration
 
 logger = logging.getLogger(__name__)
@@ -71,6 +72,7 @@ def mute_user_for_time(
         context.bot.restrict_chat_member(
             update.effective_chat.id, user.id, mute_perm, until
         )
+        roster.set(update.effective_chat.id, user.id, ChatMember.RESTRICTED, until)
     except TelegramError as err:
         logger.error("can't mute user %s: %s", user, err)
         update.message.reply_text(f"Не получилось, потому что: \n\n{err}")
@@ -95,7 +97,6 @@ def mute_self(update: Update, context: CallbackContext):
     result = update.message.reply_text(choice(self_mute_messages))
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         600,
@@ -116,6 +117,7 @@ def unmute_user(update: Update, context: CallbackContext, user: User) -> None:
             can_invite_users=True,
         )
         context.bot.restrict_chat_member(update.effective_chat.id, user.id, unmute_perm)
+        roster.set(update.effective_chat.id, user.id, ChatMember.MEMBER)
     except TelegramError as err:
         update.message.reply_text(f"Не получилось, потому что: \n\n{err}")
 
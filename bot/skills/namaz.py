@@ -1,77 +1,218 @@
 import logging
 import cloudscraper
 import math
+import re
 
-from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+from datetime import date, datetime, timedelta, timezone
+from threading import Lock
 
-from telegram import Update, Message
-from telegram.ext import Updater, CommandHandler, CallbackContext
-from pymongo.collection import Collection
+from telegram import Bot, Update, Message
+from telegram.error import TelegramError
+from telegram.ext import Updater, CommandHandler, CallbackContext, JobQueue
+from pymongo import ASCENDING, DESCENDING, ReplaceOne
 
 from mode import cleanup_queue_update
 
-from config import get_config
-from db.mongo import get_db
-from typing import List, Dict, Optional
+from config import get_group_chat_id, get_namaz_source
+from db.indexes import indexes
+from db.mongo import collection
+from filters import admin_filter
+from utils.metrics import metrics
+from utils.prayer_times import (
+    FINIKE,
+    LOCATIONS,
+    Location,
+    Timetable,
+    compute_timetable,
+    get_location,
+)
+from typing import List, Dict, Optional, Set, Tuple
 
 logger = logging.getLogger(__name__)
 scraper = cloudscraper.create_scraper()
 update_delta = timedelta(minutes=10)
 
+DATE_FORMAT = "%d.%m.%Y"
+TIME_FORMAT = "%H:%M"
+NOTIFICATIONS_JOB = "namaz_notifications"
+TIMETABLE_URL = "https://namazvakitleri.diyanet.gov.tr/en-US/{id}/prayer-time-for-{name}"
+TIMETABLE_CHECK_INTERVAL = 60 * 60
+REFETCH_BEFORE = timedelta(days=3)
+CALCULATED_DAYS = 366
+PRAYERS = 6
+PARSER = "lxml" if builder_registry.lookup("lxml") is not None else "html.parser"
 
-def _get_now():
-    return datetime.now()
+DATE_REGEX = re.compile(r"^\d{2}\.\d{2}\.\d{4}$")
+TIME_REGEX = re.compile(r"^\d{2}:\d{2}$")
+
+
+def _get_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _local_now(location: Location) -> datetime:
+    return _get_now().astimezone(location.tz).replace(tzinfo=None)
 
 
 class DB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).namaz
-
-    def add_times(self, id: str):
-        return (
-            self._coll.insert_one(
-                {
-                    "_id": id,
-                    "today": [],
-                    "tomorrow": [],
-                    "message_id": None,
-                    "start_minute": None,
-                }
-            )
-            if self.find_times(id) is None
-            else None
+        self._db_name = db_name
+        indexes.register(
+            db_name, "schedule", [("location", ASCENDING), ("day", DESCENDING)]
         )
 
-    def find_times(self, id: str):
-        return self._coll.find_one({"_id": id})
-
-    def find_all_times(self):
-        return self._coll.find({})
+    def find_days(self, location: str, days: List[date]) -> Timetable:
+        docs = collection(self._db_name, "schedule").find(
+            {"location": location, "day": {"$in": [day.isoformat() for day in days]}}
+        )
+        return {date.fromisoformat(doc["day"]): doc["times"] for doc in docs}
+
+    def last_day(self, location: str) -> Optional[date]:
+        docs = collection(self._db_name, "schedule").find({"location": location}, {"day": 1})
+        for doc in docs.sort("day", DESCENDING).limit(1):
+            return date.fromisoformat(doc["day"])
+        return None
+
+    def save_days(self, location: str, timetable: Timetable):
+        collection(self._db_name, "schedule").bulk_write(
+            [
+                ReplaceOne(
+                    {"_id": f"{location}:{day.isoformat()}"},
+                    {"location": location, "day": day.isoformat(), "times": times},
+                    upsert=True,
+                )
+                for day, times in timetable.items()
+            ],
+            ordered=False,
+        )
 
-    def update_message_id(self, id: str, message_id: str):
-        self._coll.update_one(
-            {"_id": id}, {"$set": {"message_id": message_id}}
+    def remove_before(self, location: str, day: date):
+        return collection(self._db_name, "schedule").delete_many(
+            {"location": location, "day": {"$lt": day.isoformat()}}
         )
 
-    def update_start_minute(self, id: str, minute: str):
-        self._coll.update_one(
-            {"_id": id}, {"$set": {"start_minute": minute}}
+    def drop_days(self):
+        return collection(self._db_name, "schedule").drop()
+
+    def find_chats(self):
+        return collection(self._db_name, "chats").find({})
+
+    def save_chat(self, chat_id: int, location: str):
+        collection(self._db_name, "chats").update_one(
+            {"_id": chat_id}, {"$set": {"location": location}}, upsert=True
         )
 
-    def add_times_rel(self, id: str, today: List[str], tomorrow: List[str]):
-        self._coll.update_one(
-            {"_id": id}, {"$set": {"today": today, "tomorrow": tomorrow}}
+
+db = DB("namaz")
+
+
+class PrayerSchedule:
+    def __init__(self, db: DB):
+        self._db = db
+        self._days: Dict[str, Tuple[date, List[datetime]]] = {}
+        self._lock = Lock()
+        self.loads = 0
+        metrics.gauge("namaz", self.stats)
+
+    def _load(self, location: Location, today: date) -> List[datetime]:
+        timetable = self._db.find_days(location.name, [today, today + timedelta(days=1)])
+        if today not in timetable:
+            logger.warning("no stored namaz times for %s on %s, calculating", location, today)
+            timetable = compute_timetable(location, today, 2)
+
+        times = sorted(
+            pray_time
+            for day, day_times in timetable.items()
+            for pray_time in _transform_to_dates(day_times, day)
         )
+        self.loads += 1
+        logger.info("namaz schedule loaded for %s on %s: %s", location.name, today, times)
+        return times
+
+    def invalidate(self, location: Optional[str] = None):
+        with self._lock:
+            if location is None:
+                self._days.clear()
+            else:
+                self._days.pop(location, None)
+
+    def next_pray(self, location: Location, now: datetime) -> Optional[datetime]:
+        today = now.date()
+        with self._lock:
+            cached = self._days.get(location.name)
+            if cached is None or cached[0] != today:
+                cached = (today, self._load(location, today))
+                self._days[location.name] = cached
+            return _nearest(cached[1], now)
+
+    def stats(self) -> Dict:
+        return {"locations": len(self._days), "loads": self.loads}
+
+
+schedule = PrayerSchedule(db)
+
+
+class ChatLocations:
+    def __init__(self, db: DB):
+        self._db = db
+        self._locations: Dict[int, str] = {}
+        self._default_chats: Set[int] = set()
+        self._loaded = False
+        self._lock = Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._locations = {
+            doc["_id"]: doc["location"]
+            for doc in self._db.find_chats()
+            if doc["location"] in LOCATIONS
+        }
+        self._loaded = True
+
+    def reset(self, default_chats: Set[int]):
+        with self._lock:
+            self._default_chats = set(default_chats)
+            self._loaded = False
+
+    def get(self, chat_id: int) -> Location:
+        with self._lock:
+            self._ensure_loaded()
+            return LOCATIONS[self._locations.get(chat_id, FINIKE.name)]
+
+    def set(self, chat_id: int, location: Location):
+        with self._lock:
+            self._ensure_loaded()
+            self._locations[chat_id] = location.name
+        self._db.save_chat(chat_id, location.name)
+
+    def chats(self, location: Location) -> List[int]:
+        with self._lock:
+            self._ensure_loaded()
+            chats = set(self._default_chats) | set(self._locations)
+            return sorted(
+                chat_id
+                for chat_id in chats
+                if self._locations.get(chat_id, FINIKE.name) == location.name
+            )
 
-    def delete_times(self, id: str):
-        return self._coll.delete_one({"_id": id})
+    def active(self) -> List[Location]:
+        with self._lock:
+            self._ensure_loaded()
+            names = {self._locations.get(chat_id, FINIKE.name) for chat_id in self._default_chats}
+            names.update(self._locations.values())
+            return [LOCATIONS[name] for name in sorted(names)]
 
-    def drop_times(self):
-        return self._coll.drop()
 
+chat_locations = ChatLocations(db)
 
-db = DB("namaz")
+
+def _resolve_chat_id(bot: Bot, chat_id: str) -> int:
+    if chat_id.lstrip("-").isdigit():
+        return int(chat_id)
+    return bot.get_chat(chat_id).id
 
 
 def add_namaz(upd: Updater, handlers_group: int):
@@ -87,20 +228,25 @@ def add_namaz(upd: Updater, handlers_group: int):
         ),
         handlers_group,
     )
+    dp.add_handler(
+        CommandHandler(
+            "namaz_city",
+            namaz_city,
+            filters=admin_filter,
+            run_async=True,
+        ),
+        handlers_group,
+    )
+
+    chat_locations.reset({_resolve_chat_id(upd.bot, get_group_chat_id())})
 
     upd.job_queue.run_repeating(
         update_datas,
-        interval=60,
+        interval=TIMETABLE_CHECK_INTERVAL,
         first=10,
-        context={"chat_id": get_config()["GROUP_CHAT_ID"]},
     )
 
-    upd.job_queue.run_repeating(
-        update_notifications,
-        interval=1,
-        first=30,
-        context={"chat_id": get_config()["GROUP_CHAT_ID"]},
-    )
+    upd.job_queue.run_once(start_notifications, when=30)
 
 
 def _plural(x):
@@ -130,129 +276,204 @@ def _nearest(items, pivot, alternative_date=None):
     return items[0] if items else alternative_date
 
 
-def _transform_to_dates(elements, date):
-    return [datetime.strptime(f"{date} {element}:00", "%d.%m.%Y %H:%M:%S") for element in elements]
+def _transform_to_dates(elements, day: date):
+    return [
+        datetime.combine(day, datetime.strptime(element, TIME_FORMAT).time())
+        for element in elements
+    ]
 
 
-def _get_time_row(soup, date):
-    return list(
-        filter(
-            lambda x: (x != date and x != "\n"),
-            [element.text for element in soup.find(
-                "td", text=date).parent.children]
-        )
-    )
+def parse_timetable(content) -> Timetable:
+    soup = BeautifulSoup(content, PARSER, parse_only=SoupStrainer("tr"))
+    timetable: Timetable = {}
+
+    for row in soup.find_all("tr"):
+        cells = [cell.get_text(strip=True) for cell in row.find_all("td")]
+        if not cells or not DATE_REGEX.match(cells[0]):
+            continue
+
+        times = [cell for cell in cells[1:] if TIME_REGEX.match(cell)]
+        if len(times) != PRAYERS:
+            logger.warning("skipping malformed namaz row: %s", cells)
+            continue
 
+        timetable[datetime.strptime(cells[0], DATE_FORMAT).date()] = times
 
-def _is_time_gone(times: Dict) -> bool:
-    return times["_id"] != _get_now().strftime("%d.%m.%Y")
+    return timetable
 
 
-def _get_date_strs():
-    now = _get_now()
-    today_str = now.strftime("%d.%m.%Y")
-    tomorrow_str = (now + timedelta(days=1)).strftime("%d.%m.%Y")
+def _fetch_timetable(location: Location) -> Timetable:
+    page = scraper.get(TIMETABLE_URL.format(id=location.diyanet_id, name=location.name))
+    page.raise_for_status()
+    return parse_timetable(page.content)
 
-    return [today_str, tomorrow_str]
 
+def _load_timetable(location: Location, today: date) -> Optional[Timetable]:
+    if get_namaz_source() == "astronomical" or location.diyanet_id is None:
+        return compute_timetable(location, today, CALCULATED_DAYS)
 
-def _parse_page():
     try:
-        page = scraper.get("https://namazvakitleri.diyanet.gov.tr/en-US/9228/prayer-time-for-finike")
-        soup = BeautifulSoup(page.content, "html.parser")
+        timetable = {
+            day: times for day, times in _fetch_timetable(location).items() if day >= today
+        }
+        if timetable:
+            return timetable
+        logger.error("namaz timetable for %s has no days after %s", location.name, today)
+    except Exception as err:
+        logger.error("error while updating datas for %s: %s", location.name, err)
 
-        today_str, tomorrow_str = _get_date_strs()
+    return None
 
-        today_times = _get_time_row(soup, today_str)
-        tomorrow_times = _get_time_row(soup, tomorrow_str)
 
-        db.add_times(str(today_str))
-        db.add_times_rel(str(today_str), today_times, tomorrow_times)
+def _fallback_timetable(location: Location, today: date) -> Timetable:
+    calculated = compute_timetable(location, today, REFETCH_BEFORE.days)
+    stored = db.find_days(location.name, list(calculated))
+    return {day: times for day, times in calculated.items() if day not in stored}
 
-    except Exception as err:
-        logger.error("error while updating datas: %s", err)
+
+def _refresh_timetable(location: Location, today: date):
+    timetable = _load_timetable(location, today)
+    if timetable is None:
+        timetable = _fallback_timetable(location, today)
+
+    if timetable:
+        db.save_days(location.name, timetable)
+        logger.info(
+            "namaz timetable for %s updated: %s - %s",
+            location.name,
+            min(timetable),
+            max(timetable),
+        )
+    db.remove_before(location.name, today)
+    schedule.invalidate(location.name)
 
 
 def update_datas(context: CallbackContext):
-    chat_id = context.bot.get_chat(chat_id=context.job.context["chat_id"]).id
+    for location in chat_locations.active():
+        today = _local_now(location).date()
+        last_day = db.last_day(location.name)
 
-    logger.info("get chat.id: %s", chat_id)
+        if last_day is not None and last_day - today >= REFETCH_BEFORE:
+            continue
 
-    times = db.find_all_times()
+        logger.info("namaz timetable for %s ends at %s, refetching", location.name, last_day)
 
-    if len(list(times)) > 0:
-        for time in db.find_all_times():
-            logger.info("get time object: %s", time)
-            if _is_time_gone(time):
+        _refresh_timetable(location, today)
+        schedule_notifications(context.job_queue, location)
 
-                logger.info("times is gone, deleting")
 
-                db.delete_times(time["_id"])
+def _job_name(location: Location) -> str:
+    return f"{NOTIFICATIONS_JOB}:{location.name}"
 
-                _parse_page()
-    else:
-        _parse_page()
 
+def _has_pending(job_queue: JobQueue, location: Location) -> bool:
+    return any(not job.removed for job in job_queue.get_jobs_by_name(_job_name(location)))
 
-def _remove_message(context: CallbackContext):
-    message = context.job.context["message"]
-    id = context.job.context["id"]
 
-    db.update_message_id(id, None)
-    db.update_start_minute(id, None)
+def _warning_text(pray_time: datetime, now: datetime) -> str:
+    minutes = math.ceil((pray_time - now).total_seconds() / 60)
+    time = _show_time(timedelta(minutes=minutes), False)
+    return f"⚠️ !!! Внимание !!! ⚠️ \n\nДо намаза осталось: {time}"
 
-    message.delete()
 
+def _seconds_until(moment: datetime, now: datetime) -> float:
+    return max((moment - now).total_seconds(), 0)
 
-def update_notifications(context: CallbackContext):
-    chat_id = context.bot.get_chat(chat_id=context.job.context["chat_id"]).id
-    times = db.find_all_times()
 
-    if len(list(times)) > 0:
-        next_pray_time = _get_next_pray_delta()
-        id = str(_get_date_strs()[0])
+def schedule_notifications(job_queue: JobQueue, location: Location, force: bool = False):
+    if not force and _has_pending(job_queue, location):
+        return
 
-        message_id = db.find_times(id)["message_id"]
-        start_minute = db.find_times(id)["start_minute"]
+    now = _local_now(location)
+    pray_time = schedule.next_pray(location, now)
 
-        time = _show_time(next_pray_time, False)
-        current_minute = str(math.ceil(next_pray_time.seconds / 60))
+    if pray_time is None:
+        logger.info("no namaz times to schedule notifications for %s", location.name)
+        return
 
-        text = f"⚠️ !!! Внимание !!! ⚠️ \n\nДо намаза осталось: {time}"
+    logger.info("next namaz notification for %s at %s", location.name, pray_time)
+
+    job_queue.run_once(
+        _send_warning,
+        _seconds_until(pray_time - update_delta, now),
+        context={"location": location, "pray_time": pray_time},
+        name=_job_name(location),
+    )
 
-        if isinstance(next_pray_time, timedelta):
-            if next_pray_time.seconds <= update_delta.seconds:
-                if message_id is None:
-                    message: Optional[Message] = context.bot.send_message(chat_id, text)
 
-                    db.update_message_id(id, message.message_id)
-                    db.update_start_minute(id, current_minute)
+def start_notifications(context: CallbackContext):
+    for location in chat_locations.active():
+        schedule_notifications(context.job_queue, location)
 
-                    context.job_queue.run_once(
-                        _remove_message,
-                        next_pray_time.seconds,
-                        context={
-                            "message": message,
-                            "id": id,
-                        }
-                    )
-                elif start_minute != current_minute and current_minute != '0':
-                    message_id_after_update = db.find_times(id)["message_id"]
-                    if message_id_after_update is not None:
-                        context.bot.edit_message_text(text, chat_id, message_id=message_id_after_update)
-                        db.update_start_minute(id, current_minute)
+
+def _send_warning(context: CallbackContext):
+    location = context.job.context["location"]
+    pray_time = context.job.context["pray_time"]
+    now = _local_now(location)
+
+    if pray_time <= now:
+        schedule_notifications(context.job_queue, location, force=True)
+        return
+
+    text = _warning_text(pray_time, now)
+    messages: List[Message] = []
+    for chat_id in chat_locations.chats(location):
+        try:
+            messages.append(context.bot.send_message(chat_id, text))
+        except Exception as err:
+            logger.error("can't send namaz warning to %s: %s", chat_id, err)
+
+    minutes = math.ceil((pray_time - now).total_seconds() / 60)
+
+    for minute in range(minutes - 1, 0, -1):
+        context.job_queue.run_once(
+            _edit_warning,
+            _seconds_until(pray_time - timedelta(minutes=minute), now),
+            context={"messages": messages, "location": location, "pray_time": pray_time},
+            name=_job_name(location),
+        )
+
+    context.job_queue.run_once(
+        _remove_message,
+        _seconds_until(pray_time, now),
+        context={"messages": messages, "location": location},
+        name=_job_name(location),
+    )
+
+
+def _edit_warning(context: CallbackContext):
+    messages = context.job.context["messages"]
+    location = context.job.context["location"]
+    pray_time = context.job.context["pray_time"]
+
+    text = _warning_text(pray_time, _local_now(location))
+    for message in messages:
+        try:
+            context.bot.edit_message_text(text, message.chat_id, message_id=message.message_id)
+        except TelegramError as err:
+            logger.warning("can't edit namaz warning in %s: %s", message.chat_id, err)
+
+
+def _remove_message(context: CallbackContext):
+    messages = context.job.context["messages"]
+    location = context.job.context["location"]
+
+    try:
+        for message in messages:
+            context.bot.post_delete(message.chat_id, message.message_id)
+    finally:
+        schedule_notifications(context.job_queue, location, force=True)
 
 
 def namaz(update: Update, context: CallbackContext):
     chat_id = update.effective_chat.id
-    namaz_result = _get_namaz()
+    namaz_result = _get_namaz(chat_locations.get(chat_id))
 
     logger.info("get namaz: %s", namaz_result)
 
     result: Optional[Message] = context.bot.send_message(chat_id, namaz_result)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -261,30 +482,42 @@ def namaz(update: Update, context: CallbackContext):
     )
 
 
-def _get_next_pray_delta():
-    now = _get_now()
+def namaz_city(update: Update, context: CallbackContext):
+    chat_id = update.effective_chat.id
+    location = get_location(context.args[0]) if context.args else None
 
-    try:
-        today_str = now.strftime("%d.%m.%Y")
+    if location is None:
+        cities = ", ".join(LOCATIONS)
+        text = f"Город для намаза: {chat_locations.get(chat_id).name}\nДоступные города: {cities}"
+    else:
+        chat_locations.set(chat_id, location)
+        schedule_notifications(context.job_queue, location)
+        text = f"Город для намаза: {location.name}"
 
-        times = db.find_times(today_str)
+    result: Optional[Message] = context.bot.send_message(chat_id, text)
 
-        logger.info("get times: %s", times)
+    cleanup_queue_update(
+        update.message,
+        result,
+        120,
+        remove_cmd=True,
+        remove_reply=False,
+    )
 
-        if times is not None:
-            today_str, tomorrow_str = _get_date_strs()
 
-            today_times = _transform_to_dates(times["today"], today_str)
-            tomorrow_times = _transform_to_dates(times["tomorrow"], tomorrow_str)
+def _get_next_pray_delta(location: Location = FINIKE) -> Optional[timedelta]:
+    now = _local_now(location)
 
-            next_pray_time = _nearest(today_times, now, tomorrow_times[0])
-            delta = next_pray_time - now
+    try:
+        next_pray_time = schedule.next_pray(location, now)
 
-            return delta
+        if next_pray_time is not None:
+            return next_pray_time - now
 
     except Exception as err:
         logger.error("error while getting next pray time: %s", err)
-        return err
+
+    return None
 
 
 def _show_time(delta: timedelta, show_seconds_and_hours: bool = True):
@@ -297,9 +530,9 @@ def _show_time(delta: timedelta, show_seconds_and_hours: bool = True):
     return show_seconds_and_hours and f"{hours} {minutes} {seconds}" or f"{minutes}"
 
 
-def _get_namaz():
+def _get_namaz(location: Location = FINIKE):
 
-    delta = _get_next_pray_delta()
+    delta = _get_next_pray_delta(location)
 
     logger.info("get delta: %s", delta)
 
@@ -308,7 +541,5 @@ def _get_namaz():
 
         if time:
             return f"До следующего намаза осталось: {time}"
-        else:
-            return "Не получилось получить время намаза 😥"
 
-    return delta
+    return "Не получилось получить время намаза 😥"
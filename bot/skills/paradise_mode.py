@@ -1,10 +1,9 @@
 import logging
 
-from telegram import Update, User
-from telegram.error import BadRequest, TelegramError
-from telegram.ext import MessageHandler, Filters, Updater, CallbackContext
+from telegram.ext import Filters, Updater, CallbackContext
 
 from mode import Mode, OFF
+from pipeline import message_pipeline, PipelineMessage
 
 logger = logging.getLogger(__name__)
 
@@ -14,25 +13,15 @@ mode = Mode(mode_name="paradise_mode", default=OFF, pin_info_msg=True)
 @mode.add
 def add_paradise_mode(upd: Updater, handlers_group: int):
     logger.info("registering paradise-mode handlers")
-
-    dp = upd.dispatcher
-
-    dp.add_handler(
-        MessageHandler(~Filters.status_update, paradise, run_async=True),
-        handlers_group,
+    message_pipeline.add_stage(
+        "paradise",
+        paradise,
+        mode=mode,
+        filters=Filters.text & ~Filters.status_update,
+        order=50,
     )
 
 
-def paradise(update: Update, context: CallbackContext):
-    text = update.message["text"]
-    user: User = update.effective_user
-    chat_id = update.effective_chat.id
-
-    try:
-        context.bot.delete_message(chat_id, update.effective_message.message_id)
-    except (BadRequest, TelegramError) as err:
-        logger.info("can't delete msg: %s", err)
-
-    context.bot.send_message(
-        chat_id, f"🌈 Райское сообщение от {user.full_name}: {text}"
-    )
+def paradise(msg: PipelineMessage, _: CallbackContext):
+    name = msg.user.full_name
+    msg.rewrite(msg.text, lambda text: f"🌈 Райское сообщение от {name}: {text}")
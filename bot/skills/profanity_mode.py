@@ -2,11 +2,10 @@ import logging
 import re
 from functools import partial
 
-from telegram import Update, User
-from telegram.error import BadRequest, TelegramError
-from telegram.ext import MessageHandler, Filters, Updater, CallbackContext
+from telegram.ext import Filters, Updater, CallbackContext
 
 from mode import Mode, OFF
+from pipeline import message_pipeline, PipelineMessage
 
 logger = logging.getLogger(__name__)
 
@@ -164,26 +163,20 @@ filter = ObsceneWordsFilter(_create_profanity_re(), _create_neutral_re())
 @mode.add
 def add_profanity_mode(upd: Updater, handlers_group: int):
     logger.info("registering profanity-mode handlers")
-
-    dp = upd.dispatcher
-
-    dp.add_handler(
-        MessageHandler(~Filters.status_update, profanity, run_async=True),
-        handlers_group,
+    message_pipeline.add_stage(
+        "profanity",
+        profanity,
+        mode=mode,
+        filters=Filters.text & ~Filters.status_update,
+        order=30,
     )
 
 
-def profanity(update: Update, context: CallbackContext):
-    text = update.message["text"]
-    user: User = update.effective_user
-    chat_id = update.effective_chat.id
-
-    if filter.is_sequence_contains_bad_words(text) is True:
-        try:
-            context.bot.delete_message(chat_id, update.effective_message.message_id)
-        except (BadRequest, TelegramError) as err:
-            logger.info("can't delete msg: %s", err)
+def profanity(msg: PipelineMessage, _: CallbackContext):
+    name = msg.user.full_name
 
-        context.bot.send_message(
-            chat_id, f"{user.full_name} написал(а) нехорошие слова.\n\nИзмененное сообщение:\n{filter.mask_bad_words(text)}\n\nУра, еще один день в раю!"
+    if filter.is_sequence_contains_bad_words(msg.text) is True:
+        msg.rewrite(
+            filter.mask_bad_words(msg.text),
+            lambda text: f"{name} написал(а) нехорошие слова.\n\nИзмененное сообщение:\n{text}\n\nУра, еще один день в раю!",
         )
@@ -1,90 +1,168 @@
 import logging
-import os
 from datetime import datetime, timedelta
 from random import randint
-from tempfile import gettempdir
-from threading import Lock
-from typing import List, Optional, Tuple, Dict
-from uuid import uuid4
+from threading import RLock
+from typing import List, Optional, Set, Tuple, Dict
 
 import re
 
 import pymongo
-from PIL import Image, ImageDraw, ImageFont
-from pymongo.collection import Collection
-from telegram import Update, User, Message, ChatMember
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from telegram import Update, User, Message
 from telegram.ext import Updater, CommandHandler, MessageHandler, CallbackContext
 from telegram.ext.filters import Filters
-from telegram.error import BadRequest
 
-from db.mongo import get_db
+from db.indexes import indexes
+from db.mongo import collection
 from filters import admin_filter
+from media import media_cache
 from mode import cleanup_queue_update
+from roster import roster
 from skills.mute import mute_user_for_time
+from utils.leaderboard import Leaderboard
+from utils.locks import StripedLock
+from utils.render import RenderedImage, text_renderer
+from utils.shutdown import on_shutdown
 
 logger = logging.getLogger(__name__)
 
 MUTE_MINUTES = 16 * 60
 NUM_BULLETS = 6
 LIMIT_FOR_IMAGE = 25
-FONT = "firacode.ttf"
+FLUSH_INTERVAL = 5
+RECONCILE_INTERVAL = 30 * 60
+
+COUNTERS = ("shot_counter", "miss_counter", "dead_counter", "total_time_in_club")
 
 
 class DB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).leaders
-
-    def find_all(self):
-        return list(self._coll.find({}).sort("total_time_in_club", pymongo.DESCENDING))
-
-    def find(self, user_id: str):
-        return self._coll.find_one({"_id": user_id})
-
-    def add(self, user: User):
-        now: datetime = datetime.now()
-        return self._coll.insert_one(
-            {
+        self._db_name = db_name
+        self._pending: Dict[int, Dict] = {}
+        self._removed: Set[int] = set()
+        self._cleared = False
+        self._lock = RLock()
+        self._flush_lock = RLock()
+        self.board = Leaderboard("roll", lambda e: e["total_time_in_club"], self._load_all)
+        indexes.register(db_name, "leaders", [("total_time_in_club", pymongo.DESCENDING)])
+
+    def _load_all(self) -> List[Dict]:
+        leaders = collection(self._db_name, "leaders")
+        return list(leaders.find({}).sort("total_time_in_club", pymongo.DESCENDING))
+
+    def find_all(self) -> List[Dict]:
+        return self.board.top()
+
+    def find(self, user_id: int) -> Optional[Dict]:
+        return self.board.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        return self.board.rank(user_id)
+
+    def _record(self, user: User, dead: bool, mute_min: int):
+        now = datetime.now()
+        delta = {
+            "shot_counter": 1,
+            "miss_counter": 0 if dead else 1,
+            "dead_counter": 1 if dead else 0,
+            "total_time_in_club": mute_min * 60 if dead else 0,
+        }
+        with self._lock:
+            pending = self._pending.get(user.id)
+            if pending is None:
+                pending = self._pending[user.id] = {
+                    "meta": user.to_dict(),
+                    "first_shot": now,
+                    "inc": dict.fromkeys(COUNTERS, 0),
+                }
+            pending["last_shot"] = now
+            for key, value in delta.items():
+                pending["inc"][key] += value
+
+            entry = self.board.get(user.id) or {
                 "_id": user.id,
                 "meta": user.to_dict(),
-                "shot_counter": 0,
-                "miss_counter": 0,
-                "dead_counter": 0,
-                "total_time_in_club": timedelta().seconds,
                 "first_shot": now,
-                "last_shot": now,
+                **dict.fromkeys(COUNTERS, 0),
             }
-        )
+            self.board.put(
+                {
+                    **entry,
+                    **{key: entry[key] + value for key, value in delta.items()},
+                    "last_shot": now,
+                }
+            )
 
-    def dead(self, user_id: str, mute_min: int):
-        self._coll.update_one(
-            {"_id": user_id},
-            {
-                "$inc": {
-                    "shot_counter": 1,
-                    "dead_counter": 1,
-                    "total_time_in_club": mute_min * 60,
+    def dead(self, user: User, mute_min: int):
+        self._record(user, True, mute_min)
+
+    def miss(self, user: User):
+        self._record(user, False, 0)
+
+    def flush(self, _: Optional[CallbackContext] = None):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._removed, self._cleared = set(), False
+            if pending:
+                self._write(pending)
+
+    def _write(self, pending: Dict[int, Dict]):
+        requests = [
+            UpdateOne(
+                {"_id": user_id},
+                {
+                    "$setOnInsert": {"meta": p["meta"], "first_shot": p["first_shot"]},
+                    "$inc": p["inc"],
+                    "$set": {"last_shot": p["last_shot"]},
                 },
-                "$set": {"last_shot": datetime.now()},
-            },
-        )
-
-    def miss(self, user_id: str):
-        self._coll.update_one(
-            {"_id": user_id},
-            {
-                "$inc": {"shot_counter": 1, "miss_counter": 1},
-                "$set": {"last_shot": datetime.now()},
-            },
-        )
-
-    def remove(self, user_id: str):
-        self._coll.delete_one({"_id": user_id})
+                upsert=True,
+            )
+            for user_id, p in pending.items()
+        ]
+        try:
+            collection(self._db_name, "leaders").bulk_write(requests, ordered=False)
+        except PyMongoError as err:
+            logger.error("can't flush %d roll results: %s", len(requests), err)
+            with self._lock:
+                for user_id, p in pending.items():
+                    if not self._cleared and user_id not in self._removed:
+                        self._merge(user_id, p)
+
+    def _merge(self, user_id: int, pending: Dict):
+        current = self._pending.get(user_id)
+        if current is None:
+            self._pending[user_id] = pending
+            return
+        current["first_shot"] = pending["first_shot"]
+        for key, value in pending["inc"].items():
+            current["inc"][key] += value
+
+    def reconcile(self, _: Optional[CallbackContext] = None):
+        with self._flush_lock, self._lock:
+            self.flush()
+            self.board.reconcile()
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._pending.pop(user_id, None)
+            self._removed.add(user_id)
+            self.board.remove(user_id)
+        with self._flush_lock:
+            collection(self._db_name, "leaders").delete_one({"_id": user_id})
 
     def remove_all(self):
-        self._coll.delete_many({})
+        with self._lock:
+            self._pending.clear()
+            self._cleared = True
+            self.board.clear()
+        with self._flush_lock:
+            collection(self._db_name, "leaders").delete_many({})
 
 
 _db = DB(db_name="roll")
+on_shutdown(_db.flush)
 
 MEME_REGEX = re.compile(r"\/[rрp][оo0][1lл]{2}", re.IGNORECASE)
 
@@ -92,7 +170,7 @@ MEME_REGEX = re.compile(r"\/[rрp][оo0][1lл]{2}", re.IGNORECASE)
 def add_roll(upd: Updater, handlers_group: int):
     logger.info("registering roll handlers")
     dp = upd.dispatcher
-    dp.add_handler(MessageHandler(Filters.dice, roll), handlers_group)
+    dp.add_handler(MessageHandler(Filters.dice, roll, run_async=True), handlers_group)
     dp.add_handler(
         MessageHandler(Filters.regex(MEME_REGEX), roll, run_async=True), handlers_group
     )
@@ -131,8 +209,13 @@ def add_roll(upd: Updater, handlers_group: int):
         handlers_group,
     )
 
+    upd.job_queue.run_repeating(_db.flush, interval=FLUSH_INTERVAL, first=FLUSH_INTERVAL)
+    upd.job_queue.run_repeating(
+        _db.reconcile, interval=RECONCILE_INTERVAL, first=RECONCILE_INTERVAL
+    )
+
 
-barrel_lock = Lock()
+barrel_locks = StripedLock("barrel")
 
 
 def _reload(context: CallbackContext) -> List[bool]:
@@ -158,8 +241,8 @@ def get_mute_minutes(shots_remain: int) -> int:
     return MUTE_MINUTES * (NUM_BULLETS - shots_remain)
 
 
-def _shot(context: CallbackContext) -> Tuple[bool, int]:
-    with barrel_lock:
+def _shot(context: CallbackContext, chat_id: int) -> Tuple[bool, int]:
+    with barrel_locks(chat_id):
         barrel = context.chat_data.get("barrel")
         if barrel is None or len(barrel) == 0:
             barrel = _reload(context)
@@ -187,62 +270,8 @@ def get_username(h: Dict) -> str:
     )
 
 
-JPEG = "JPEG"
-EXTENSION = ".jpg"
-COLOR = "white"
-MODE = "L"
-FONT_SIZE = 12
-
-
-def _create_empty_image(image_path, limit):
-    width = 480
-    line_multi = 1
-    header_height = 30
-    line_px = FONT_SIZE * line_multi
-    height = int((limit * line_px * 1.5) + header_height)
-    size = (width, height)
-    logger.info("Creating image")
-    image = Image.new(MODE, size, COLOR)
-    logger.info("Saving image")
-    try:
-        image.save(image_path, JPEG)
-        logger.info("Empty image saved")
-    except (ValueError, OSError) as err:
-        logger.error("Error during image saving, error: %s", err)
-        return None
-    return image
-
-
-def _add_text_to_image(text, image_path):
-    logger.info("Adding text to image")
-    image = Image.open(image_path)
-    logger.info("Getting font")
-    font_path = os.path.join("fonts", FONT)
-    font = ImageFont.truetype(font_path, FONT_SIZE)
-    logger.info("Font %s has been found", FONT)
-    draw = ImageDraw.Draw(image)
-    position = (45, 0)
-    draw.text(xy=position, text=text, font=font)
-    try:
-        image.save(image_path, JPEG)
-        logger.info("Image with text saved")
-    except (ValueError, OSError) as err:
-        logger.error("Error during image with text saving, error: %s", err)
-        os.remove(image_path)
-        return None
-    return image
-
-
-def from_text_to_image(text, limit):
-    limit = max(limit, LIMIT_FOR_IMAGE)
-    logger.info("Getting temp dir")
-    tmp_dir = gettempdir()
-    file_name = str(uuid4())
-    image_path = f"{tmp_dir}/{file_name}{EXTENSION}"
-    _create_empty_image(image_path, limit)
-    _add_text_to_image(text, image_path)
-    image = open(image_path, "rb")
-    return image, image_path
+def from_text_to_image(text: str, limit: int) -> RenderedImage:
+    return text_renderer.render(text, max(limit, LIMIT_FOR_IMAGE))
 
 
 def show_leaders(update: Update, context: CallbackContext):
@@ -271,7 +300,7 @@ def show_leaders(update: Update, context: CallbackContext):
 
     board += f"{''.rjust(51, '-')}"
     try:
-        board_image, board_image_path = from_text_to_image(board, leaders_length)
+        board_image = from_text_to_image(board, leaders_length)
     except (ValueError, RuntimeError, OSError) as err:
         logger.error("Cannot get image from text, leaders error: %s", err)
         return
@@ -279,20 +308,15 @@ def show_leaders(update: Update, context: CallbackContext):
     result: Optional[Message] = None
 
     if leaders_length <= LIMIT_FOR_IMAGE:
-        result = context.bot.send_photo(
-            chat_id=update.effective_chat.id,
-            photo=board_image,
-            disable_notification=True,
+        result = media_cache.send_photo(
+            context.bot, update.effective_chat.id, board_image, disable_notification=True
         )
     else:
-        result = context.bot.send_document(
-            chat_id=update.effective_chat.id,
-            document=board_image,
-            disable_notification=True,
+        result = media_cache.send_document(
+            context.bot, update.effective_chat.id, board_image, disable_notification=True
         )
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         600,
@@ -300,26 +324,12 @@ def show_leaders(update: Update, context: CallbackContext):
         remove_reply=False,
     )
 
-    os.remove(board_image_path)
-
 
 def show_active(update: Update, context: CallbackContext):
-    leaders = _db.find_all()
-
     message = "Никто не пришёл на фан встречу 😢"
 
-    restricted = []
-
-    for leader in leaders:
-        try:
-            chat_member = context.bot.get_chat_member(
-                update.effective_chat.id, leader.get("_id")
-            )
-            if chat_member.status == ChatMember.RESTRICTED:
-                restricted.append(leader)
-
-        except BadRequest:
-            logger.error("can't get user %s, skip", leader)
+    muted = roster.restricted(update.effective_chat.id)
+    restricted = [leader for leader in _db.find_all() if leader["_id"] in muted]
 
     if len(restricted) > 0:
         message = "Лидеры ☠️:\n"
@@ -333,7 +343,6 @@ def show_active(update: Update, context: CallbackContext):
     result = context.bot.send_message(update.effective_chat.id, message)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -348,11 +357,8 @@ def roll(update: Update, context: CallbackContext):
 
     user: User = update.effective_user
     result: Optional[Message] = None
-    existing_user = _db.find(user_id=user.id)
-    if existing_user is None:
-        _db.add(user=user)
 
-    is_shot, shots_remained = _shot(context)
+    is_shot, shots_remained = _shot(context, update.effective_chat.id)
     shot_result = "he is dead!" if is_shot else "miss!"
     logger.info(
         "user: %s[%s] is rolling and... %s", user.full_name, user.id, shot_result
@@ -366,17 +372,15 @@ def roll(update: Update, context: CallbackContext):
         )
 
         mute_user_for_time(update, context, user, timedelta(minutes=mute_min))
-        _db.dead(user.id, mute_min)
+        _db.dead(user, mute_min)
     else:
-
-        _db.miss(user.id)
+        _db.miss(user)
 
         result = context.bot.send_message(
             update.effective_chat.id,
             f"{user.full_name}: {get_miss_string(shots_remained)}",
         )
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -393,7 +397,6 @@ def wipe_me(update: Update, context: CallbackContext):
     result = update.message.reply_text("ок, бумер 😒", disable_notification=True)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
@@ -408,7 +411,6 @@ def wipe_leaders(update: Update, context: CallbackContext):
     result = update.message.reply_text("👍", disable_notification=True)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
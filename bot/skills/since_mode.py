@@ -3,17 +3,24 @@ from datetime import datetime
 from functools import reduce
 from typing import Dict, List
 
+import pymongo
 from pymongo.collection import Collection
 from telegram.ext import Updater, CommandHandler, CallbackContext
 
 from mode import Mode
-from db.mongo import get_db
+from db.indexes import indexes
+from db.mongo import collection
 
-topics_coll: Collection = get_db('since_mode').topics
+indexes.register("since_mode", "topics", [("topic", pymongo.ASCENDING)])
+indexes.register("since_mode", "topics", [("count", pymongo.DESCENDING)])
 logger = logging.getLogger(__name__)
 mode = Mode(mode_name="since_mode", default=True, pin_info_msg=False)
 
 
+def _topics() -> Collection:
+    return collection("since_mode", "topics")
+
+
 @mode.add
 def add_since_mode(upd: Updater, handlers_group: int):
     logger.info("register since-mode handlers")
@@ -37,7 +44,7 @@ def add_since_mode(upd: Updater, handlers_group: int):
 
 
 def _get_topic(t: str) -> Dict:
-    topic = topics_coll.find_one({"topic": t})
+    topic = _topics().find_one({"topic": t})
     logger.info("topic from db for title %s is %s", t, topic)
 
     return (
@@ -54,12 +61,12 @@ def _get_delta_days(t: datetime) -> str:
 
 def _update_topic(t: Dict):
     if "_id" in t:
-        topics_coll.update_one(
+        _topics().update_one(
             {"topic": t["topic"]},
             {"$inc": {"count": 1}, "$set": {"since_datetime": datetime.now()}},
         )
     else:
-        topics_coll.insert_one(t)
+        _topics().insert_one(t)
 
 
 def since_callback(update, context):
@@ -84,7 +91,7 @@ def since_callback(update, context):
 
 
 def _get_all_topics(limit: int) -> List[Dict]:
-    return list(topics_coll.find({}).sort("-count").limit(limit))
+    return list(_topics().find({}).sort("count", pymongo.DESCENDING).limit(limit))
 
 
 def since_list_callback(update: Updater, context: CallbackContext):
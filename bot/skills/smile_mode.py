@@ -1,9 +1,9 @@
 import logging
 
-from telegram import Update
-from telegram.ext import MessageHandler, Filters, Updater, CallbackContext
+from telegram.ext import Filters, Updater, CallbackContext
 
 from mode import Mode, OFF
+from pipeline import message_pipeline, PipelineMessage
 
 logger = logging.getLogger(__name__)
 
@@ -13,15 +13,15 @@ mode = Mode(mode_name="smile_mode", default=OFF, pin_info_msg=True)
 @mode.add
 def add_smile_mode(upd: Updater, handlers_group: int):
     logger.info("registering smile-mode handlers")
-    dp = upd.dispatcher
-    dp.add_handler(
-        MessageHandler(~Filters.sticker & ~Filters.animation, smile, run_async=True),
-        handlers_group,
+    message_pipeline.add_stage(
+        "smile",
+        smile,
+        mode=mode,
+        filters=~Filters.sticker & ~Filters.animation,
+        order=20,
     )
 
 
-def smile(update: Update, context: CallbackContext):
-    logger.debug("remove msg: %s", update.effective_message)
-    context.bot.delete_message(
-        update.effective_chat.id, update.effective_message.message_id, 10
-    )
+def smile(msg: PipelineMessage, _: CallbackContext):
+    logger.debug("remove msg: %s", msg.message_id)
+    msg.drop()
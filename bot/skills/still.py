@@ -2,7 +2,6 @@ import logging
 from datetime import datetime
 
 from telegram import Update
-from telegram.error import BadRequest
 from telegram.ext import Updater, CommandHandler, CallbackContext
 
 logger = logging.getLogger(__name__)
@@ -26,12 +25,9 @@ def to_2k_year(year: int):
 def still(update: Update, context: CallbackContext):
     text = " ".join(context.args)
     chat_id = update.effective_chat.id
-    try:
-        context.bot.delete_message(chat_id, update.effective_message.message_id)
-    except BadRequest as err:
-        logger.info("can't delete msg: %s", err)
+    context.bot.post_delete(chat_id, update.effective_message.message_id)
 
     if text:
-        context.bot.send_message(
+        context.bot.post_message(
             chat_id, f"Сейчас бы {text} в {to_2k_year(datetime.now().year)} лул 😂😂😂"
         )
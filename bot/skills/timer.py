@@ -25,7 +25,6 @@ def alarm(context: CallbackContext):
     message: Optional[Message] = context.bot.send_message(job_context["chat_id"], "Стрелочка вернулась на место")
 
     cleanup_queue_update(
-        context.job_queue,
         None,
         message,
         30,
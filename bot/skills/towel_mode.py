@@ -1,9 +1,8 @@
 import logging
 from datetime import datetime, timedelta
 from random import choice
-from typing import Dict
 
-from pymongo.collection import Collection
+import pymongo
 from telegram import Update, User, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.error import BadRequest
 from telegram.ext import (
@@ -15,8 +14,10 @@ from telegram.ext import (
 )
 
 from config import get_config
-from db.mongo import get_db
+from db.indexes import indexes
+from db.mongo import collection
 from mode import Mode
+from pipeline import message_pipeline, PipelineMessage
 
 MAGIC_NUMBER = "42"
 QUARANTINE_TIME = 60
@@ -39,11 +40,12 @@ logger = logging.getLogger(__name__)
 
 class DB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).quarantine
+        self._db_name = db_name
+        indexes.register(db_name, "quarantine", [("datetime", pymongo.ASCENDING)])
 
     def add_user(self, user_id: str):
         return (
-            self._coll.insert_one(
+            collection(self._db_name, "quarantine").insert_one(
                 {
                     "_id": user_id,
                     "rel_messages": [],
@@ -55,21 +57,21 @@ class DB:
         )
 
     def find_user(self, user_id: str):
-        return self._coll.find_one({"_id": user_id})
+        return collection(self._db_name, "quarantine").find_one({"_id": user_id})
 
-    def find_all_users(self):
-        return self._coll.find({})
+    def find_expired_users(self, now: datetime):
+        return collection(self._db_name, "quarantine").find({"datetime": {"$lt": now}})
 
     def add_user_rel_message(self, user_id: str, message_id: str):
-        self._coll.update_one(
+        collection(self._db_name, "quarantine").update_one(
             {"_id": user_id}, {"$addToSet": {"rel_messages": message_id}}
         )
 
     def delete_user(self, user_id: str):
-        return self._coll.delete_one({"_id": user_id})
+        return collection(self._db_name, "quarantine").delete_one({"_id": user_id})
 
     def delete_all_users(self):
-        return self._coll.delete_many({})
+        return collection(self._db_name, "quarantine").delete_many({})
 
 
 db = DB("towel_mode")
@@ -78,16 +80,9 @@ mode = Mode(
 )
 
 
-def _is_time_gone(user: Dict) -> bool:
-    return user["datetime"] < datetime.now()
-
-
 def _delete_user_rel_messages(chat_id: int, user_id: str, context: CallbackContext):
     for msg_id in db.find_user(user_id=user_id)["rel_messages"]:
-        try:
-            context.bot.delete_message(chat_id, msg_id)
-        except BadRequest as err:
-            logger.info("can't delete msg: %s", err)
+        context.bot.post_delete(chat_id, msg_id)
 
 
 @mode.add
@@ -102,13 +97,12 @@ def add_towel_mode(upd: Updater, handlers_group: int):
         handlers_group,
     )
 
-    dp.add_handler(
-        MessageHandler(
-            Filters.chat_type.groups & ~Filters.status_update,
-            catch_reply,
-            run_async=True,
-        ),
-        handlers_group,
+    message_pipeline.add_stage(
+        "towel",
+        catch_reply,
+        mode=mode,
+        filters=Filters.chat_type.groups & ~Filters.status_update,
+        order=10,
     )
 
     dp.add_handler(CallbackQueryHandler(i_am_a_turkish_btn, run_async=True), handlers_group)
@@ -162,35 +156,27 @@ def catch_new_user(update: Update, context: CallbackContext):
         quarantine_user(user, update.effective_chat.id, context)
 
 
-def catch_reply(update: Update, context: CallbackContext):
-    user_id = update.effective_user.id
+def catch_reply(msg: PipelineMessage, context: CallbackContext):
+    user_id = msg.user.id
     user = db.find_user(user_id)
     if user is None:
         return
 
-    if (
-        update.effective_message.reply_to_message is not None
-        and update.effective_message.reply_to_message.from_user.id
-        == context.bot.get_me().id
-    ):
-
-        _delete_user_rel_messages(update.effective_chat.id, user_id, context)
+    reply_to = msg.update.effective_message.reply_to_message
+    if reply_to is not None and reply_to.from_user.id == context.bot.get_me().id:
+        _delete_user_rel_messages(msg.chat_id, user_id, context)
         db.delete_user(user_id=user["_id"])
 
-        update.message.reply_text("Добро пожаловать в дом на горе!")
+        msg.reply("Добро пожаловать в дом на горе!")
     else:
-        context.bot.delete_message(
-            update.effective_chat.id, update.effective_message.message_id, 10
-        )
+        msg.drop()
 
 
 def quarantine_filter(update: Update, context: CallbackContext):
     user_id = update.effective_user.id
     user = db.find_user(user_id)
     if user is not None:
-        context.bot.delete_message(
-            update.effective_chat.id, update.effective_message.message_id, 10
-        )
+        context.bot.post_delete(update.effective_chat.id, update.effective_message.message_id)
 
 
 def i_am_a_turkish_btn(update: Update, context: CallbackContext):
@@ -210,14 +196,13 @@ def ban_user(context: CallbackContext):
     chat_id = context.bot.get_chat(chat_id=context.job.context["chat_id"]).id
     logger.debug("get chat.id: %s", chat_id)
 
-    for user in db.find_all_users():
-        if _is_time_gone(user):
-            try:
-                context.bot.kick_chat_member(chat_id, user["_id"])
-                _delete_user_rel_messages(chat_id, user["_id"], context)
-            except BadRequest as err:
-                logger.error("can't ban user %s, because of: %s", user, err)
+    for user in db.find_expired_users(datetime.now()):
+        try:
+            context.bot.kick_chat_member(chat_id, user["_id"])
+            _delete_user_rel_messages(chat_id, user["_id"], context)
+        except BadRequest as err:
+            logger.error("can't ban user %s, because of: %s", user, err)
 
-            db.delete_user(user["_id"])
+        db.delete_user(user["_id"])
 
-            logger.info("user banned: %s", user)
+        logger.info("user banned: %s", user)
@@ -3,12 +3,11 @@ from datetime import datetime
 from typing import Optional
 from random import choice
 
-from pymongo.collection import Collection
 from telegram import Update, User
 from telegram.ext import Updater, CommandHandler, CallbackContext
 
-from db.mongo import get_db
-from filters import admin_filter
+from db.mongo import collection
+from filters import admin_filter, trusted_users
 from mode import Mode, ON, cleanup_queue_update
 
 from skills.roll import get_username
@@ -17,25 +16,27 @@ logger = logging.getLogger(__name__)
 
 mode = Mode(mode_name="trusted_mode", default=ON)
 
+RESYNC_INTERVAL = 10 * 60
+
 HONORED_EMOJIS = ["🦷", "🤡", "🤖", "👾", "🤠", "🤐", "🥶", "🥷", "🦄", "🐗", "🐈"]
 
 
 class DB:
     def __init__(self, db_name: str):
-        self._coll: Collection = get_db(db_name).users
+        self._db_name = db_name
 
     def get_all_users(self):
-        return self._coll.find({})
+        return collection(self._db_name, "users").find({})
 
     def get_user(self, user_id: int) -> Optional[dict]:
-        return self._coll.find_one(
+        return collection(self._db_name, "users").find_one(
             {
                 "_id": user_id,
             }
         )
 
     def trust(self, user: User, admin_id: str):
-        self._coll.insert_one(
+        collection(self._db_name, "users").insert_one(
             {
                 "_id": user.id,
                 "by": admin_id,
@@ -45,10 +46,10 @@ class DB:
         )
 
     def untrust(self, user_id):
-        self._coll.delete_one({"_id": user_id})
+        collection(self._db_name, "users").delete_one({"_id": user_id})
 
     def drop_all(self):
-        self._coll.drop()
+        collection(self._db_name, "users").drop()
 
 
 _db = DB(db_name="trusted")
@@ -86,6 +87,13 @@ def add_trusted_mode(upd: Updater, handlers_group: int):
         handlers_group,
     )
 
+    upd.job_queue.run_repeating(resync_trusted, interval=RESYNC_INTERVAL, first=0)
+
+
+def resync_trusted(_: CallbackContext):
+    trusted_users.load()
+    logger.info("trusted cache stats: %s", trusted_users.stats())
+
 
 def _get_user_and_admin(update):
     user: User = update.message.reply_to_message.from_user
@@ -98,13 +106,14 @@ def trust_callback(update: Update, context: CallbackContext):
     user, chat_id, admin = _get_user_and_admin(update)
 
     if user and admin and chat_id:
-        if _db.get_user(user.id) is not None:
+        if user.id in trusted_users:
             msg = f"{user.name} уже настоящий кебаб 👍"
         else:
             _db.trust(user, admin.id)
+            trusted_users.add(user.id)
             msg = f"🪄 {user.name} теперь ты настоящий кебаб!"
 
-        context.bot.send_message(chat_id, msg)
+        context.bot.post_message(chat_id, msg)
 
 
 def untrust_callback(update: Update, context: CallbackContext):
@@ -112,7 +121,8 @@ def untrust_callback(update: Update, context: CallbackContext):
 
     if user and chat_id:
         _db.untrust(user.id)
-        context.bot.send_message(chat_id, f"{user.name} больше не настоящий кебаб 🖕")
+        trusted_users.discard(user.id)
+        context.bot.post_message(chat_id, f"{user.name} больше не настоящий кебаб 🖕")
 
 
 def trusted_list(update: Updater, context: CallbackContext):
@@ -128,7 +138,6 @@ def trusted_list(update: Updater, context: CallbackContext):
     result = context.bot.send_message(update.effective_chat.id, message)
 
     cleanup_queue_update(
-        context.job_queue,
         update.message,
         result,
         120,
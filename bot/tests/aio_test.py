@@ -0,0 +1,129 @@
+import asyncio
+from typing import Dict, List
+from unittest import TestCase
+
+from aiohttp import web
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import CommandHandler, DispatcherHandlerStop
+
+from aio import AsyncBotApi, AsyncRunner
+from tests.fakes import TOKEN, FakeUpdater, make_message_update
+
+
+class FakeApi:
+    def __init__(self):
+        self.requests: List[Dict] = []
+        self.responses: Dict[str, web.Response] = {}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.requests.append({"method": method, **(await request.json())})
+        if method in self.responses:
+            return self.responses[method]
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": [{"update_id": 7}]})
+        return web.json_response({"ok": True, "result": True})
+
+
+class AsyncBotApiTestCase(TestCase):
+    def setUp(self) -> None:
+        self.upd = FakeUpdater()
+        self.addCleanup(self.upd.stop)
+        self.fake = FakeApi()
+
+    def call(self, method: str, *args):
+        async def run():
+            app = web.Application()
+            app.router.add_post(f"/bot{TOKEN}/{{method}}", self.fake.handle)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = runner.addresses[0][1]
+
+            api = AsyncBotApi(self.upd.bot, base_url=f"http://127.0.0.1:{port}/bot")
+            try:
+                return await getattr(api, method)(*args)
+            finally:
+                await api.close()
+                await runner.cleanup()
+
+        return asyncio.run(run())
+
+    def test_get_updates(self):
+        updates = self.call("get_updates", 5, 0, ["message"])
+
+        self.assertEqual([u.update_id for u in updates], [7])
+        self.assertEqual(
+            self.fake.requests,
+            [{"method": "getUpdates", "offset": 5, "timeout": 0, "allowed_updates": ["message"]}],
+        )
+
+    def test_retry_after(self):
+        self.fake.responses["getUpdates"] = web.json_response(
+            {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 3}},
+            status=429,
+        )
+
+        with self.assertRaises(RetryAfter):
+            self.call("get_updates", None, 0, None)
+
+    def test_bad_request(self):
+        self.fake.responses["deleteWebhook"] = web.json_response(
+            {"ok": False, "description": "Bad Request: nope"}, status=400
+        )
+
+        with self.assertRaises(BadRequest):
+            self.call("delete_webhook")
+
+
+class AsyncRunnerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.upd = FakeUpdater()
+        self.addCleanup(self.upd.stop)
+        self.runner = AsyncRunner(self.upd, workers=2, max_updates=8)
+        self.addCleanup(self.runner._executor.shutdown)
+        self.calls: List[str] = []
+
+    def add(self, group: int, callback):
+        self.upd.dispatcher.add_handler(CommandHandler("go", callback), group)
+
+    def process(self):
+        update = make_message_update(self.upd.bot, "/go")
+        asyncio.run(self.runner.process_update(update))
+
+    def test_error_in_one_group_does_not_stop_others(self):
+        def broken(*_):
+            self.calls.append("broken")
+            raise ValueError("boom")
+
+        self.add(1, broken)
+        self.add(2, lambda *_: self.calls.append("sync"))
+
+        self.process()
+
+        self.assertEqual(self.calls, ["broken", "sync"])
+        self.assertEqual(len(self.upd.dispatcher.errors), 1)
+
+    def test_handler_stop_stops_later_groups(self):
+        def stop(*_):
+            self.calls.append("stop")
+            raise DispatcherHandlerStop()
+
+        self.add(1, stop)
+        self.add(2, lambda *_: self.calls.append("late"))
+
+        self.process()
+
+        self.assertEqual(self.calls, ["stop"])
+
+    def test_coroutine_handlers_run_on_the_loop(self):
+        async def handler(*_):
+            await asyncio.sleep(0)
+            self.calls.append("async")
+
+        self.add(1, handler)
+
+        self.process()
+
+        self.assertEqual(self.calls, ["async"])
@@ -0,0 +1,108 @@
+from threading import Event, Thread
+from time import sleep
+from unittest import TestCase
+
+from utils.cache import SetCache, TTLCache
+
+
+class SetCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.source = [1, 2, 3]
+        self.loads = 0
+
+        def loader():
+            self.loads += 1
+            return list(self.source)
+
+        self.cache = SetCache("test", loader)
+
+    def test_lazy_load(self):
+        self.assertEqual(self.loads, 0)
+        self.assertIn(1, self.cache)
+        self.assertIn(2, self.cache)
+        self.assertEqual(self.loads, 1)
+
+    def test_add_discard(self):
+        self.cache.load()
+        self.cache.add(4)
+        self.cache.discard(1)
+        self.assertIn(4, self.cache)
+        self.assertNotIn(1, self.cache)
+        self.assertEqual(self.loads, 1)
+
+    def test_resync(self):
+        self.cache.load()
+        self.source.append(5)
+        self.assertNotIn(5, self.cache)
+        self.cache.load()
+        self.assertIn(5, self.cache)
+
+    def test_stats(self):
+        self.assertIn(1, self.cache)
+        self.assertNotIn(9, self.cache)
+        self.assertNotIn(8, self.cache)
+        stats = self.cache.stats()
+        self.assertEqual(stats["size"], 3)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+
+class TTLCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.cache = TTLCache("test", ttl=10, clock=lambda: self.now)
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.loads
+
+    def test_hit_until_expired(self):
+        self.assertEqual(self.cache.get("chat", self.load), 1)
+        self.now = 9
+        self.assertEqual(self.cache.get("chat", self.load), 1)
+        self.now = 11
+        self.assertEqual(self.cache.get("chat", self.load), 2)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_invalidate(self):
+        self.cache.get("chat", self.load)
+        self.cache.invalidate("chat")
+        self.assertEqual(self.cache.get("chat", self.load), 2)
+
+    def test_error_is_not_cached(self):
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            self.cache.get("chat", fail)
+        self.assertEqual(self.cache.get("chat", self.load), 1)
+
+    def test_concurrent_callers_share_load(self):
+        started, release = Event(), Event()
+
+        def slow_load():
+            started.set()
+            release.wait()
+            return self.load()
+
+        results = []
+        leader = Thread(target=lambda: results.append(self.cache.get("chat", slow_load)))
+        leader.start()
+        started.wait()
+
+        followers = [
+            Thread(target=lambda: results.append(self.cache.get("chat", self.load)))
+            for _ in range(3)
+        ]
+        for f in followers:
+            f.start()
+        while self.cache.stats()["shared"] < 3:
+            sleep(0.001)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+
+        self.assertEqual(results, [1, 1, 1, 1])
+        self.assertEqual(self.loads, 1)
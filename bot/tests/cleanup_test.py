@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+from threading import Event
+from typing import List
+from unittest import TestCase
+from unittest.mock import patch
+
+from pymongo.errors import PyMongoError
+from telegram.error import NetworkError
+from telegram.ext import CallbackContext
+
+import cleanup
+from cleanup import DB, CleanupScheduler
+from outbox import REPLY
+from tests.fakes import CHAT_ID, FakeUpdater, use_memory_db
+
+
+class CleanupSchedulerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        self.scheduler = CleanupScheduler(DB("cleanup"))
+        self.upd = FakeUpdater()
+        self.addCleanup(self.upd.stop)
+
+    def sweep(self):
+        self.scheduler.sweep(CallbackContext(self.upd.dispatcher))
+
+    def deleted(self) -> List[int]:
+        ids = [data["message_id"] for data in self.upd.bot.sent("deleteMessage")]
+        for data in self.upd.bot.sent("deleteMessages"):
+            ids.extend(data["message_ids"])
+        return sorted(ids)
+
+    def stored(self) -> List[int]:
+        return sorted(doc["message_id"] for doc in self.client["cleanup"].messages.find())
+
+    def test_restores_pending_on_start(self):
+        past = datetime.utcnow() - timedelta(seconds=1)
+        future = datetime.utcnow() + timedelta(hours=1)
+        DB("cleanup").add(CHAT_ID, 1, past)
+        DB("cleanup").add(CHAT_ID, 2, future)
+
+        self.scheduler.start(self.upd.job_queue)
+        self.upd.run_jobs()
+
+        self.assertEqual(self.deleted(), [1])
+        self.assertEqual(self.stored(), [2])
+        self.assertEqual(self.scheduler.stats()["pending"], 1)
+
+    def test_removes_records_after_delete(self):
+        self.scheduler.schedule(CHAT_ID, 1, -1)
+        self.scheduler.schedule(CHAT_ID, 2, 60)
+
+        self.sweep()
+
+        self.assertEqual(self.deleted(), [1])
+        self.assertEqual(self.stored(), [2])
+        self.assertEqual(self.scheduler.stats()["deleted"], 1)
+
+    def test_stores_due_at_in_utc(self):
+        self.scheduler.schedule(CHAT_ID, 1, 60)
+
+        due_at = self.client["cleanup"].messages.find_one()["due_at"]
+        self.assertEqual(due_at.utcoffset(), timedelta(0))
+        self.assertAlmostEqual(
+            due_at, datetime.now(timezone.utc) + timedelta(seconds=60), delta=timedelta(seconds=5)
+        )
+
+    @patch.object(cleanup, "SWEEP_BATCH", 2)
+    def test_sweeps_in_batches(self):
+        for message_id in (1, 2, 3):
+            self.scheduler.schedule(CHAT_ID, message_id, -1)
+
+        self.sweep()
+        self.assertEqual(self.deleted(), [1, 2])
+        self.assertEqual(self.stored(), [3])
+
+        self.sweep()
+        self.assertEqual(self.deleted(), [1, 2, 3])
+        self.assertEqual(self.stored(), [])
+
+    def test_transient_failure_is_retried(self):
+        def fail(_):
+            raise NetworkError("connection reset")
+
+        self.upd.bot.responses["deleteMessage"] = fail
+        self.scheduler.schedule(CHAT_ID, 1, -1)
+
+        self.sweep()
+        self.assertEqual(self.stored(), [1])
+        self.assertEqual(self.scheduler.stats()["pending"], 1)
+
+        del self.upd.bot.responses["deleteMessage"]
+        self.sweep()
+        self.assertEqual(self.stored(), [])
+        self.assertEqual(self.scheduler.stats()["deleted"], 1)
+
+    @patch.object(cleanup, "SEND_TIMEOUT", 0.05)
+    def test_stuck_outbox_does_not_block_sweep(self):
+        release = Event()
+        self.addCleanup(release.set)
+        self.upd.bot.outbox.submit(CHAT_ID, REPLY, release.wait)
+        self.scheduler.schedule(CHAT_ID, 1, -1)
+
+        self.sweep()
+        self.assertEqual(self.stored(), [1])
+        self.assertEqual(self.scheduler.stats()["pending"], 1)
+
+        release.set()
+        self.sweep()
+        self.assertEqual(self.deleted(), [1])
+        self.assertEqual(self.stored(), [])
+
+    def test_failed_record_removal_does_not_raise(self):
+        self.scheduler.schedule(CHAT_ID, 1, -1)
+
+        with patch.object(self.scheduler._db, "remove_many", side_effect=PyMongoError("down")):
+            self.sweep()
+
+        self.assertEqual(self.deleted(), [1])
+        self.assertEqual(self.stored(), [1])
@@ -0,0 +1,138 @@
+from datetime import datetime
+from itertools import count
+from queue import Queue
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import CallbackContext, Dispatcher, JobQueue
+from telegram.ext.utils.promise import Promise
+
+from db.memory import MemoryClient
+from db.mongo import use_client
+from outbox import Outbox, ScheduledBot
+
+TOKEN = "123456:TEST"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "kebab", "username": "kebab_bot"}
+CHAT_ID = -100500
+
+Call = Tuple[str, Dict[str, Any]]
+
+
+def use_memory_db() -> MemoryClient:
+    client = MemoryClient()
+    use_client(client)
+    return client
+
+
+class FakeBot(ScheduledBot):
+    def __init__(self):
+        super().__init__(TOKEN)
+        self.outbox = Outbox(
+            self.delete_messages, workers=1, global_rate=1e6, chat_rate=1e6, chat_burst=1e6
+        )
+        self.calls: List[Call] = []
+        self.responses: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+        self.admins: List[int] = []
+        self._message_ids = count(1000)
+
+    def _post(self, endpoint: str, data: Dict = None, timeout=None, api_kwargs: Dict = None) -> Any:
+        data = dict(data or {})
+        data.update(api_kwargs or {})
+        self.calls.append((endpoint, data))
+
+        if endpoint in self.responses:
+            return self.responses[endpoint](data)
+        if endpoint == "getMe":
+            return BOT_USER
+        if endpoint == "getChat":
+            return {"id": data["chat_id"], "type": "supergroup", "title": "chat"}
+        if endpoint == "getChatAdministrators":
+            return [
+                {"user": make_user(user_id), "status": "administrator"}
+                for user_id in self.admins
+            ]
+        if endpoint == "getChatMember":
+            return {"user": make_user(data["user_id"]), "status": "member"}
+        if endpoint.startswith("send") or endpoint.startswith("edit"):
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(datetime.now().timestamp()),
+                "chat": {"id": data.get("chat_id", CHAT_ID), "type": "supergroup"},
+                "from": BOT_USER,
+                "text": data.get("text"),
+            }
+        return True
+
+    def sent(self, endpoint: str) -> List[Dict[str, Any]]:
+        return [data for e, data in self.calls if e == endpoint]
+
+
+class SyncDispatcher(Dispatcher):
+    def __init__(self, bot: FakeBot):
+        super().__init__(bot, Queue(), workers=0, job_queue=JobQueue())
+        self.job_queue.set_dispatcher(self)
+        self.errors: List[Exception] = []
+        self.add_error_handler(lambda _, context: self.errors.append(context.error))
+
+    def run_async(self, func: Callable, *args, update: object = None, **kwargs) -> Promise:
+        promise = Promise(func, args, kwargs, update=update)
+        promise.run()
+        if promise.exception is not None:
+            self.dispatch_error(update, promise.exception, promise)
+        return promise
+
+
+class FakeUpdater:
+    def __init__(self, bot: Optional[FakeBot] = None):
+        self.bot = bot or FakeBot()
+        self.dispatcher = SyncDispatcher(self.bot)
+        self.job_queue = self.dispatcher.job_queue
+
+    def stop(self):
+        self.bot.outbox.stop()
+
+    def process(self, update: Update):
+        self.dispatcher.process_update(update)
+        self.bot.outbox.join(timeout=5)
+
+    def context(self, update: Update) -> CallbackContext:
+        return CallbackContext.from_update(update, self.dispatcher)
+
+    def run_jobs(self, name: Optional[str] = None):
+        for job in self.job_queue.jobs():
+            if name is None or job.name == name:
+                job.run(self.dispatcher)
+        self.bot.outbox.join(timeout=5)
+
+
+_update_ids = count(1)
+_message_ids = count(1)
+
+
+def make_user(user_id: int, first_name: str = "user", username: Optional[str] = None) -> Dict:
+    user = {"id": user_id, "is_bot": False, "first_name": f"{first_name}{user_id}"}
+    if username is not None:
+        user["username"] = username
+    return user
+
+
+def make_message_update(
+    bot: FakeBot,
+    text: Optional[str] = None,
+    user_id: int = 1,
+    chat_id: int = CHAT_ID,
+    **fields,
+) -> Update:
+    message = {
+        "message_id": next(_message_ids),
+        "date": int(datetime.now().timestamp()),
+        "chat": {"id": chat_id, "type": "supergroup", "title": "chat"},
+        "from": make_user(user_id),
+        **fields,
+    }
+    if text is not None:
+        message["text"] = text
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return Update.de_json({"update_id": next(_update_ids), "message": message}, bot)
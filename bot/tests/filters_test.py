@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from filters import AllOf, AnyOf, MeteredFilter
+
+
+class Constant(MeteredFilter):
+    def __init__(self, name: str, value: bool):
+        self.name = name
+        self.value = value
+        self.calls = 0
+        super().__init__()
+
+    def check(self, message) -> bool:
+        self.calls += 1
+        return self.value
+
+
+class MeteredFilterTestCase(TestCase):
+    def test_missing_check_fails_at_construction(self):
+        class Incomplete(MeteredFilter):
+            name = "Filters.incomplete"
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+    def test_compositions(self):
+        yes, no = Constant("Filters.yes", True), Constant("Filters.no", False)
+
+        self.assertIsInstance(yes | no, AnyOf)
+        self.assertIsInstance(yes & no, AllOf)
+        self.assertTrue((yes | no).filter(None))
+        self.assertFalse((yes & no).filter(None))
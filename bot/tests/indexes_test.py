@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from db import indexes as indexes_module
+from db.indexes import IndexRegistry
+from tests.fakes import FakeUpdater, use_memory_db
+
+
+def _stats(name: str, ops: int, since: datetime):
+    return {"name": name, "accesses": {"ops": ops, "since": since}}
+
+
+class IndexReportTestCase(TestCase):
+    def setUp(self) -> None:
+        use_memory_db()
+        self.registry = IndexRegistry()
+        self.registry.register("test", "items", [("a", 1)])
+        self.registry.register("test", "items", [("b", 1)])
+        self.registry.ensure()
+        self.now = datetime.utcnow()
+
+    def report_with(self, *stats):
+        with patch.object(indexes_module, "_index_stats", return_value=list(stats)):
+            return self.registry.report(self.now)
+
+    def test_fresh_counters_are_not_unused(self):
+        report = self.report_with(_stats("a_1", 0, self.now), _stats("b_1", 0, self.now))
+        self.assertEqual(report["unused"], [])
+
+    def test_flags_indexes_idle_for_long(self):
+        long_ago = self.now - indexes_module.UNUSED_AFTER - timedelta(minutes=1)
+        report = self.report_with(_stats("a_1", 0, long_ago), _stats("b_1", 3, long_ago))
+        self.assertEqual(report["unused"], ["test.items.a_1"])
+
+    def test_report_is_deferred_to_a_job(self):
+        upd = FakeUpdater()
+        self.addCleanup(upd.stop)
+
+        with patch.object(self.registry, "log_report") as log_report:
+            self.registry.start(upd.job_queue)
+            log_report.assert_not_called()
+
+            upd.run_jobs()
+            log_report.assert_called_once_with()
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from utils.leaderboard import Leaderboard
+
+
+class LeaderboardTestCase(TestCase):
+    def setUp(self) -> None:
+        self.rows = [{"_id": 1, "score": 10}, {"_id": 2, "score": 30}, {"_id": 3, "score": 20}]
+        self.loads = 0
+        self.board = Leaderboard("test", lambda e: e["score"], self.load)
+
+    def load(self):
+        self.loads += 1
+        return [dict(r) for r in self.rows]
+
+    def test_loads_lazily_once(self):
+        self.assertEqual(self.loads, 0)
+        self.assertEqual([e["_id"] for e in self.board.top()], [2, 3, 1])
+        self.assertEqual(len(self.board), 3)
+        self.assertEqual(self.loads, 1)
+
+    def test_top_and_rank(self):
+        self.assertEqual([e["_id"] for e in self.board.top(2)], [2, 3])
+        self.assertEqual(self.board.rank(1), 3)
+        self.assertIsNone(self.board.rank(42))
+
+    def test_put_updates_rank(self):
+        self.board.put({"_id": 1, "score": 40})
+        self.board.put({"_id": 4, "score": 25})
+        self.assertEqual([e["_id"] for e in self.board.top()], [1, 2, 4, 3])
+        self.assertEqual(self.board.rank(4), 3)
+
+        self.board.remove(2)
+        self.assertEqual(self.board.rank(4), 2)
+
+    def test_reconcile_counts_drift(self):
+        self.board.top()
+        self.board.put({"_id": 1, "score": 50})
+        self.board.reconcile()
+
+        self.assertEqual(self.board.get(1)["score"], 10)
+        self.assertEqual(self.board.stats(), {"size": 3, "reconciles": 1, "drift": 2})
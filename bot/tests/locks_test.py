@@ -0,0 +1,45 @@
+from threading import Event, Thread
+from unittest import TestCase
+
+from utils.locks import StripedLock
+
+
+class StripedLockTestCase(TestCase):
+    def setUp(self) -> None:
+        self.locks = StripedLock("test", stripes=8)
+
+    def hold(self, key) -> Event:
+        held, release = Event(), Event()
+
+        def holder():
+            with self.locks(key):
+                held.set()
+                release.wait()
+
+        Thread(target=holder, daemon=True).start()
+        held.wait()
+        return release
+
+    def test_different_keys_do_not_block(self):
+        release = self.hold(1)
+        with self.locks(2):
+            pass
+        release.set()
+        self.assertEqual(self.locks.stats()["contended"], 0)
+
+    def test_same_key_is_exclusive_and_counted(self):
+        release = self.hold(1)
+        entered = Event()
+
+        def contender():
+            with self.locks(1):
+                entered.set()
+
+        thread = Thread(target=contender, daemon=True)
+        thread.start()
+        self.assertFalse(entered.wait(0.05))
+
+        release.set()
+        thread.join(1)
+        self.assertTrue(entered.is_set())
+        self.assertEqual(self.locks.stats(), {"stripes": 8, "acquired": 2, "contended": 1})
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from pymongo import MongoClient
+
+from db.mongo import use_client, warm_up
+from main import _create_updater, _start_storage
+from tests.fakes import FakeBot, use_memory_db
+
+
+class MongoUnavailableTestCase(TestCase):
+    def setUp(self) -> None:
+        use_client(MongoClient("mongodb://127.0.0.1:1", connect=False, serverSelectionTimeoutMS=50))
+        self.addCleanup(use_memory_db)
+        self.bot = FakeBot()
+        self.addCleanup(self.bot.outbox.stop)
+
+    def run_jobs(self, updater) -> int:
+        jobs = [job for job in updater.job_queue.jobs() if not job.removed]
+        for job in jobs:
+            job.run(updater.dispatcher)
+        return sum(1 for job in jobs if not job.removed)
+
+    def test_starts_without_mongo(self):
+        mongo_ready = warm_up()
+        updater = _create_updater(self.bot, mongo_ready)
+        _start_storage(updater, mongo_ready)
+
+        self.assertFalse(mongo_ready)
+        self.assertIsNone(updater.dispatcher.persistence)
+
+        with self.assertLogs("cleanup", "ERROR"):
+            self.assertEqual(self.run_jobs(updater), 2)
+
+        use_memory_db()
+        self.assertEqual(self.run_jobs(updater), 1)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+from telegram.error import BadRequest
+
+from tests.fakes import FakeBot, use_memory_db
+
+from media import DB, MediaCache
+from utils.render import RenderedImage
+
+CHAT_ID = 1
+
+
+def _photo_message(data):
+    file_id = data["photo"] if isinstance(data["photo"], str) else "uploaded"
+    return {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": CHAT_ID, "type": "group"},
+        "photo": [{"file_id": file_id, "file_unique_id": "u", "width": 1, "height": 1}],
+    }
+
+
+class MediaCacheTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        self.bot = FakeBot()
+        self.bot.responses["sendPhoto"] = _photo_message
+        self.cache = MediaCache(DB("media"))
+        self.image = RenderedImage("digest", b"\xff\xd8data", "board.jpg")
+
+    def tearDown(self) -> None:
+        self.bot.outbox.stop()
+
+    def photos(self):
+        return [data["photo"] for data in self.bot.sent("sendPhoto")]
+
+    def test_reuses_file_id(self):
+        self.cache.send_photo(self.bot, CHAT_ID, self.image)
+        self.cache.send_photo(self.bot, CHAT_ID, self.image)
+
+        first, second = self.photos()
+        self.assertNotIsInstance(first, str)
+        self.assertEqual(second, "uploaded")
+        self.assertEqual(self.cache.stats()["bytes_saved"], len(self.image.data))
+
+    def test_file_id_survives_restart(self):
+        self.cache.send_photo(self.bot, CHAT_ID, self.image)
+        MediaCache(DB("media")).send_photo(self.bot, CHAT_ID, self.image)
+        self.assertEqual(self.photos()[1], "uploaded")
+
+    def test_rejected_file_id_is_reuploaded(self):
+        self.cache.send_photo(self.bot, CHAT_ID, self.image)
+
+        def reject(data):
+            if isinstance(data["photo"], str):
+                raise BadRequest("wrong file identifier")
+            return _photo_message(data)
+
+        self.bot.responses["sendPhoto"] = reject
+        self.cache.send_photo(self.bot, CHAT_ID, self.image)
+
+        self.assertEqual(len(self.photos()), 3)
+        self.assertNotIsInstance(self.photos()[2], str)
+        self.assertEqual(self.cache.stats()["misses"], 2)
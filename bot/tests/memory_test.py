@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import pymongo
+from pymongo import DeleteOne, IndexModel, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from db.memory import MemoryClient
+
+
+class MemoryCollectionTestCase(TestCase):
+    def setUp(self) -> None:
+        self.coll = MemoryClient().get_database("test").items
+
+    def test_insert_and_find_one(self):
+        self.coll.insert_one({"_id": 1, "name": "a"})
+        self.assertEqual(self.coll.find_one({"_id": 1}), {"_id": 1, "name": "a"})
+        self.assertIsNone(self.coll.find_one({"_id": 2}))
+        with self.assertRaises(DuplicateKeyError):
+            self.coll.insert_one({"_id": 1})
+
+    def test_returned_documents_are_copies(self):
+        self.coll.insert_one({"_id": 1, "tags": []})
+        self.coll.find_one({"_id": 1})["tags"].append("x")
+        self.assertEqual(self.coll.find_one({"_id": 1})["tags"], [])
+
+    def test_find_sort_limit_projection(self):
+        for i, score in enumerate([5, 1, 9, 3]):
+            self.coll.insert_one({"_id": i, "score": score, "other": "x"})
+
+        docs = list(
+            self.coll.find({"score": {"$gte": 3}}, {"score": 1})
+            .sort("score", pymongo.DESCENDING)
+            .limit(2)
+        )
+        self.assertEqual(docs, [{"_id": 2, "score": 9}, {"_id": 0, "score": 5}])
+
+    def test_query_operators(self):
+        now = datetime.now()
+        self.coll.insert_one({"_id": 1, "at": now - timedelta(minutes=1), "tags": ["a"]})
+        self.coll.insert_one({"_id": 2, "at": now + timedelta(minutes=1)})
+
+        self.assertEqual([d["_id"] for d in self.coll.find({"at": {"$lt": now}})], [1])
+        self.assertEqual([d["_id"] for d in self.coll.find({"_id": {"$in": [2, 3]}})], [2])
+        self.assertEqual([d["_id"] for d in self.coll.find({"tags": "a"})], [1])
+        self.assertEqual([d["_id"] for d in self.coll.find({"tags": {"$exists": False}})], [2])
+        self.assertEqual(
+            [d["_id"] for d in self.coll.find({"$or": [{"_id": 1}, {"_id": {"$gt": 1}}]})], [1, 2]
+        )
+        self.assertEqual(
+            [d["_id"] for d in self.coll.find({"$and": [{"_id": {"$gte": 1}}, {"tags": "a"}]})], [1]
+        )
+
+    def test_update_operators_and_upsert(self):
+        result = self.coll.update_one(
+            {"_id": 7},
+            {
+                "$setOnInsert": {"first": 1},
+                "$inc": {"count": 2},
+                "$addToSet": {"tags": "a"},
+                "$set": {"meta.name": "n"},
+            },
+            upsert=True,
+        )
+        self.assertEqual(result.upserted_id, 7)
+
+        self.coll.update_one(
+            {"_id": 7},
+            {"$setOnInsert": {"first": 2}, "$inc": {"count": 1}, "$addToSet": {"tags": "a"}},
+            upsert=True,
+        )
+        self.assertEqual(
+            self.coll.find_one({"_id": 7}),
+            {"_id": 7, "first": 1, "count": 3, "tags": ["a"], "meta": {"name": "n"}},
+        )
+
+    def test_array_update_operators(self):
+        self.coll.insert_one({"_id": 1, "tags": ["a"]})
+        self.coll.update_one({"_id": 1}, {"$push": {"tags": {"$each": ["a", "b"]}}})
+        self.coll.update_one({"_id": 1}, {"$pull": {"tags": "a"}, "$unset": {"missing": ""}})
+
+        self.assertEqual(self.coll.find_one({"_id": 1}), {"_id": 1, "tags": ["b"]})
+
+    def test_delete(self):
+        self.coll.insert_many([{"_id": i, "even": i % 2 == 0} for i in range(4)])
+        self.assertEqual(self.coll.delete_one({"even": True}).deleted_count, 1)
+        self.assertEqual(self.coll.delete_many({}).deleted_count, 3)
+        self.assertEqual(self.coll.count_documents({}), 0)
+
+    def test_bulk_write(self):
+        self.coll.insert_one({"_id": 1, "n": 1})
+        result = self.coll.bulk_write(
+            [
+                ReplaceOne({"_id": 1}, {"_id": 1, "n": 10}, upsert=True),
+                ReplaceOne({"_id": 2}, {"_id": 2, "n": 20}, upsert=True),
+                UpdateOne({"_id": 1}, {"$inc": {"n": 1}}),
+            ],
+            ordered=False,
+        )
+        self.assertEqual(result.upserted_count, 1)
+        self.assertEqual(result.matched_count, 2)
+        self.assertEqual([d["n"] for d in self.coll.find({}).sort("_id")], [11, 20])
+
+    def test_bulk_write_rejects_unused_operations(self):
+        with self.assertRaises(OperationFailure):
+            self.coll.bulk_write([DeleteOne({"_id": 1})])
+
+    def test_indexes(self):
+        self.coll.create_indexes([IndexModel([("at", pymongo.ASCENDING)], expireAfterSeconds=60)])
+        names = {ix["name"]: ix for ix in self.coll.list_indexes()}
+        self.assertEqual(set(names), {"_id_", "at_1"})
+        self.assertEqual(names["at_1"]["expireAfterSeconds"], 60)
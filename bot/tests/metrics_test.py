@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from utils.metrics import LatencyStats, MetricsRegistry, timed
+
+
+class LatencyStatsTestCase(TestCase):
+    def test_observe(self):
+        stats = LatencyStats("test", buckets_ms=(1, 10))
+        stats.observe(0.0005)
+        stats.observe(0.005, ok=False)
+        stats.observe(0.5)
+
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["count"], 3)
+        self.assertEqual(snapshot["histogram"], {"<=1ms": 1, "<=10ms": 1, ">10ms": 1})
+        self.assertEqual(snapshot["max_ms"], 500)
+        self.assertAlmostEqual(stats.ok_rate, 2 / 3)
+
+    def test_empty(self):
+        stats = LatencyStats("test")
+        self.assertEqual(stats.mean, 0)
+        self.assertEqual(stats.ok_rate, 0)
+
+    def test_timed(self):
+        stats = LatencyStats("test")
+        with timed(stats):
+            pass
+        self.assertEqual(stats.count, 1)
+
+
+class MetricsRegistryTestCase(TestCase):
+    def test_latency_is_shared_by_name(self):
+        registry = MetricsRegistry()
+        self.assertIs(registry.latency("a"), registry.latency("a"))
+
+    def test_snapshot_by_prefix_sorted_by_total(self):
+        registry = MetricsRegistry()
+        registry.latency("filter.fast").observe(0.001)
+        registry.latency("filter.slow").observe(0.1)
+        registry.latency("mongo.find").observe(1)
+
+        names = [s["name"] for s in registry.snapshot("filter.")]
+        self.assertEqual(names, ["filter.slow", "filter.fast"])
+
+    def test_gauges(self):
+        registry = MetricsRegistry()
+        depth = {"depth": 0}
+        registry.gauge("queue", lambda: dict(depth))
+        depth["depth"] = 3
+        self.assertEqual(registry.gauges(), {"queue": {"depth": 3}})
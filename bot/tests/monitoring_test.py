@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from db.monitoring import QueryMonitor, get_query_stats
+
+
+def _event(request_id: int, command: dict, duration_ms: float = 0.0):
+    return SimpleNamespace(
+        request_id=request_id,
+        connection_id=("localhost", 27017),
+        command_name=next(iter(command)),
+        command=command,
+        database_name="roll",
+        duration_micros=int(duration_ms * 1000),
+        failure={"errmsg": "boom"},
+    )
+
+
+class QueryMonitorTestCase(TestCase):
+    def setUp(self) -> None:
+        self.monitor = QueryMonitor(slow_ms=50)
+
+    def run_in_skill(self, request_id: int, command: dict):
+        scope = {"__name__": "skills.fake", "monitor": self.monitor, "event": _event}
+        exec("def query(i, c):\n    monitor.started(event(i, c))\n", scope)
+        scope["query"](request_id, command)
+
+    def test_attributes_command_to_skill_and_collection(self):
+        self.run_in_skill(1, {"find": "leaders", "filter": {}})
+        self.monitor.succeeded(_event(1, {"find": "leaders"}, duration_ms=3))
+
+        stats = {s["name"]: s for s in get_query_stats("fake")}
+        self.assertEqual(stats["mongo.fake.roll.leaders.find"]["count"], 1)
+        self.assertEqual(self.monitor.stats(), {"inflight": 0, "slow": 0})
+
+    def test_slow_and_failed_commands(self):
+        self.run_in_skill(2, {"update": "leaders"})
+        self.monitor.failed(_event(2, {"update": "leaders"}, duration_ms=80))
+
+        self.assertEqual(len(self.monitor.slow), 1)
+        self.assertEqual(self.monitor.slow[0]["command"], "update")
+        self.assertFalse(self.monitor.slow[0]["ok"])
+
+    def test_caller_outside_skills(self):
+        self.monitor.started(_event(3, {"insert": "messages"}))
+        self.monitor.succeeded(_event(3, {"insert": "messages"}))
+        self.assertTrue(any("messages.insert" in s["name"] for s in get_query_stats()))
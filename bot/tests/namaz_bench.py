@@ -0,0 +1,29 @@
+import timeit
+
+from bs4 import BeautifulSoup
+
+from skills.namaz import PARSER, parse_timetable
+from tests.namaz_test import load_synthetic_page
+
+NUMBER = 200
+
+
+def _parse_full(content: bytes):
+    soup = BeautifulSoup(content, "html.parser")
+    return [
+        [cell.text for cell in soup.find("td", text=day).parent.children]
+        for day in ("01.09.2021", "02.09.2021")
+    ]
+
+
+def main():
+    content = load_synthetic_page()
+    days = len(parse_timetable(content))
+
+    for name, parse in (("full page, 2 days", _parse_full), (f"{PARSER} rows, {days} days", parse_timetable)):
+        seconds = timeit.timeit(lambda: parse(content), number=NUMBER)
+        print(f"{name:<28} {seconds / NUMBER * 1000:8.3f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
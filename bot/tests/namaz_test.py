@@ -0,0 +1,319 @@
+import os
+from datetime import date, datetime, timedelta
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from telegram.error import BadRequest
+
+from tests.fakes import CHAT_ID, FakeUpdater, make_message_update, use_memory_db
+
+from filters import chat_admins
+from skills import namaz
+from utils.prayer_times import FINIKE, LOCATIONS
+
+OTHER_CHAT_ID = -100600
+
+
+def local(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2021, 9, day, hour, minute, tzinfo=FINIKE.tz)
+
+
+NOW = local(1, 12)
+TODAY = ["05:12", "06:40", "12:55", "16:30", "19:20", "20:40"]
+TOMORROW = ["05:13", "06:41", "12:55", "16:29", "19:18", "20:38"]
+# Synthetic page in the layout of the Diyanet timetable; the times are the
+# astronomical calculation shifted by a minute, not a saved capture.
+SYNTHETIC_PAGE = os.path.join(os.path.dirname(__file__), "fixtures", "namaz_finike_synthetic.html")
+SYNTHETIC_TODAY = ["05:02", "06:25", "13:05", "16:43", "19:35", "20:52"]
+
+
+def load_synthetic_page() -> bytes:
+    with open(SYNTHETIC_PAGE, "rb") as f:
+        return f.read()
+
+
+class NamazBaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        namaz.db.save_days("finike", {date(2021, 9, 1): TODAY, date(2021, 9, 2): TOMORROW})
+        namaz.schedule.invalidate()
+        namaz.chat_locations.reset({CHAT_ID})
+
+        self.now = NOW
+        now = patch.object(namaz, "_get_now", lambda: self.now)
+        now.start()
+        self.addCleanup(now.stop)
+
+        self.upd = FakeUpdater()
+        self.bot = self.upd.bot
+
+    def tearDown(self) -> None:
+        self.upd.stop()
+
+    def pending(self, location=FINIKE):
+        return [
+            job
+            for job in self.upd.job_queue.get_jobs_by_name(namaz._job_name(location))
+            if not job.removed
+        ]
+
+    def run_pending(self, location=FINIKE):
+        jobs = self.pending(location)
+        for job in jobs:
+            job.schedule_removal()
+        for job in jobs:
+            job.run(self.upd.dispatcher)
+        self.bot.outbox.join(timeout=5)
+
+
+class NamazTestCase(NamazBaseTestCase):
+    def test_schedule_is_parsed_once(self):
+        loads = namaz.schedule.loads
+        for _ in range(5):
+            namaz._get_namaz()
+
+        self.assertEqual(namaz.schedule.loads, loads + 1)
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(minutes=55))
+
+    def test_tomorrow_first_pray_after_last_one(self):
+        self.now = local(1, 21)
+
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(hours=8, minutes=13))
+
+    def test_missing_times_are_calculated(self):
+        namaz.db.drop_days()
+
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(minutes=64))
+
+    def test_one_job_per_window(self):
+        namaz.schedule_notifications(self.upd.job_queue, FINIKE)
+        namaz.schedule_notifications(self.upd.job_queue, FINIKE)
+
+        self.assertEqual(len(self.pending()), 1)
+        self.assertEqual(self.pending()[0].context["pray_time"], datetime(2021, 9, 1, 12, 55))
+
+    def test_warning_edits_and_removal(self):
+        namaz.schedule_notifications(self.upd.job_queue, FINIKE)
+
+        self.now = local(1, 12, 45)
+        self.run_pending()
+
+        self.assertEqual(len(self.bot.sent("sendMessage")), 1)
+        self.assertIn("10 минут", self.bot.sent("sendMessage")[0]["text"])
+        self.assertEqual(len(self.pending()), 10)
+
+        self.now = local(1, 12, 54)
+        edits = [job for job in self.pending() if job.callback == namaz._edit_warning]
+        for job in edits:
+            job.schedule_removal()
+        edits[-1].run(self.upd.dispatcher)
+        self.assertIn("1 минута", self.bot.sent("editMessageText")[0]["text"])
+
+        self.now = local(1, 12, 55)
+        self.run_pending()
+
+        self.assertEqual(len(self.bot.sent("deleteMessage")), 1)
+        self.assertEqual(len(self.pending()), 1)
+        self.assertEqual(self.pending()[0].context["pray_time"], datetime(2021, 9, 1, 16, 30))
+
+    def test_failed_edit_does_not_stop_other_chats(self):
+        namaz.chat_locations.reset({CHAT_ID, OTHER_CHAT_ID})
+        namaz.schedule_notifications(self.upd.job_queue, FINIKE)
+        self.now = local(1, 12, 45)
+        self.run_pending()
+
+        def edit(_):
+            raise BadRequest("Message to edit not found")
+
+        self.bot.responses["editMessageText"] = edit
+        self.now = local(1, 12, 54)
+        edits = [job for job in self.pending() if job.callback == namaz._edit_warning]
+        edits[-1].run(self.upd.dispatcher)
+
+        edited = {data["chat_id"] for data in self.bot.sent("editMessageText")}
+        self.assertEqual(edited, {CHAT_ID, OTHER_CHAT_ID})
+
+    def test_failed_removal_still_reschedules(self):
+        namaz.schedule_notifications(self.upd.job_queue, FINIKE)
+        self.now = local(1, 12, 45)
+        self.run_pending()
+
+        self.now = local(1, 12, 55)
+        removal = [job for job in self.pending() if job.callback == namaz._remove_message]
+        for job in self.pending():
+            job.schedule_removal()
+
+        def fail(_):
+            raise BadRequest("Message to delete not found")
+
+        self.bot.responses["deleteMessage"] = fail
+        with self.assertLogs("outbox", "INFO"):
+            removal[0].run(self.upd.dispatcher)
+            self.bot.outbox.join(timeout=5)
+
+        self.assertEqual(len(self.bot.sent("deleteMessage")), 1)
+        self.assertEqual(len(self.pending()), 1)
+        self.assertEqual(self.pending()[0].context["pray_time"], datetime(2021, 9, 1, 16, 30))
+
+
+class TimetableTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        namaz.schedule.invalidate()
+        namaz.chat_locations.reset({CHAT_ID})
+
+        self.now = NOW
+        now = patch.object(namaz, "_get_now", lambda: self.now)
+        now.start()
+        self.addCleanup(now.stop)
+
+        self.get = MagicMock(return_value=MagicMock(content=load_synthetic_page()))
+        scraper = patch.object(namaz.scraper, "get", self.get)
+        scraper.start()
+        self.addCleanup(scraper.stop)
+
+        self.upd = FakeUpdater()
+        self.addCleanup(self.upd.stop)
+        self.upd.job_queue.run_once(
+            namaz.update_datas, 10, name="update_datas"
+        )
+
+    def test_parse_synthetic_page(self):
+        timetable = namaz.parse_timetable(load_synthetic_page())
+
+        self.assertEqual(len(timetable), 30)
+        self.assertEqual(min(timetable), date(2021, 9, 1))
+        self.assertEqual(max(timetable), date(2021, 9, 30))
+        self.assertEqual(timetable[date(2021, 9, 1)], SYNTHETIC_TODAY)
+
+    def test_skips_malformed_rows(self):
+        html = (
+            "<table><tr><td>01.09.2021</td><td>05:12</td></tr>"
+            "<tr><td>02.09.2021</td><td>x</td>"
+            + "".join(f"<td>{t}</td>" for t in TOMORROW)
+            + "</tr></table>"
+        )
+
+        self.assertEqual(namaz.parse_timetable(html), {date(2021, 9, 2): TOMORROW})
+
+    def test_fetches_once_for_covered_range(self):
+        self.upd.run_jobs("update_datas")
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(self.get.call_count, 1)
+        self.assertEqual(namaz.db.last_day("finike"), date(2021, 9, 30))
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(minutes=65))
+
+    def test_refetches_near_end_of_range(self):
+        self.upd.run_jobs("update_datas")
+        self.now = local(28, 12)
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(self.get.call_count, 2)
+        self.assertEqual(namaz.db.find_days("finike", [date(2021, 9, 27)]), {})
+
+    def test_failed_fetch_keeps_schedule(self):
+        self.upd.run_jobs("update_datas")
+        self.now = local(28, 12)
+        self.get.side_effect = ConnectionError("down")
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(namaz.db.last_day("finike"), date(2021, 9, 30))
+        self.assertIsNotNone(namaz._get_next_pray_delta())
+
+    def test_failed_fetch_keeps_scraped_days(self):
+        self.upd.run_jobs("update_datas")
+        scraped = namaz.db.find_days("finike", [date(2021, 9, 29), date(2021, 9, 30)])
+        self.now = local(29, 12)
+        self.get.side_effect = ConnectionError("down")
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(
+            namaz.db.find_days("finike", [date(2021, 9, 29), date(2021, 9, 30)]), scraped
+        )
+        self.assertEqual(namaz.db.last_day("finike"), date(2021, 10, 1))
+
+    def test_failed_fetch_falls_back_to_calculation(self):
+        self.get.side_effect = ConnectionError("down")
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(namaz.db.last_day("finike"), date(2021, 9, 3))
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(minutes=64))
+
+        self.get.side_effect = None
+        self.upd.run_jobs("update_datas")
+
+        self.assertEqual(self.get.call_count, 2)
+        self.assertEqual(namaz._get_next_pray_delta(), timedelta(minutes=65))
+
+    @patch.dict(os.environ, {"NAMAZ_SOURCE": "astronomical"})
+    def test_astronomical_source_needs_no_network(self):
+        self.upd.run_jobs("update_datas")
+
+        self.get.assert_not_called()
+        self.assertEqual(namaz.db.last_day("finike"), date(2022, 9, 1))
+
+
+class LocationTestCase(NamazBaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        env = patch.dict(os.environ, {"DEBUG": "false", "CHAT_ID": str(CHAT_ID)})
+        env.start()
+        self.addCleanup(env.stop)
+        chat_admins.clear()
+        self.bot.admins = [1]
+
+        namaz.add_namaz(self.upd, 1)
+        namaz.chat_locations.reset({CHAT_ID})
+
+    def send(self, text: str, chat_id: int = CHAT_ID):
+        self.upd.process(make_message_update(self.bot, text, user_id=1, chat_id=chat_id))
+
+    def test_chat_selects_city(self):
+        self.send("/namaz_city istanbul", chat_id=OTHER_CHAT_ID)
+
+        self.assertEqual(namaz.chat_locations.get(OTHER_CHAT_ID), LOCATIONS["istanbul"])
+        self.assertEqual(namaz.chat_locations.get(CHAT_ID), FINIKE)
+        self.assertEqual(
+            self.client["namaz"].chats.find_one({"_id": OTHER_CHAT_ID})["location"], "istanbul"
+        )
+        self.assertEqual(len(self.pending(LOCATIONS["istanbul"])), 1)
+
+    def test_group_chat_username_is_resolved(self):
+        self.bot.responses["getChat"] = lambda _: {"id": OTHER_CHAT_ID, "type": "supergroup"}
+
+        with patch.dict(os.environ, {"CHAT_ID": "@kebab_chat"}):
+            namaz.add_namaz(self.upd, 2)
+
+        self.assertEqual(namaz.chat_locations.chats(FINIKE), [OTHER_CHAT_ID])
+        self.assertEqual(self.bot.sent("getChat"), [{"chat_id": "@kebab_chat"}])
+
+    def test_unknown_city_lists_cities(self):
+        self.send("/namaz_city atlantis")
+
+        self.assertIn("istanbul", self.bot.sent("sendMessage")[-1]["text"])
+        self.assertEqual(namaz.chat_locations.get(CHAT_ID), FINIKE)
+
+    def test_chats_share_location_schedule_and_timer(self):
+        self.send("/namaz_city finike", chat_id=OTHER_CHAT_ID)
+        loads = namaz.schedule.loads
+
+        for chat_id in (CHAT_ID, OTHER_CHAT_ID):
+            self.send("/namaz", chat_id=chat_id)
+
+        self.assertEqual(namaz.schedule.loads, loads)
+        self.assertEqual(len(self.pending()), 1)
+
+        self.now = local(1, 12, 45)
+        self.run_pending()
+
+        warned = {data["chat_id"] for data in self.bot.sent("sendMessage")[-2:]}
+        self.assertEqual(warned, {CHAT_ID, OTHER_CHAT_ID})
+
+    def test_location_uses_own_times(self):
+        self.send("/namaz_city istanbul")
+
+        self.assertEqual(self.bot.sent("sendMessage")[-1]["text"], "Город для намаза: istanbul")
+        self.assertNotEqual(
+            namaz._get_next_pray_delta(LOCATIONS["istanbul"]), namaz._get_next_pray_delta()
+        )
@@ -0,0 +1,196 @@
+from threading import Event
+from unittest import TestCase
+from unittest.mock import patch
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+import outbox
+from outbox import COSMETIC, MODERATION, REPLY, Outbox
+from tests.fakes import FakeBot
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self) -> None:
+        self.batches = []
+        self.outbox = Outbox(self.delete_batch, workers=1)
+
+    def tearDown(self) -> None:
+        self.outbox.stop()
+
+    def delete_batch(self, chat_id, message_ids):
+        self.batches.append((chat_id, message_ids))
+        return True
+
+    def block_worker(self) -> Event:
+        started, release = Event(), Event()
+
+        def blocker():
+            started.set()
+            release.wait()
+
+        self.outbox.submit("busy", REPLY, blocker)
+        started.wait()
+        return release
+
+    def test_priority_order(self):
+        calls = []
+        release = self.block_worker()
+
+        futures = [
+            self.outbox.submit(1, COSMETIC, lambda: calls.append("pin")),
+            self.outbox.submit(2, REPLY, lambda: calls.append("reply")),
+            self.outbox.submit(3, MODERATION, lambda: calls.append("restrict")),
+        ]
+        release.set()
+        for f in futures:
+            f.result(timeout=5)
+
+        self.assertEqual(calls, ["restrict", "reply", "pin"])
+
+    def test_coalesces_deletes_per_chat(self):
+        single = []
+        release = self.block_worker()
+
+        futures = [
+            self.outbox.delete(1, message_id, lambda: single.append(1))
+            for message_id in (10, 11, 12)
+        ]
+        release.set()
+        for f in futures:
+            self.assertTrue(f.result(timeout=5))
+
+        self.assertEqual(self.batches, [(1, [10, 11, 12])])
+        self.assertEqual(single, [])
+        self.assertEqual(self.outbox.stats()["coalesced"], 2)
+
+    def test_retry_after(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RetryAfter(0.01)
+            return "sent"
+
+        self.assertEqual(self.outbox.submit(1, REPLY, flaky).result(timeout=5), "sent")
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(self.outbox.stats()["retries"], 1)
+
+    def test_errors_reach_caller(self):
+        def fail():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            self.outbox.submit(1, REPLY, fail).result(timeout=5)
+
+
+class BotMetadataTestCase(TestCase):
+    def setUp(self) -> None:
+        self.bot = FakeBot()
+
+    def tearDown(self) -> None:
+        self.bot.outbox.stop()
+
+    def test_get_me_is_cached(self):
+        for _ in range(3):
+            self.assertEqual(self.bot.get_me().id, 123456)
+
+        self.assertEqual(len(self.bot.sent("getMe")), 1)
+        self.assertEqual(self.bot.metadata_stats()["saved"], 2)
+
+        self.bot.invalidate_me()
+        self.bot.get_me()
+        self.assertEqual(len(self.bot.sent("getMe")), 2)
+
+    def test_get_chat_is_cached_by_id_and_username(self):
+        self.bot.responses["getChat"] = lambda data: {"id": -100500, "type": "supergroup"}
+
+        self.assertEqual(self.bot.get_chat("@chat").id, -100500)
+        self.assertEqual(self.bot.get_chat("@chat").id, -100500)
+        self.assertEqual(self.bot.get_chat(-100500).id, -100500)
+        self.assertEqual(len(self.bot.sent("getChat")), 1)
+
+        self.bot.invalidate_chat(-100500)
+        self.bot.get_chat(-100500)
+        self.assertEqual(len(self.bot.sent("getChat")), 2)
+        self.assertEqual(self.bot.metadata_stats()["calls"], 2)
+
+    def test_invalidate_chat_drops_every_alias(self):
+        self.bot.responses["getChat"] = lambda data: {"id": -100500, "type": "supergroup"}
+        self.bot.get_chat("@chat")
+
+        self.bot.invalidate_chat(-100500)
+        self.bot.get_chat("@chat")
+        self.bot.get_chat(-100500)
+
+        self.assertEqual(len(self.bot.sent("getChat")), 2)
+
+        self.bot.invalidate_chat("@chat")
+        self.bot.get_chat(-100500)
+
+        self.assertEqual(len(self.bot.sent("getChat")), 3)
+
+    def test_failed_lookup_is_not_cached(self):
+        def fail(_):
+            raise RetryAfter(1)
+
+        self.bot.responses["getChat"] = fail
+        with self.assertRaises(RetryAfter):
+            self.bot.get_chat(1)
+
+        del self.bot.responses["getChat"]
+        self.assertEqual(self.bot.get_chat(1).id, 1)
+
+
+class ScheduledBotTestCase(TestCase):
+    def setUp(self) -> None:
+        self.bot = FakeBot()
+        self.addCleanup(self.bot.outbox.stop)
+
+    def test_post_delete_does_not_block(self):
+        release = Event()
+        self.bot.outbox.submit(-1, REPLY, release.wait)
+
+        future = self.bot.post_delete(-1, 10)
+
+        self.assertFalse(future.done())
+        release.set()
+        self.assertTrue(future.result(timeout=5))
+
+    def test_delete_message_keeps_bot_contract(self):
+        self.assertIs(self.bot.delete_message(-1, 10), True)
+
+        def fail(_):
+            raise BadRequest("Message to delete not found")
+
+        self.bot.responses["deleteMessage"] = fail
+        with self.assertRaises(BadRequest):
+            self.bot.delete_message(-1, 11)
+
+    def test_cleanup_deletes_are_cosmetic(self):
+        release = Event()
+        self.bot.outbox.submit(-1, REPLY, release.wait)
+        order = []
+        self.bot.responses["deleteMessage"] = lambda data: order.append("delete") or True
+        self.bot.responses["sendMessage"] = lambda data: order.append("send") or True
+
+        cleanup = self.bot.schedule_delete(-2, 10)
+        reply = self.bot.post_message(-2, "hi")
+        release.set()
+        cleanup.result(timeout=5)
+        reply.result(timeout=5)
+
+        self.assertEqual(order, ["send", "delete"])
+
+    def test_sends_wait_for_a_bounded_time(self):
+        release = Event()
+        self.bot.outbox.submit(-1, REPLY, release.wait)
+        self.addCleanup(release.set)
+
+        with patch.object(outbox, "SEND_TIMEOUT", 0.05):
+            with self.assertRaises(TimedOut):
+                self.bot.send_message(-1, "late")
+
+        release.set()
+        self.bot.outbox.join(timeout=5)
+        self.assertEqual(self.bot.sent("sendMessage"), [])
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from tests.fakes import use_memory_db
+
+from persistence import MongoPersistence
+
+
+class MongoPersistenceTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        self.coll = self.client["persistence"].chat_data
+
+    def test_chat_data_loads_lazily(self):
+        self.coll.insert_one({"_id": 1, "data": {"barrel": [False, True]}})
+        persistence = MongoPersistence("persistence")
+
+        chat_data = persistence.get_chat_data()
+        self.assertEqual(len(chat_data), 0)
+        self.assertEqual(chat_data[1], {"barrel": [False, True]})
+        self.assertEqual(chat_data[2], {})
+        self.assertEqual(persistence.loads, 2)
+
+    def test_flush_writes_only_changed_chats(self):
+        persistence = MongoPersistence("persistence")
+        chat_data = persistence.get_chat_data()
+
+        chat_data[1]["is_smile_mode_on"] = True
+        persistence.update_chat_data(1, chat_data[1])
+        persistence.update_chat_data(2, chat_data[2])
+        self.assertEqual(self.coll.count_documents({}), 0)
+
+        persistence.flush()
+        self.assertEqual(
+            list(self.coll.find({})), [{"_id": 1, "data": {"is_smile_mode_on": True}}]
+        )
+
+        persistence.update_chat_data(1, chat_data[1])
+        persistence.flush()
+        self.assertEqual(persistence.flushed, 1)
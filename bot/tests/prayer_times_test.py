@@ -0,0 +1,36 @@
+from datetime import date
+from unittest import TestCase
+
+from utils.prayer_times import FINIKE, Location, compute_timetable, compute_times
+
+
+class PrayerTimesTestCase(TestCase):
+    def test_year_in_one_call(self):
+        times = compute_times(FINIKE, date(2021, 1, 1), 365)
+
+        self.assertEqual(times.shape, (365, 6))
+        self.assertTrue((times[:, 1:] > times[:, :-1]).all())
+
+    def test_finike_times(self):
+        timetable = compute_timetable(FINIKE, date(2021, 9, 1), 1)
+
+        self.assertEqual(
+            timetable[date(2021, 9, 1)],
+            ["05:01", "06:24", "13:04", "16:42", "19:34", "20:51"],
+        )
+
+    def test_dhuhr_follows_longitude(self):
+        east = Location("east", FINIKE.latitude, FINIKE.longitude + 15, FINIKE.utc_offset)
+
+        finike = compute_times(FINIKE, date(2021, 3, 20), 1)[0, 2]
+        shifted = compute_times(east, date(2021, 3, 20), 1)[0, 2]
+
+        self.assertAlmostEqual(finike - shifted, 1, places=2)
+
+    def test_days_are_consecutive(self):
+        timetable = compute_timetable(FINIKE, date(2021, 12, 30), 4)
+
+        self.assertEqual(
+            list(timetable),
+            [date(2021, 12, 30), date(2021, 12, 31), date(2022, 1, 1), date(2022, 1, 2)],
+        )
@@ -0,0 +1,30 @@
+from unittest import TestCase
+
+from utils.rate import TokenBucket
+
+
+class TokenBucketTestCase(TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.bucket = TokenBucket(rate=2, capacity=3, clock=lambda: self.now)
+
+    def test_burst_up_to_capacity(self):
+        self.assertTrue(self.bucket.consume())
+        self.assertTrue(self.bucket.consume())
+        self.assertTrue(self.bucket.consume())
+        self.assertFalse(self.bucket.consume())
+        self.assertAlmostEqual(self.bucket.delay(), 0.5)
+
+    def test_refill(self):
+        for _ in range(3):
+            self.bucket.consume()
+        self.now = 0.5
+        self.assertEqual(self.bucket.delay(), 0)
+        self.assertTrue(self.bucket.consume())
+        self.assertFalse(self.bucket.consume())
+
+    def test_refill_is_capped(self):
+        self.now = 100
+        for _ in range(3):
+            self.assertTrue(self.bucket.consume())
+        self.assertFalse(self.bucket.consume())
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from PIL import Image
+
+from utils.render import FONT_PATH as FONT, TextRenderer, get_font
+
+
+class TextRendererTestCase(TestCase):
+    def setUp(self) -> None:
+        self.renderer = TextRenderer(font_path=FONT, memo_size=2)
+
+    def test_renders_jpeg_in_memory(self):
+        rendered = self.renderer.render("hello", 3)
+        image = Image.open(rendered.open())
+
+        self.assertEqual(image.format, "JPEG")
+        self.assertEqual(image.size, (480, int(3 * 12 * 1.5 + 30)))
+        self.assertLess(image.getextrema()[0], 128)
+        self.assertTrue(rendered.open().name.endswith(".jpg"))
+
+    def test_memoizes_by_content(self):
+        first = self.renderer.render("board", 5)
+        self.assertIs(self.renderer.render("board", 5), first)
+        self.assertIsNot(self.renderer.render("board!", 5), first)
+        self.assertEqual(self.renderer.stats(), {"size": 2, "hits": 1, "misses": 2})
+
+    def test_evicts_least_recently_used(self):
+        a = self.renderer.render("a", 1)
+        self.renderer.render("b", 1)
+        self.renderer.render("a", 1)
+        self.renderer.render("c", 1)
+
+        self.assertIs(self.renderer.render("a", 1), a)
+        self.assertEqual(self.renderer.stats()["size"], 2)
+        self.assertEqual(self.renderer.stats()["misses"], 3)
+
+    def test_font_loaded_once(self):
+        self.renderer.render("x", 1)
+        TextRenderer(font_path=FONT).render("y", 1)
+        self.assertIs(get_font(FONT, 12), get_font(FONT, 12))
@@ -0,0 +1,67 @@
+from threading import Event, Thread
+from unittest import TestCase
+from unittest.mock import patch
+
+from pymongo.errors import PyMongoError
+from telegram import User
+
+from tests.fakes import use_memory_db
+
+from skills import roll
+
+USER = User(1, "user1", False)
+
+
+class RollDBTestCase(TestCase):
+    def setUp(self) -> None:
+        self.client = use_memory_db()
+        self.leaders = self.client["roll"].leaders
+        self.db = roll.DB("roll")
+
+    def test_failed_flush_is_retried(self):
+        self.db.miss(USER)
+        with patch.object(self.leaders, "bulk_write", side_effect=PyMongoError("down")):
+            self.db.flush()
+
+        self.db.flush()
+
+        self.assertEqual(self.leaders.find_one({"_id": 1})["shot_counter"], 1)
+
+    def test_removed_user_is_not_merged_back(self):
+        self.db.miss(USER)
+
+        def fail(*_, **__):
+            self.db.remove(USER.id)
+            raise PyMongoError("down")
+
+        with patch.object(self.leaders, "bulk_write", side_effect=fail):
+            self.db.flush()
+        self.db.flush()
+
+        self.assertIsNone(self.leaders.find_one({"_id": 1}))
+        self.assertIsNone(self.db.find(USER.id))
+
+    def test_remove_waits_for_flush(self):
+        self.db.miss(USER)
+        writing, release = Event(), Event()
+        bulk_write = self.leaders.bulk_write
+
+        def slow(*args, **kwargs):
+            writing.set()
+            release.wait(5)
+            return bulk_write(*args, **kwargs)
+
+        with patch.object(self.leaders, "bulk_write", side_effect=slow):
+            flush = Thread(target=self.db.flush)
+            flush.start()
+            writing.wait(5)
+            remove = Thread(target=self.db.remove_all)
+            remove.start()
+            remove.join(0.1)
+            self.assertTrue(remove.is_alive())
+
+            release.set()
+            flush.join(5)
+            remove.join(5)
+
+        self.assertEqual(self.leaders.count_documents({}), 0)
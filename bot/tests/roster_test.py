@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from telegram import ChatMember, ChatMemberUpdated
+
+from tests.fakes import FakeBot, make_user, use_memory_db
+
+from roster import DB, ChatRoster
+
+CHAT_ID = -1
+
+
+class ChatRosterTestCase(TestCase):
+    def setUp(self) -> None:
+        use_memory_db()
+        self.roster = ChatRoster(DB("roster"))
+
+    def test_restriction_expires(self):
+        now = datetime.now()
+        self.roster.set(CHAT_ID, 1, ChatMember.RESTRICTED, now + timedelta(hours=1))
+        self.roster.set(CHAT_ID, 2, ChatMember.RESTRICTED, now - timedelta(seconds=1))
+        self.roster.set(CHAT_ID, 3, ChatMember.MEMBER)
+
+        self.assertEqual(self.roster.restricted(CHAT_ID), {1})
+        self.assertEqual(self.roster.restricted(42), set())
+
+    def test_tracks_chat_member_updates(self):
+        bot = FakeBot()
+        member_update = ChatMemberUpdated.de_json(
+            {
+                "chat": {"id": CHAT_ID, "type": "supergroup"},
+                "from": make_user(9),
+                "date": 0,
+                "old_chat_member": {"user": make_user(1), "status": "member"},
+                "new_chat_member": {"user": make_user(1), "status": "restricted", "until_date": 0},
+            },
+            bot,
+        )
+        self.roster.track(member_update)
+
+        self.assertEqual(self.roster.restricted(CHAT_ID), {1})
+        self.assertEqual(ChatRoster(DB("roster")).restricted(CHAT_ID), {1})
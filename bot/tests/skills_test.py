@@ -0,0 +1,152 @@
+import os
+from datetime import datetime, timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from tests.fakes import (
+    CHAT_ID,
+    FakeUpdater,
+    make_message_update,
+    make_user,
+    use_memory_db,
+)
+
+from filters import chat_admins, trusted_users
+from skills import roll, since_mode, towel_mode, trusted_mode
+
+
+class SkillTestCase(TestCase):
+    def setUp(self) -> None:
+        env = patch.dict(os.environ, {"DEBUG": "false"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.client = use_memory_db()
+        self.upd = FakeUpdater()
+        self.bot = self.upd.bot
+        chat_admins.clear()
+        trusted_users.load()
+
+    def tearDown(self) -> None:
+        self.upd.stop()
+        self.assertEqual(self.upd.dispatcher.errors, [])
+
+    def send(self, text: str, user_id: int = 1, **fields):
+        self.upd.process(make_message_update(self.bot, text, user_id=user_id, **fields))
+
+    def texts(self):
+        return [data["text"] for data in self.bot.sent("sendMessage")]
+
+
+class SinceTestCase(SkillTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        since_mode.add_since_mode(self.upd, 1)
+
+    def test_since_counts_topic(self):
+        self.send("/since kebab")
+        self.send("/since kebab")
+
+        topic = self.client["since_mode"].topics.find_one({"topic": "kebab"})
+        self.assertEqual(topic["count"], 2)
+        self.assertEqual(len(self.texts()), 2)
+
+    def test_mode_off_disables_handlers(self):
+        self.bot.admins = [1]
+        self.send("/since_mode_off")
+        self.send("/since kebab")
+
+        self.assertEqual(self.texts(), ["since_mode is OFF"])
+        self.assertIsNone(self.client["since_mode"].topics.find_one({"topic": "kebab"}))
+
+    def test_mode_on_posts_status(self):
+        self.bot.admins = [1]
+        self.send("/since_mode_off")
+        self.send("/since_mode_on")
+
+        self.assertEqual(self.texts(), ["since_mode is OFF", "since_mode is ON"])
+        self.assertEqual(self.bot.sent("pinChatMessage"), [])
+
+
+class TrustedTestCase(SkillTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        trusted_mode.add_trusted_mode(self.upd, 1)
+
+    def test_admin_trusts_replied_user(self):
+        self.bot.admins = [1]
+        reply = {
+            "message_id": 1,
+            "date": int(datetime.now().timestamp()),
+            "chat": {"id": CHAT_ID, "type": "supergroup"},
+            "from": make_user(2),
+        }
+        self.send("/trust", reply_to_message=reply)
+
+        self.assertIn(2, trusted_users)
+        self.assertIsNotNone(self.client["trusted"].users.find_one({"_id": 2}))
+
+    def test_non_admin_is_ignored(self):
+        self.send("/trust")
+        self.assertEqual(self.bot.calls[-1][0], "getChatAdministrators")
+        self.assertEqual(self.texts(), [])
+
+
+class RollTestCase(SkillTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        roll.add_roll(self.upd, 1)
+
+    @patch("skills.roll.randint", return_value=0)
+    def test_roll_records_shots(self, _):
+        for _ in range(roll.NUM_BULLETS):
+            self.send("/roll")
+
+        leaders = self.client["roll"].leaders
+        self.assertEqual(leaders.count_documents({}), 0)
+        self.assertEqual(roll._db.rank(1), 1)
+        self.upd.run_jobs()
+
+        leader = leaders.find_one({"_id": 1})
+        self.assertEqual(leader["meta"]["id"], 1)
+        self.assertEqual(leader["miss_counter"], roll.NUM_BULLETS - 1)
+        self.assertEqual(leader["shot_counter"], roll.NUM_BULLETS)
+        self.assertEqual(leader["dead_counter"], 1)
+        self.assertEqual(len(self.bot.sent("restrictChatMember")), 1)
+
+    @patch("skills.roll.randint", side_effect=[roll.NUM_BULLETS - 1, 0])
+    def test_top_lists_muted_leaders_from_roster(self, _):
+        self.send("/roll", user_id=2)
+        self.send("/roll", user_id=3)
+        self.send("/top")
+
+        self.assertEqual(self.bot.sent("getChatMember"), [])
+        self.assertIn("user2", self.texts()[-1])
+        self.assertNotIn("user3", self.texts()[-1])
+
+    def test_leaders_board_is_sent_as_photo(self):
+        self.bot.admins = [1]
+        self.send("/roll", user_id=2)
+        self.send("/leaders")
+
+        photos = self.bot.sent("sendPhoto")
+        self.assertEqual(len(photos), 1)
+        self.assertEqual(photos[0]["photo"].input_file_content[:2], b"\xff\xd8")
+
+
+class TowelTestCase(SkillTestCase):
+    def test_ban_only_expired_users(self):
+        quarantine = self.client["towel_mode"].quarantine
+        quarantine.insert_one(
+            {"_id": 1, "rel_messages": [10], "datetime": datetime.now() - timedelta(minutes=1)}
+        )
+        quarantine.insert_one(
+            {"_id": 2, "rel_messages": [], "datetime": datetime.now() + timedelta(minutes=1)}
+        )
+
+        self.upd.job_queue.run_once(towel_mode.ban_user, 60, context={"chat_id": CHAT_ID})
+        self.upd.run_jobs()
+
+        self.assertEqual([d["user_id"] for d in self.bot.sent("banChatMember")], [1])
+        self.assertEqual([d["message_id"] for d in self.bot.sent("deleteMessage")], [10])
+        self.assertEqual([d["_id"] for d in quarantine.find({})], [2])
@@ -0,0 +1,54 @@
+import json
+from queue import Empty
+from unittest import TestCase
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from webhook import SECRET_HEADER, WebhookServer
+
+
+class WebhookServerTestCase(TestCase):
+    def setUp(self) -> None:
+        self.server = WebhookServer("127.0.0.1", 0, "/hook", "s3cret", queue_size=2)
+        self.server.start()
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def post(self, body, path="/hook", secret="s3cret") -> int:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        request = Request(
+            f"http://127.0.0.1:{self.server.port}{path}",
+            data=data,
+            headers={SECRET_HEADER: secret, "Content-Type": "application/json"},
+        )
+        try:
+            with urlopen(request, timeout=5) as response:
+                return response.status
+        except HTTPError as err:
+            return err.code
+
+    def test_accepts_update(self):
+        self.assertEqual(self.post({"update_id": 1}), 200)
+        self.assertEqual(self.server.get(timeout=1), {"update_id": 1})
+
+    def test_rejects_wrong_secret(self):
+        self.assertEqual(self.post({"update_id": 1}, secret="nope"), 403)
+        self.assertEqual(self.server.rejected, 1)
+        with self.assertRaises(Empty):
+            self.server.get(timeout=0.01)
+
+    def test_unknown_path(self):
+        self.assertEqual(self.post({"update_id": 1}, path="/other"), 404)
+
+    def test_bad_json(self):
+        self.assertEqual(self.post(b"{not json"), 400)
+
+    def test_full_queue_asks_for_retry(self):
+        self.assertEqual(self.post({"update_id": 1}), 200)
+        self.assertEqual(self.post({"update_id": 2}), 200)
+        self.assertEqual(self.post({"update_id": 3}), 503)
+        self.assertEqual(self.server.dropped, 1)
+
+        self.assertEqual(self.server.get(timeout=1)["update_id"], 1)
+        self.assertEqual(self.post({"update_id": 3}), 200)
@@ -0,0 +1,137 @@
+import logging
+from threading import Event, Lock
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SetCache:
+    def __init__(self, name: str, loader: Callable[[], Iterable[Hashable]]):
+        self.name = name
+        self._loader = loader
+        self._items: Set[Hashable] = set()
+        self._loaded = False
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self) -> int:
+        items = set(self._loader())
+        with self._lock:
+            self._items = items
+            self._loaded = True
+        logger.info("%s cache loaded: %d items", self.name, len(items))
+        return len(items)
+
+    def add(self, item: Hashable):
+        with self._lock:
+            self._items.add(item)
+
+    def discard(self, item: Hashable):
+        with self._lock:
+            self._items.discard(item)
+
+    def __contains__(self, item: Hashable) -> bool:
+        if not self._loaded:
+            self.load()
+
+        with self._lock:
+            found = item in self._items
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return found
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, clock: Callable[[], float] = monotonic):
+        self.name = name
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self.hits += 1
+                return entry[0]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = load()
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                    if flight.error is None:
+                        self._entries[key] = (flight.value, self._clock() + self.ttl)
+            flight.done.set()
+
+        return flight.value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+        }
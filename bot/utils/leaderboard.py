@@ -0,0 +1,108 @@
+import logging
+from threading import RLock
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Entry = Dict[str, Any]
+Key = Tuple[float, Hashable]
+
+
+class Leaderboard:
+    def __init__(
+        self,
+        name: str,
+        score: Callable[[Entry], float],
+        load: Callable[[], Iterable[Entry]],
+        id_field: str = "_id",
+    ):
+        self.name = name
+        self._score = score
+        self._load = load
+        self._id_field = id_field
+        self._entries: Dict[Hashable, Entry] = {}
+        self._ranking: SortedList = SortedList()
+        self._loaded = False
+        self._lock = RLock()
+        self.reconciles = 0
+        self.drift = 0
+        metrics.gauge(f"leaderboard.{name}", self.stats)
+
+    def _key(self, entry: Entry) -> Key:
+        return -self._score(entry), entry[self._id_field]
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reconcile()
+
+    def reconcile(self):
+        entries = {e[self._id_field]: e for e in self._load()}
+        with self._lock:
+            old = {self._key(e) for e in self._entries.values()}
+            new = {self._key(e) for e in entries.values()}
+            drift = len(old ^ new)
+            self._entries = entries
+            self._ranking = SortedList(self._key(e) for e in entries.values())
+            if self._loaded:
+                self.drift += drift
+                self.reconciles += 1
+            self._loaded = True
+        logger.info("%s leaderboard reconciled: %d entries, %d drifted", self.name, len(entries), drift)
+
+    def get(self, entry_id: Hashable) -> Optional[Entry]:
+        with self._lock:
+            self._ensure_loaded()
+            return self._entries.get(entry_id)
+
+    def put(self, entry: Entry):
+        with self._lock:
+            self._ensure_loaded()
+            entry_id = entry[self._id_field]
+            old = self._entries.get(entry_id)
+            if old is not None:
+                self._ranking.remove(self._key(old))
+            self._entries[entry_id] = entry
+            self._ranking.add(self._key(entry))
+
+    def remove(self, entry_id: Hashable):
+        with self._lock:
+            self._ensure_loaded()
+            old = self._entries.pop(entry_id, None)
+            if old is not None:
+                self._ranking.remove(self._key(old))
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._ranking = SortedList()
+            self._loaded = True
+
+    def top(self, n: Optional[int] = None) -> List[Entry]:
+        with self._lock:
+            self._ensure_loaded()
+            keys = self._ranking[:n] if n is not None else list(self._ranking)
+            return [self._entries[entry_id] for _, entry_id in keys]
+
+    def rank(self, entry_id: Hashable) -> Optional[int]:
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                return None
+            return self._ranking.index(self._key(entry)) + 1
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        return {
+            "size": len(self._entries),
+            "reconciles": self.reconciles,
+            "drift": self.drift,
+        }
@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Hashable, Iterator, List
+
+from utils.metrics import metrics
+
+STRIPES = 64
+
+
+class StripedLock:
+    def __init__(self, name: str, stripes: int = STRIPES):
+        self.name = name
+        self._locks: List[Lock] = [Lock() for _ in range(stripes)]
+        self._counter_lock = Lock()
+        self.acquired = 0
+        self.contended = 0
+        self.wait_stats = metrics.latency(f"locks.{name}.wait")
+        metrics.gauge(f"locks.{name}", self.stats)
+
+    def _stripe(self, key: Hashable) -> Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def __call__(self, key: Hashable) -> Iterator[None]:
+        lock = self._stripe(key)
+        contended = not lock.acquire(blocking=False)
+        if contended:
+            start = perf_counter()
+            lock.acquire()
+            self.wait_stats.observe(perf_counter() - start)
+
+        with self._counter_lock:
+            self.acquired += 1
+            self.contended += int(contended)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def stats(self) -> Dict:
+        return {
+            "stripes": len(self._locks),
+            "acquired": self.acquired,
+            "contended": self.contended,
+        }
@@ -0,0 +1,103 @@
+import logging
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class LatencyStats:
+    def __init__(self, name: str, buckets_ms: Sequence[float] = BUCKETS_MS):
+        self.name = name
+        self.buckets_ms = tuple(buckets_ms)
+        self.histogram: List[int] = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.ok = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = Lock()
+
+    def observe(self, seconds: float, ok: bool = True):
+        ms = seconds * 1000
+        idx = next(
+            (i for i, le in enumerate(self.buckets_ms) if ms <= le),
+            len(self.buckets_ms),
+        )
+        with self._lock:
+            self.count += 1
+            self.ok += int(bool(ok))
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.histogram[idx] += 1
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def ok_rate(self) -> float:
+        return self.ok / self.count if self.count else 0.0
+
+    def snapshot(self) -> Dict:
+        labels = [f"<={b}ms" for b in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        return {
+            "name": self.name,
+            "count": self.count,
+            "ok_rate": round(self.ok_rate, 3),
+            "mean_ms": round(self.mean * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "total_ms": round(self.total * 1000, 3),
+            "histogram": dict(zip(labels, self.histogram)),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._stats: Dict[str, LatencyStats] = {}
+        self._gauges: Dict[str, Callable[[], Dict]] = {}
+        self._lock = Lock()
+
+    def latency(self, name: str) -> LatencyStats:
+        with self._lock:
+            if name not in self._stats:
+                self._stats[name] = LatencyStats(name)
+            return self._stats[name]
+
+    def gauge(self, name: str, read: Callable[[], Dict]):
+        with self._lock:
+            self._gauges[name] = read
+
+    def gauges(self) -> Dict[str, Dict]:
+        with self._lock:
+            gauges = dict(self._gauges)
+        return {name: read() for name, read in gauges.items()}
+
+    def snapshot(self, prefix: str = "") -> List[Dict]:
+        with self._lock:
+            stats = [s for n, s in self._stats.items() if n.startswith(prefix)]
+        return sorted(
+            (s.snapshot() for s in stats), key=lambda s: s["total_ms"], reverse=True
+        )
+
+    def log_summary(self, prefix: str = ""):
+        for s in self.snapshot(prefix):
+            if s["count"] > 0:
+                logger.info("metrics: %s", s)
+        for name, value in self.gauges().items():
+            if name.startswith(prefix):
+                logger.info("metrics: %s %s", name, value)
+
+
+@contextmanager
+def timed(stats: LatencyStats) -> Iterator[None]:
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stats.observe(perf_counter() - start)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,144 @@
+import logging
+from datetime import date, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+SUNRISE_ANGLE = 0.833
+FAJR_ANGLE = 18.0
+ISHA_ANGLE = 17.0
+ASR_FACTOR = 1
+ITERATIONS = 2
+INITIAL_GUESS = np.array([5.0, 6.0, 12.0, 13.0, 18.0, 18.0])
+DIYANET_OFFSETS = np.array([0.0, -7.0, 5.0, 4.0, 7.0, 0.0])
+DIRECTIONS = np.array([-1, -1, 0, 1, 1, 1])
+
+Timetable = Dict[date, List[str]]
+
+
+class Location:
+    def __init__(
+        self,
+        name: str,
+        latitude: float,
+        longitude: float,
+        utc_offset: float,
+        diyanet_id: Optional[int] = None,
+    ):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.utc_offset = utc_offset
+        self.diyanet_id = diyanet_id
+
+    @property
+    def tz(self) -> timezone:
+        return timezone(timedelta(hours=self.utc_offset))
+
+    def __repr__(self) -> str:
+        return f"Location({self.name!r}, {self.latitude}, {self.longitude}, {self.utc_offset})"
+
+
+FINIKE = Location("finike", 36.2956, 30.1469, 3, diyanet_id=9228)
+
+LOCATIONS: Dict[str, Location] = {
+    location.name: location
+    for location in (
+        FINIKE,
+        Location("antalya", 36.8969, 30.7133, 3),
+        Location("istanbul", 41.0082, 28.9784, 3),
+        Location("ankara", 39.9334, 32.8597, 3),
+        Location("izmir", 38.4237, 27.1428, 3),
+    )
+}
+
+
+def get_location(name: str) -> Optional[Location]:
+    return LOCATIONS.get(name.lower())
+
+
+def _sin(d: np.ndarray) -> np.ndarray:
+    return np.sin(np.radians(d))
+
+
+def _cos(d: np.ndarray) -> np.ndarray:
+    return np.cos(np.radians(d))
+
+
+def _tan(d: np.ndarray) -> np.ndarray:
+    return np.tan(np.radians(d))
+
+
+def _arccos(x: np.ndarray) -> np.ndarray:
+    return np.degrees(np.arccos(np.clip(x, -1.0, 1.0)))
+
+
+def _sun_position(jd: np.ndarray):
+    d = jd - J2000
+    g = (357.529 + 0.98560028 * d) % 360
+    q = (280.459 + 0.98564736 * d) % 360
+    ecliptic = (q + 1.915 * _sin(g) + 0.020 * _sin(2 * g)) % 360
+    e = 23.439 - 0.00000036 * d
+
+    ra = (np.degrees(np.arctan2(_cos(e) * _sin(ecliptic), _cos(ecliptic))) / 15) % 24
+    equation = q / 15 - ra
+    equation = equation - 24 * np.round(equation / 24)
+    declination = np.degrees(np.arcsin(_sin(e) * _sin(ecliptic)))
+    return declination, equation
+
+
+def _julian_days(start: date, days: int, longitude: float) -> np.ndarray:
+    ordinal = np.arange(days, dtype=float) + (start - date(1970, 1, 1)).days
+    return UNIX_EPOCH_JD + ordinal - longitude / (15 * 24)
+
+
+def compute_times(location: Location, start: date, days: int) -> np.ndarray:
+    jd = _julian_days(start, days, location.longitude)
+    lat = location.latitude
+    times = np.tile(INITIAL_GUESS / 24, (days, 1))
+
+    for _ in range(ITERATIONS):
+        declination, equation = _sun_position(jd[:, None] + times)
+        noon = 12 - equation
+
+        asr_angle = -np.degrees(
+            np.arctan(1 / (ASR_FACTOR + _tan(np.abs(lat - declination[:, 3]))))
+        )
+        angles = np.column_stack(
+            [
+                np.full(days, FAJR_ANGLE),
+                np.full(days, SUNRISE_ANGLE),
+                np.zeros(days),
+                asr_angle,
+                np.full(days, SUNRISE_ANGLE),
+                np.full(days, ISHA_ANGLE),
+            ]
+        )
+        arc = (
+            _arccos(
+                (-_sin(angles) - _sin(declination) * _sin(lat))
+                / (_cos(declination) * _cos(lat))
+            )
+            / 15
+        )
+        times = (noon + DIRECTIONS * arc) / 24
+
+    local = times * 24 + location.utc_offset - location.longitude / 15
+    return local + DIYANET_OFFSETS / 60
+
+
+def _format(hours: float) -> str:
+    minutes = int(np.rint(hours * 60)) % (24 * 60)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def compute_timetable(location: Location, start: date, days: int) -> Timetable:
+    times = compute_times(location, start, days)
+    return {
+        start + timedelta(days=i): [_format(hours) for hours in row]
+        for i, row in enumerate(times)
+    }
@@ -0,0 +1,34 @@
+from threading import Lock
+from time import monotonic
+from typing import Callable
+
+
+class TokenBucket:
+    def __init__(
+        self, rate: float, capacity: float, clock: Callable[[], float] = monotonic
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= 1:
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def consume(self) -> bool:
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
@@ -0,0 +1,102 @@
+import logging
+import os
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+from typing import Dict
+
+from PIL import Image, ImageDraw, ImageFont
+
+from utils.metrics import metrics, timed
+
+logger = logging.getLogger(__name__)
+
+FONT_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "fonts", "firacode.ttf")
+FONT_SIZE = 12
+WIDTH = 480
+HEADER_HEIGHT = 30
+LINE_SPACING = 1.5
+TEXT_POSITION = (45, 0)
+MODE = "L"
+COLOR = "white"
+FORMAT = "JPEG"
+MEMO_SIZE = 32
+
+
+@lru_cache(maxsize=None)
+def get_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    logger.info("loading font %s (%d)", path, size)
+    return ImageFont.truetype(path, size)
+
+
+class RenderedImage:
+    def __init__(self, digest: str, data: bytes, filename: str):
+        self.digest = digest
+        self.data = data
+        self.filename = filename
+
+    def open(self) -> BytesIO:
+        f = BytesIO(self.data)
+        f.name = self.filename
+        return f
+
+
+class TextRenderer:
+    def __init__(
+        self,
+        font_path: str = FONT_PATH,
+        font_size: int = FONT_SIZE,
+        width: int = WIDTH,
+        memo_size: int = MEMO_SIZE,
+    ):
+        self.font_path = font_path
+        self.font_size = font_size
+        self.width = width
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[str, RenderedImage]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latency = metrics.latency("render.text")
+        metrics.gauge("render", self.stats)
+
+    def _digest(self, text: str, lines: int) -> str:
+        key = f"{self.font_path}:{self.font_size}:{self.width}:{lines}:{text}"
+        return sha256(key.encode()).hexdigest()
+
+    def _draw(self, text: str, lines: int) -> bytes:
+        height = int(lines * self.font_size * LINE_SPACING + HEADER_HEIGHT)
+        image = Image.new(MODE, (self.width, height), COLOR)
+        draw = ImageDraw.Draw(image)
+        draw.text(xy=TEXT_POSITION, text=text, font=get_font(self.font_path, self.font_size))
+
+        out = BytesIO()
+        image.save(out, FORMAT)
+        return out.getvalue()
+
+    def render(self, text: str, lines: int) -> RenderedImage:
+        digest = self._digest(text, lines)
+        with self._lock:
+            cached = self._memo.get(digest)
+            if cached is not None:
+                self._memo.move_to_end(digest)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        with timed(self.latency):
+            rendered = RenderedImage(digest, self._draw(text, lines), f"{digest[:16]}.jpg")
+
+        with self._lock:
+            self._memo[digest] = rendered
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return rendered
+
+    def stats(self) -> Dict:
+        return {"size": len(self._memo), "hits": self.hits, "misses": self.misses}
+
+
+text_renderer = TextRenderer()
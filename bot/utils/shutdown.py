@@ -0,0 +1,26 @@
+import logging
+from threading import Lock
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+Hook = Callable[[], None]
+
+_hooks: List[Hook] = []
+_lock = Lock()
+
+
+def on_shutdown(hook: Hook) -> Hook:
+    with _lock:
+        _hooks.append(hook)
+    return hook
+
+
+def run_shutdown_hooks():
+    with _lock:
+        hooks = list(reversed(_hooks))
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as err:
+            logger.error("shutdown hook %s failed: %s", hook, err)
@@ -0,0 +1,98 @@
+import json
+import logging
+from hmac import compare_digest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Full, Queue
+from threading import Thread
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY_SIZE = 1 << 20
+
+
+class WebhookServer:
+    def __init__(
+        self,
+        listen: str,
+        port: int,
+        path: str,
+        secret: str,
+        queue_size: int = 1000,
+    ):
+        self.path = "/" + path.strip("/")
+        self.secret = secret
+        self.queue: "Queue[Dict]" = Queue(maxsize=queue_size)
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._httpd = ThreadingHTTPServer((listen, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.send_response(server.receive(self))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, fmt, *args):
+                logger.debug("webhook: " + fmt, *args)
+
+        return Handler
+
+    def receive(self, request: BaseHTTPRequestHandler) -> int:
+        if request.path != self.path:
+            return 404
+
+        if not compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            logger.warning("webhook call with wrong secret from %s", request.client_address)
+            return 403
+
+        length = int(request.headers.get("Content-Length", 0))
+        if length <= 0 or length > MAX_BODY_SIZE:
+            return 413
+
+        try:
+            data = json.loads(request.rfile.read(length))
+        except ValueError:
+            return 400
+
+        try:
+            self.queue.put_nowait(data)
+        except Full:
+            self.dropped += 1
+            logger.warning("webhook queue is full, asking telegram to retry")
+            return 503
+
+        self.accepted += 1
+        return 200
+
+    def get(self, timeout: Optional[float] = None) -> Dict:
+        return self.queue.get(timeout=timeout)
+
+    def start(self):
+        self._thread = Thread(
+            target=self._httpd.serve_forever, name="webhook", daemon=True
+        )
+        self._thread.start()
+        logger.info("webhook server listening on port %d at %s", self.port, self.path)
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        logger.info(
+            "webhook server stopped: accepted=%d rejected=%d dropped=%d",
+            self.accepted,
+            self.rejected,
+            self.dropped,
+        )